@@ -13,12 +13,11 @@ from flask_limiter import Limiter
 from flask_migrate import Migrate
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
-import bcrypt
 import uuid
 from datetime import datetime, timedelta
 
 # Import database and models
-from models import db, User, Profile, TokenBlocklist, AffiliateLink, Product
+from models import db, User, Profile, AffiliateLink, Product
 
 # Import routes
 from routes.auth_routes import auth_bp
@@ -30,9 +29,22 @@ from routes.category_routes import category_bp
 from routes.profile_routes import profile_bp
 from routes.admin_routes import admin_bp
 from routes.affiliate_routes import affiliate_bp
+from routes.search_routes import search_bp
+from routes.order_routes import order_bp
 
 # Import utilities
 from utils.logger import setup_logger
+from utils.search import rebuild_product_index
+from utils.cache import response_cache
+from utils.passwords import password_hasher
+from utils.email_outbox import email_sender
+from utils.guest_cart import prune_merged_guest_carts
+from utils.email_templates import email_templates
+from utils.request_logging import request_logger
+from utils.metrics import request_metrics, metrics_response
+from utils.query_inspector import query_inspector
+from utils.identity import identity_map
+from utils.blocklist import blocklist_cache, prune_expired_tokens, start_blocklist_pruner
 
 # Load environment variables from .env file
 load_dotenv()
@@ -45,6 +57,8 @@ app.wsgi_app = ProxyFix(app.wsgi_app)
 env = os.environ.get('FLASK_ENV', 'development')
 if env == 'production':
     app.config.from_object('config.ProductionConfig')
+elif env == 'testing':
+    app.config.from_object('config.TestingConfig')
 else:
     app.config.from_object('config.DevelopmentConfig')
 
@@ -61,13 +75,38 @@ logger.info(f"Connecting to database: {app.config.get('SQLALCHEMY_DATABASE_URI')
 db.init_app(app)
 migrate = Migrate(app, db)  # Initialize Flask-Migrate
 jwt = JWTManager(app)
+response_cache.init_app(app)
+password_hasher.init_app(app)
+email_sender.init_app(app)
+email_templates.init_app(app)
+request_logger.init_app(app)
+request_metrics.init_app(app)
+query_inspector.init_app(app)
+identity_map.init_app(app)
 
 # Callback function to check if a JWT exists in the database blocklist
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
-    jti = jwt_payload["jti"]
-    token = db.session.query(TokenBlocklist.id).filter_by(jti=jti).scalar()
-    return token is not None
+    # Answered from the in-memory filter; only possible hits reach the database
+    return blocklist_cache.is_token_revoked(jwt_payload)
+
+@app.cli.command('prune-token-blocklist')
+def prune_token_blocklist_command():
+    """Delete blocklist rows for tokens that have already expired"""
+    deleted = prune_expired_tokens(app.config.get('TOKEN_BLOCKLIST_PRUNE_BATCH_SIZE', 5000))
+    print(f'Pruned {deleted} expired token blocklist rows')
+
+@app.cli.command('prune-merged-guest-carts')
+def prune_merged_guest_carts_command():
+    """Delete merge records of guest carts whose tokens have expired"""
+    deleted = prune_merged_guest_carts()
+    print(f'Pruned {deleted} expired merged guest cart rows')
+
+@app.cli.command('send-outbox-emails')
+def send_outbox_emails_command():
+    """Deliver every due email in the outbox now"""
+    sent, failed = email_sender.send_pending()
+    print(f'Sent {sent} emails, {failed} failed')
 
 # Database migrations are now handled by Flask-Migrate.
 # The `db.create_all()` call has been removed to avoid conflicts.
@@ -79,7 +118,7 @@ if env == 'development':
          resources={r"/*": {"origins": "*"}}, 
          supports_credentials=True,
          allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
          max_age=3600)
 else:
     # In production, restrict to specific origins
@@ -87,7 +126,7 @@ else:
          resources={r"/api/*": {"origins": ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5000", "http://127.0.0.1:5000"], 
                               "supports_credentials": True,
                               "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
-                              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+                              "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
                               "max_age": 3600}})
 
 # Create a decorator to exempt OPTIONS requests from rate limiting
@@ -98,7 +137,7 @@ def handle_options_request():
         response = make_response()
         response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Requested-With')
-        response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+        response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         response.headers.add('Access-Control-Max-Age', '3600')
         return response
@@ -136,57 +175,8 @@ app.register_blueprint(category_bp, url_prefix='/api/categories')
 app.register_blueprint(profile_bp, url_prefix='/api/profile')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(affiliate_bp, url_prefix='/api/affiliate')
-
-# Add comprehensive request and response logging
-@app.before_request
-def log_request_info():
-    """Log incoming request details for debugging."""
-    # Exclude health check from verbose logging
-    if request.path == '/health':
-        return
-    logger.info('='*50)
-    logger.info(f'Request: {request.method} {request.url}')
-    logger.info(f'Remote Address: {request.remote_addr}')
-    
-    # Log headers safely, excluding sensitive ones
-    headers = {k: v for k, v in request.headers.items() if k.lower() not in ['authorization', 'cookie']}
-    logger.info(f'Headers: {headers}')
-    
-    # Avoid logging request body for multipart/form-data to prevent errors with binary files
-    if request.mimetype == 'multipart/form-data':
-        logger.info('Body: [multipart/form-data] - not logged to avoid binary data issues.')
-    elif request.get_data():
-        try:
-            # Try to log body, truncate if too long
-            body_data = request.get_data(as_text=True)
-            if len(body_data) > 1000:
-                logger.info(f'Body (truncated): {body_data[:1000]}...')
-            else:
-                logger.info(f'Body: {body_data}')
-        except Exception as e:
-            logger.warning(f'Could not parse request body: {e}')
-    logger.info('-'*50)
-
-
-@app.after_request
-def log_response_info(response):
-    """Log outgoing response details for debugging."""
-    # Exclude health check from verbose logging
-    if request.path == '/health':
-        return response
-        
-    logger.info('-'*50)
-    logger.info(f'Response Status: {response.status}')
-    
-    # Avoid logging large file downloads or binary content
-    if response.content_length and response.content_length < 5000 and response.is_json:
-        try:
-            logger.info(f'Response Body: {response.get_json()}')
-        except Exception as e:
-            logger.warning(f'Could not parse response JSON: {e}')
-    
-    logger.info('='*50)
-    return response
+app.register_blueprint(search_bp, url_prefix='/api/search')
+app.register_blueprint(order_bp, url_prefix='/api/orders')
 
 # Serve static files
 @app.route('/uploads/<path:filename>')
@@ -198,6 +188,12 @@ def serve_uploads(filename):
 def health_check():
     return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()}), 200
 
+# Prometheus scrape endpoint (exempt from rate limits, scraped every few seconds)
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics():
+    return metrics_response()
+
 # Public tracking endpoint for affiliate links
 @app.route('/track/<code>', methods=['GET'])
 def track_affiliate_link(code):
@@ -256,7 +252,7 @@ def create_admin_user():
             return
         
         # Hash the password
-        hashed_password = bcrypt.hashpw(admin_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = password_hasher.hash(admin_password)
         
         # Create the admin user
         admin_user = User(
@@ -298,6 +294,20 @@ if __name__ == '__main__':
         # The `db.create_all()` call is removed. Migrations handle the schema.
         # Create admin user
         create_admin_user()
+        # Build the in-memory product search index up front so the first
+        # search request does not pay for it
+        try:
+            rebuild_product_index()
+        except Exception as error:
+            logger.error(f'Failed to build product search index: {error}')
+    
+    # Expired tokens are removed from the blocklist and queued emails are
+    # sent in the background; only serving processes run these threads, not
+    # scripts or CLI commands. With the debug reloader this file runs in a
+    # watcher process too, which never serves a request.
+    if env == 'production' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_blocklist_pruner(app)
+        email_sender.start(app)
     
     # Start the server
     port = int(os.environ.get('PORT', 5000))
@@ -17,13 +17,64 @@ class Config:
     # Upload settings
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'public/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
+    
+    # Response cache for public catalog reads ('local' or 'redis')
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'local')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    
+    # Background pruning of expired token_blocklist rows (0 disables the thread)
+    TOKEN_BLOCKLIST_PRUNE_INTERVAL = int(os.environ.get('TOKEN_BLOCKLIST_PRUNE_INTERVAL', 3600))
+    TOKEN_BLOCKLIST_PRUNE_BATCH_SIZE = int(os.environ.get('TOKEN_BLOCKLIST_PRUNE_BATCH_SIZE', 5000))
+    
+    # Password hashing: bcrypt work factor and the per-worker process pool that runs it
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    BCRYPT_POOL_SIZE = int(os.environ.get('BCRYPT_POOL_SIZE', 0))  # 0 = half the CPUs
+    BCRYPT_QUEUE_SIZE = int(os.environ.get('BCRYPT_QUEUE_SIZE', 8))  # waiting hashes before 429
+    BCRYPT_TIMEOUT = int(os.environ.get('BCRYPT_TIMEOUT', 10))
+    
+    # Email outbox delivery (0 disables the sender thread; see `flask send-outbox-emails`)
+    EMAIL_SENDER_INTERVAL = int(os.environ.get('EMAIL_SENDER_INTERVAL', 10))
+    EMAIL_SENDER_BATCH_SIZE = int(os.environ.get('EMAIL_SENDER_BATCH_SIZE', 50))
+    EMAIL_SENDER_CONCURRENCY = int(os.environ.get('EMAIL_SENDER_CONCURRENCY', 2))  # also the SMTP connections per worker
+    EMAIL_SENDER_MAX_ATTEMPTS = int(os.environ.get('EMAIL_SENDER_MAX_ATTEMPTS', 8))
+    EMAIL_SENDER_RETRY_BASE_DELAY = int(os.environ.get('EMAIL_SENDER_RETRY_BASE_DELAY', 30))  # seconds, doubled per attempt
+    SMTP_IDLE_TIMEOUT = int(os.environ.get('SMTP_IDLE_TIMEOUT', 60))
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+    
+    # Request logging: default verbosity (off/summary/sampled/full), per-route
+    # overrides as 'pattern=level' pairs, and the share of requests logged with bodies
+    REQUEST_LOG_VERBOSITY = os.environ.get('REQUEST_LOG_VERBOSITY', 'sampled')
+    REQUEST_LOG_ROUTES = os.environ.get('REQUEST_LOG_ROUTES', '/health=off,/metrics=off,/api/auth/*=summary,/api/users/*=summary')
+    REQUEST_LOG_BODY_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_BODY_SAMPLE_RATE', 0.01))
+    REQUEST_LOG_BODY_MAX_BYTES = int(os.environ.get('REQUEST_LOG_BODY_MAX_BYTES', 1024))
+    
+    # Prometheus metrics on /metrics (set PROMETHEUS_MULTIPROC_DIR under gunicorn)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # N+1 detection and per-route query budgets (development and testing only)
+    QUERY_INSPECTOR_ENABLED = False
+    QUERY_INSPECTOR_REPEAT_THRESHOLD = int(os.environ.get('QUERY_INSPECTOR_REPEAT_THRESHOLD', 5))
+    QUERY_BUDGET_STRICT = False  # raise QueryBudgetExceeded instead of logging
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 10))
+    REQUEST_LOG_BODY_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_BODY_SAMPLE_RATE', 1.0))
+    QUERY_INSPECTOR_ENABLED = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'mysql+mysqlconnector://root:@127.0.0.1/afripulse')
 
 class TestingConfig(Config):
     TESTING = True
+    RESPONSE_CACHE_ENABLED = False
+    TOKEN_BLOCKLIST_PRUNE_INTERVAL = 0
+    EMAIL_SENDER_INTERVAL = 0
+    QUERY_INSPECTOR_ENABLED = True
+    QUERY_BUDGET_STRICT = True
+    BCRYPT_LOG_ROUNDS = 4
+    RATELIMIT_ENABLED = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'mysql+mysqlconnector://root:@127.0.0.1/database_test')
 
 class ProductionConfig(Config):
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for the API
+
+Loaded automatically when gunicorn is started from this directory, e.g.
+``gunicorn -w 4 app:app``. It only sets up what the app needs from the
+process manager; pass bind, workers etc. on the command line as before.
+"""
+import os
+import shutil
+
+# Workers write their Prometheus samples here so /metrics can sum them
+# (see utils/metrics.py). Must be set before the app is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join('/tmp', 'afripulse-metrics'))
+
+
+def on_starting(server):
+    """Start every run with empty metrics files"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Background jobs that only serving workers run (not scripts or CLI commands)"""
+    from app import app
+    from utils.blocklist import start_blocklist_pruner
+    from utils.email_outbox import email_sender
+    start_blocklist_pruner(app)
+    email_sender.start(app)
+
+
+def child_exit(server, worker):
+    """Drop the live samples of a worker that exited"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,25 @@
+"""Add products keyset pagination index
+
+Revision ID: 3c1f7a9d2b64
+Revises: 9b05cdd3433a
+Create Date: 2026-10-17 10:45:12.118402
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f7a9d2b64'
+down_revision = '9b05cdd3433a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_status_created_at_id', ['status', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_status_created_at_id')
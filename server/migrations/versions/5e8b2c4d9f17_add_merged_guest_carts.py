@@ -0,0 +1,33 @@
+"""Add merged_guest_carts
+
+Revision ID: 5e8b2c4d9f17
+Revises: d7f3a1c5e902
+Create Date: 2026-10-17 16:20:05.734112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b2c4d9f17'
+down_revision = 'd7f3a1c5e902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('merged_guest_carts',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('merged_guest_carts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_merged_guest_carts_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('merged_guest_carts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_merged_guest_carts_expires_at'))
+
+    op.drop_table('merged_guest_carts')
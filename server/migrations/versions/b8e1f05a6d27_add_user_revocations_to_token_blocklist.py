@@ -0,0 +1,30 @@
+"""Add user-wide revocations to token_blocklist
+
+Revision ID: b8e1f05a6d27
+Revises: 7d2e4b19c8a3
+Create Date: 2026-10-17 11:31:05.903166
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1f05a6d27'
+down_revision = '7d2e4b19c8a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.String(length=36), nullable=True))
+        batch_op.add_column(sa.Column('issued_before', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_token_blocklist_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_blocklist_user_id'))
+        batch_op.drop_column('issued_before')
+        batch_op.drop_column('user_id')
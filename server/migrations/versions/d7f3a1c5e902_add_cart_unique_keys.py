@@ -0,0 +1,66 @@
+"""Add unique keys to carts and cart_items
+
+Revision ID: d7f3a1c5e902
+Revises: c4a9d2e7f310
+Create Date: 2026-10-17 14:02:37.540118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f3a1c5e902'
+down_revision = 'c4a9d2e7f310'
+branch_labels = None
+depends_on = None
+
+
+def _merge_duplicates(conn):
+    """Fold duplicate carts and cart lines left by concurrent requests into one row each"""
+    carts = sa.table('carts', sa.column('id'), sa.column('user_id'), sa.column('created_at'))
+    items = sa.table('cart_items', sa.column('id'), sa.column('cart_id'), sa.column('product_id'),
+                     sa.column('quantity'), sa.column('created_at'))
+
+    keep_cart = {}
+    for cart_id, user_id in conn.execute(
+        sa.select(carts.c.id, carts.c.user_id).order_by(carts.c.user_id, carts.c.created_at, carts.c.id)
+    ):
+        if user_id in keep_cart:
+            conn.execute(items.update().where(items.c.cart_id == cart_id).values(cart_id=keep_cart[user_id]))
+            conn.execute(carts.delete().where(carts.c.id == cart_id))
+        else:
+            keep_cart[user_id] = cart_id
+
+    keep_item = {}
+    for item_id, cart_id, product_id, quantity in conn.execute(
+        sa.select(items.c.id, items.c.cart_id, items.c.product_id, items.c.quantity)
+        .order_by(items.c.cart_id, items.c.product_id, items.c.created_at, items.c.id)
+    ):
+        key = (cart_id, product_id)
+        if key in keep_item:
+            conn.execute(items.update().where(items.c.id == keep_item[key]).values(quantity=items.c.quantity + quantity))
+            conn.execute(items.delete().where(items.c.id == item_id))
+        else:
+            keep_item[key] = item_id
+
+
+def upgrade():
+    _merge_duplicates(op.get_bind())
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_carts_user_id', ['user_id'])
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_items_cart_product', ['cart_id', 'product_id'])
+
+
+def downgrade():
+    # MySQL needs an index on each foreign key column once the unique keys are gone
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_items_cart_id', ['cart_id'], unique=False)
+        batch_op.drop_constraint('uq_cart_items_cart_product', type_='unique')
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.create_index('ix_carts_user_id', ['user_id'], unique=False)
+        batch_op.drop_constraint('uq_carts_user_id', type_='unique')
@@ -20,3 +20,5 @@ from .affiliate_click import AffiliateClick
 from .flagged_activity import FlaggedActivity
 from .category import Category
 from .token_blocklist import TokenBlocklist
+from .email_outbox import EmailOutbox
+from .merged_guest_cart import MergedGuestCart
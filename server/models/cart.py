@@ -4,6 +4,10 @@ from . import db
 
 class Cart(db.Model):
     __tablename__ = 'carts'
+    __table_args__ = (
+        # One cart per user, so lazy creation by concurrent requests can't duplicate it
+        db.UniqueConstraint('user_id', name='uq_carts_user_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -4,6 +4,10 @@ from . import db
 
 class CartItem(db.Model):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        # One line per product; additions upsert onto it (see utils.carts.add_cart_item)
+        db.UniqueConstraint('cart_id', 'product_id', name='uq_cart_items_cart_product'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     cart_id = db.Column(db.String(36), db.ForeignKey('carts.id', ondelete='CASCADE'), nullable=False)
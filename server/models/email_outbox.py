@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.mysql import LONGTEXT
+from . import db
+
+class EmailOutbox(db.Model):
+    """
+    Transactional email waiting to be (or already) delivered.
+
+    Rows are added in the same transaction as the change that triggers the
+    email and sent by the background sender in utils/email_outbox.py.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(LONGTEXT, nullable=False)
+    status = db.Column(db.Enum('pending', 'sending', 'sent', 'failed', name='email_outbox_status'), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Earliest time (UTC) of the next attempt; while 'sending', when the claim lapses
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.status} to={self.to_email}>'
@@ -0,0 +1,18 @@
+from . import db
+
+class MergedGuestCart(db.Model):
+    """
+    Guest cart that was merged into a user's cart at login.
+
+    The primary key is the id carried in the guest cart token (see
+    utils/guest_cart.py), so a cart can only be merged once; tokens of a
+    merged cart read as empty until they expire.
+    """
+    __tablename__ = 'merged_guest_carts'
+
+    id = db.Column(db.String(36), primary_key=True)
+    # When the last token of this cart expires (UTC); the row can be pruned after that
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<MergedGuestCart {self.id}>'
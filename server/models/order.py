@@ -20,8 +20,15 @@ class Order(db.Model):
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
 
-    def to_dict(self):
-        """Convert order object to dictionary"""
+    def to_dict(self, items=None):
+        """Convert order object to dictionary
+
+        ``items`` can be passed in as already serialized order items so list
+        endpoints avoid a query per order (see
+        ``utils.serializers.serialize_orders``).
+        """
+        if items is None:
+            items = [item.to_dict() for item in self.items]
         return {
             'id': self.id,
             'customer_id': self.customer_id,
@@ -32,5 +39,5 @@ class Order(db.Model):
             'payment_intent_id': self.payment_intent_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'items': [item.to_dict() for item in self.items]
+            'items': items
         }
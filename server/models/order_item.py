@@ -19,8 +19,13 @@ class OrderItem(db.Model):
     # Relationships
     product = db.relationship('Product', back_populates='order_items')
     
-    def to_dict(self):
-        """Convert order item object to dictionary"""
+    def to_dict(self, product=None):
+        """Convert order item object to dictionary
+
+        ``product`` can be passed in as an already serialized product.
+        """
+        if product is None and self.product:
+            product = self.product.to_dict()
         return {
             'id': self.id,
             'order_id': self.order_id,
@@ -31,5 +36,5 @@ class OrderItem(db.Model):
             'affiliate_id': self.affiliate_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'product': self.product.to_dict() if self.product else None
+            'product': product
         }
@@ -5,6 +5,10 @@ from . import db
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Supports keyset pagination of the public catalog on (created_at, id)
+        db.Index('ix_products_status_created_at_id', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(String(255), nullable=False)
@@ -29,8 +33,19 @@ class Product(db.Model):
     category = db.relationship('Category', back_populates='products')
     seller = db.relationship('SellerProfile', back_populates='products')
     
-    def to_dict(self):
-        """Convert product object to dictionary"""
+    def to_dict(self, category=None, seller=None, images=None):
+        """Convert product object to dictionary
+
+        ``category``, ``seller`` and ``images`` can be passed in preloaded so
+        list endpoints avoid a lazy load per row (see
+        ``utils.serializers.serialize_products``).
+        """
+        if category is None:
+            category = self.category
+        if seller is None:
+            seller = self.seller
+        if images is None:
+            images = self.images
         return {
             'id': self.id,
             'name': self.name,
@@ -39,14 +54,14 @@ class Product(db.Model):
             'long_description': self.long_description,
             'price': float(self.price) if self.price is not None else None,
             'discount_price': float(self.discount_price) if self.discount_price is not None else None,
-            'category': self.category.to_dict() if self.category else None,
+            'category': category.to_dict() if category else None,
             'inventory_count': self.inventory_count,
             'seller_id': self.seller_id,
-            'sellerBusinessName': self.seller.business_name if self.seller else None,
+            'sellerBusinessName': seller.business_name if seller else None,
             'featured': self.featured,
             'status': self.status,
             'is_approved': self.is_approved,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'images': [image.to_dict() for image in self.images]
+            'images': [image.to_dict() for image in images]
         }
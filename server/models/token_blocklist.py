@@ -11,6 +11,12 @@ class TokenBlocklist(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     jti = db.Column(db.String(36), nullable=False, index=True)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # The revoked token's own expiry (UTC); rows past it can be pruned
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    # When set, the row revokes every access token of this user issued
+    # before issued_before (UTC) instead of a single jti
+    user_id = db.Column(db.String(36), nullable=True, index=True)
+    issued_before = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<TokenBlocklist jti={self.jti}>'
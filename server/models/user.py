@@ -1,8 +1,8 @@
 import uuid
-import bcrypt
 from datetime import datetime
 from sqlalchemy.sql import func
 from . import db
+from utils.passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -27,14 +27,8 @@ class User(db.Model):
         super(User, self).__init__(**kwargs)
     
     def check_password(self, password):
-        """Verify the password against the stored hash"""
-        if isinstance(password, str):
-            password = password.encode('utf-8')
-        if isinstance(self.password, str):
-            stored_password = self.password.encode('utf-8')
-        else:
-            stored_password = self.password
-        return bcrypt.checkpw(password, stored_password)
+        """Verify the password against the stored hash (on the hashing pool)"""
+        return password_hasher.check(password, self.password)
     
     def to_dict(self):
         """Convert user object to dictionary"""
@@ -13,6 +13,8 @@ from models.profile import Profile
 from models.seller_profile import SellerProfile
 from models.category import Category
 from utils.auth_helpers import admin_required
+from utils.serializers import serialize_products
+from utils.streaming import stream_json_array, page_params
 import logging
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
@@ -43,35 +45,44 @@ def get_admin_dashboard():
 @admin_required
 def get_flagged_items():
     try:
-        # Get all flagged activities
-        flagged_activities = FlaggedActivity.query.order_by(FlaggedActivity.created_at.desc()).all()
+        # Get all flagged activities with the reporting user's name in the same query
+        flagged_activities = db.session.query(
+            FlaggedActivity,
+            Profile.name.label('user_name')
+        ).outerjoin(
+            Profile, Profile.user_id == FlaggedActivity.user_id
+        )
         
         # Format the response
-        result = []
-        for activity in flagged_activities:
-            user = User.query.get(activity.user_id)
-            user_name = user.profile.name if user and user.profile else 'Unknown User'
-            
-            item = {
-                'id': activity.id,
-                'itemType': activity.activity_type,
-                'name': f"{activity.activity_type.capitalize()} by {user_name}",
-                'reason': activity.description,
-                'reportedBy': 'System',  # Could be updated if you track who reported
-                'reportDate': activity.created_at.isoformat(),
-                'status': activity.status,
-                'ip_address': activity.ip_address,
-                'user_agent': activity.user_agent,
-                'resolution_notes': activity.resolution_notes,
-                'reviewed_by': activity.reviewed_by,
-                'updated_at': activity.updated_at.isoformat() if activity.updated_at else None
-            }
-            result.append(item)
+        def serialize(rows):
+            result = []
+            for activity, user_name in rows:
+                user_name = user_name or 'Unknown User'
+                
+                item = {
+                    'id': activity.id,
+                    'itemType': activity.activity_type,
+                    'name': f"{activity.activity_type.capitalize()} by {user_name}",
+                    'reason': activity.description,
+                    'reportedBy': 'System',  # Could be updated if you track who reported
+                    'reportDate': activity.created_at.isoformat(),
+                    'status': activity.status,
+                    'ip_address': activity.ip_address,
+                    'user_agent': activity.user_agent,
+                    'resolution_notes': activity.resolution_notes,
+                    'reviewed_by': activity.reviewed_by,
+                    'updated_at': activity.updated_at.isoformat() if activity.updated_at else None
+                }
+                result.append(item)
+            return result
         
         # Return empty list if no real data exists
         # This ensures the admin sees the actual state of the database
-            
-        return jsonify(result), 200
+        limit, offset = page_params()
+        return stream_json_array(
+            flagged_activities, FlaggedActivity.id, lambda row: row[0].id, serialize,
+            sort_column=FlaggedActivity.created_at, descending=True, limit=limit, offset=offset
+        ), 200
     except Exception as e:
         logger.error(f"Error fetching flagged items: {str(e)}")
         return jsonify({'message': f'Error fetching flagged items: {str(e)}'}), 500
@@ -286,7 +297,7 @@ def get_admin_products():
         pending_products = Product.query.filter_by(is_approved=False).count()
         
         return jsonify({
-            'products': [product.to_dict() for product in paginated_products.items],
+            'products': serialize_products(paginated_products.items),
             'pagination': {
                 'total_items': paginated_products.total,
                 'per_page': per_page,
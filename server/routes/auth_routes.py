@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
-import bcrypt
 import uuid
 from datetime import datetime, timedelta
 import os
@@ -8,6 +7,10 @@ import os
 from models import db, User, Profile, TokenBlocklist
 from utils.email_service import send_verification_email, send_password_reset_email
 from utils.validators import validate_email, validate_password
+from utils.blocklist import blocklist_cache
+from utils.passwords import password_hasher, PasswordHasherBusy, busy_response
+from utils.principal import token_claims
+from utils.guest_cart import merge_request_guest_cart, clear_guest_cart_cookie
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,7 +41,7 @@ def register():
     
     try:
         # Hash password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         
         # Generate verification token
         verification_token = str(uuid.uuid4())
@@ -53,7 +56,7 @@ def register():
         )
         
         db.session.add(new_user)
-        db.session.commit()
+        db.session.flush()
         
         # Create profile with name
         profile = Profile(
@@ -63,16 +66,19 @@ def register():
         )
         
         db.session.add(profile)
-        db.session.commit()
         
-        # Send verification email
+        # Queue the verification email in the same transaction
         send_verification_email(email, verification_token)
+        db.session.commit()
         
         return jsonify({
             'message': 'User registered successfully. Please check your email to verify your account.',
             'userId': new_user.id
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Registration failed: {str(e)}'}), 500
@@ -95,7 +101,7 @@ def login():
             return jsonify({'message': 'Invalid email or password'}), 401
         
         # Check password
-        if not bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
+        if not password_hasher.check(password, user.password):
             return jsonify({'message': 'Invalid email or password'}), 401
         
         # Check if email is verified
@@ -103,16 +109,24 @@ def login():
             return jsonify({'message': 'Please verify your email before logging in'}), 403
         
         # Generate tokens
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims=token_claims(user))
         refresh_token = create_refresh_token(identity=user.id)
         
-        return jsonify({
+        # Fold the cart the user built as a guest into their own cart
+        guest_cart_merged = merge_request_guest_cart(user.id)
+        
+        response = jsonify({
             'message': 'Login successful',
             'access_token': access_token,
             'refresh_token': refresh_token,
             'user': user.to_dict()
-        }), 200
+        })
+        if guest_cart_merged:
+            clear_guest_cart_cookie(response)
+        return response, 200
         
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'message': f'Login failed: {str(e)}'}), 500
 
@@ -164,10 +178,9 @@ def forgot_password():
         user.password_reset_token = reset_token
         user.password_reset_expires = datetime.utcnow() + timedelta(hours=24)
         
-        db.session.commit()
-        
-        # Send password reset email
+        # Queue the password reset email in the same transaction
         send_password_reset_email(email, reset_token)
+        db.session.commit()
         
         return jsonify({'message': 'Password reset link sent to your email'}), 200
         
@@ -200,7 +213,7 @@ def reset_password():
             return jsonify({'message': 'Reset token has expired'}), 400
         
         # Hash new password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         
         # Update password and clear reset token
         user.password = hashed_password
@@ -211,6 +224,9 @@ def reset_password():
         
         return jsonify({'message': 'Password reset successful. You can now log in with your new password.'}), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Password reset failed: {str(e)}'}), 500
@@ -220,10 +236,16 @@ def reset_password():
 def logout():
     """Revoke the current user's access token"""
     try:
-        jti = get_jwt()['jti']
-        blocklist_entry = TokenBlocklist(jti=jti)
+        token = get_jwt()
+        jti = token['jti']
+        # Keep the token's expiry so the row can be pruned once it has passed
+        blocklist_entry = TokenBlocklist(
+            jti=jti,
+            expires_at=datetime.utcfromtimestamp(token['exp']) if token.get('exp') else None
+        )
         db.session.add(blocklist_entry)
         db.session.commit()
+        blocklist_cache.revoked(jti)
         return jsonify({'message': 'Successfully logged out'}), 200
     except Exception as e:
         db.session.rollback()
@@ -236,8 +258,12 @@ def refresh():
     current_user_id = get_jwt_identity()
     
     try:
-        # Generate new access token
-        access_token = create_access_token(identity=current_user_id)
+        user = User.query.get(current_user_id)
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        
+        # Generate new access token with the user's current role and profiles
+        access_token = create_access_token(identity=current_user_id, additional_claims=token_claims(user))
         
         return jsonify({
             'access_token': access_token
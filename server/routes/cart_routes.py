@@ -2,7 +2,17 @@ from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 
-from models import db, Cart, CartItem, Product
+from models import db, CartItem, Product
+from utils.carts import (
+    find_cart, get_or_create_cart, add_cart_item, parse_cart_operations, apply_cart_operations, check_cart_quantities,
+    CartOperationError, MAX_CART_QUANTITY
+)
+from utils.guest_cart import (
+    read_guest_cart, encode_guest_cart, missing_guest_products, apply_guest_operations, serialize_guest_cart,
+    set_guest_cart_cookie, GuestCartError
+)
+from utils.query_inspector import query_budget
+from utils.serializers import serialize_cart
 
 cart_bp = Blueprint('cart_bp', __name__, url_prefix='/api/cart')
 
@@ -14,15 +24,33 @@ def handle_options_request(f):
             response = make_response()
             response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
             response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+            response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
             response.headers.add('Access-Control-Allow-Credentials', 'true')
             response.headers.add('Access-Control-Max-Age', '3600')
             return response
         return f(*args, **kwargs)
     return decorated_function
 
+def update_guest_cart(changes):
+    """Apply cart changes to the guest cart carried by the request; nothing is written server-side"""
+    missing = missing_guest_products(changes)
+    if missing:
+        return jsonify({'message': 'Product not found', 'product_ids': missing}), 404
+    try:
+        cart_id, lines = read_guest_cart()
+        lines = apply_guest_operations(lines, changes)
+    except GuestCartError as e:
+        return jsonify({'message': str(e)}), 400
+
+    token = encode_guest_cart(lines, cart_id) if lines else None
+    payload = serialize_guest_cart(lines)
+    payload['guest_token'] = token
+    return set_guest_cart_cookie(jsonify(payload), token), 200
+
 @cart_bp.route('/', methods=['GET', 'OPTIONS'])
 @handle_options_request
+@jwt_required(optional=True)
+@query_budget(4)
 def get_cart():
     if request.method == 'OPTIONS':
         return make_response()
@@ -31,31 +59,73 @@ def get_cart():
         # Try to get the user identity, but don't require it
         user_id = get_jwt_identity()
         if user_id:
-            cart = Cart.query.filter_by(user_id=user_id).first()
-            if not cart:
-                # Create a cart if it doesn't exist
-                cart = Cart(user_id=user_id)
-                db.session.add(cart)
-                db.session.commit()
-            return jsonify(cart.to_dict_with_items())
+            # Carts are created on the first write; until then the cart is empty
+            return jsonify(serialize_cart(find_cart(user_id)))
         else:
-            # Return empty cart for non-authenticated users
-            return jsonify({"items": [], "total": 0})
+            # Guests carry their cart in a signed token; price it without writing anything
+            _, lines = read_guest_cart()
+            return jsonify(serialize_guest_cart(lines))
     except Exception as e:
         # Handle any JWT errors gracefully
-        return jsonify({"items": [], "total": 0})
+        return jsonify(serialize_cart(None))
+
+@cart_bp.route('/', methods=['PATCH'])
+@jwt_required(optional=True)
+def update_cart():
+    """
+    Apply several cart operations in one transaction
+
+    Body: ``{"operations": [{"op": "add", "product_id": ..., "quantity": 2},
+    {"op": "set", "product_id": ..., "quantity": 1}, {"op": "remove",
+    "product_id": ...}]}``. Operations apply in order; the products they
+    add are validated with one query and the final cart is returned once.
+    Without a login the operations apply to the guest cart token instead.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+
+    try:
+        changes = parse_cart_operations(data.get('operations'))
+    except CartOperationError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not user_id:
+        return update_guest_cart(changes)
+
+    product_ids = [product_id for product_id, (action, _) in changes.items() if action != 'remove']
+    if product_ids:
+        found = {row.id for row in db.session.query(Product.id).filter(Product.id.in_(product_ids)).all()}
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        if missing:
+            return jsonify({'message': 'Product not found', 'product_ids': missing}), 404
+        cart = get_or_create_cart(user_id)
+    else:
+        # Only removals: nothing to do for a user who has no cart yet
+        cart = find_cart(user_id)
+
+    try:
+        if cart is not None:
+            check_cart_quantities(cart, changes)
+            apply_cart_operations(cart, changes)
+            db.session.commit()
+    except CartOperationError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error updating cart: {str(e)}'}), 500
+
+    return jsonify(serialize_cart(cart)), 200
 
 @cart_bp.route('/items', methods=['POST', 'OPTIONS'])
 @handle_options_request
+@jwt_required(optional=True)
 def add_to_cart():
     if request.method == 'OPTIONS':
         return make_response()
         
     try:
         user_id = get_jwt_identity()
-        if not user_id:
-            return jsonify({"message": "Authentication required"}), 401
-            
         data = request.get_json()
         product_id = data.get('product_id')
         quantity = data.get('quantity', 1)
@@ -64,29 +134,28 @@ def add_to_cart():
 
     if not product_id or not isinstance(quantity, int) or quantity < 1:
         return jsonify({'message': 'Invalid request data'}), 400
+    if quantity > MAX_CART_QUANTITY:
+        return jsonify({'message': f'A cart holds at most {MAX_CART_QUANTITY} of a product'}), 400
 
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({'message': 'Product not found'}), 404
+    if not user_id:
+        return update_guest_cart({product_id: ('add', quantity)})
 
-    cart = Cart.query.filter_by(user_id=user_id).first()
-    if not cart:
-        cart = Cart(user_id=user_id)
-        db.session.add(cart)
-        db.session.commit()
+    if not db.session.query(Product.id).filter_by(id=product_id).first():
+        return jsonify({'message': 'Product not found'}), 404
 
-    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
-    if cart_item:
-        cart_item.quantity += quantity
-    else:
-        cart_item = CartItem(cart_id=cart.id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-    
+    cart = get_or_create_cart(user_id)
+    try:
+        check_cart_quantities(cart, {product_id: ('add', quantity)})
+    except CartOperationError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    add_cart_item(cart.id, product_id, quantity)
     db.session.commit()
-    return jsonify(cart.to_dict_with_items()), 200
+    return jsonify(serialize_cart(cart)), 200
 
-@cart_bp.route('/items/<int:item_id>', methods=['PUT', 'OPTIONS'])
+@cart_bp.route('/items/<item_id>', methods=['PUT', 'OPTIONS'])
 @handle_options_request
+@jwt_required()
 def update_cart_item(item_id):
     if request.method == 'OPTIONS':
         return make_response()
@@ -101,23 +170,25 @@ def update_cart_item(item_id):
     except Exception as e:
         return jsonify({"message": f"Error processing request: {str(e)}"}), 400
 
-    if not isinstance(quantity, int) or quantity < 0:
+    if not isinstance(quantity, int) or quantity < 0 or quantity > MAX_CART_QUANTITY:
         return jsonify({'message': 'Invalid quantity'}), 400
 
     cart_item = CartItem.query.get(item_id)
     if not cart_item or cart_item.cart.user_id != user_id:
         return jsonify({'message': 'Cart item not found'}), 404
 
+    cart = cart_item.cart
     if quantity == 0:
         db.session.delete(cart_item)
     else:
         cart_item.quantity = quantity
     
     db.session.commit()
-    return jsonify(cart_item.cart.to_dict_with_items()), 200
+    return jsonify(serialize_cart(cart)), 200
 
-@cart_bp.route('/items/<int:item_id>', methods=['DELETE', 'OPTIONS'])
+@cart_bp.route('/items/<item_id>', methods=['DELETE', 'OPTIONS'])
 @handle_options_request
+@jwt_required()
 def remove_from_cart(item_id):
     if request.method == 'OPTIONS':
         return make_response()
@@ -137,4 +208,4 @@ def remove_from_cart(item_id):
     cart = cart_item.cart
     db.session.delete(cart_item)
     db.session.commit()
-    return jsonify(cart.to_dict_with_items()), 200
+    return jsonify(serialize_cart(cart)), 200
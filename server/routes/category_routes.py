@@ -3,13 +3,37 @@ from flask_jwt_extended import jwt_required
 
 from models import db, Category, Product
 from utils.auth_helpers import admin_required
+from utils.cache import response_cache
+from utils.conditional import make_etag, latest, not_modified, with_validators
+from utils.serializers import serialize_products
+from utils.product_cards import product_cards
+from utils.query_inspector import query_budget
+from sqlalchemy import func, or_
 
 category_bp = Blueprint('category', __name__)
 
+# Helper function computing validators for category listings from one aggregate query
+def category_validators(*criteria):
+    product_count, category_count, products_updated_at, categories_updated_at = db.session.query(
+        func.count(Product.id),
+        func.count(func.distinct(Category.id)),
+        func.max(Product.updated_at),
+        func.max(Category.updated_at)
+    ).select_from(Category).join(Product).filter(*criteria).one()
+    etag = make_etag(request.path, product_count, category_count, products_updated_at, categories_updated_at)
+    return etag, latest(products_updated_at, categories_updated_at)
+
 @category_bp.route('/', methods=['GET'])
+@query_budget(4)
+@response_cache.cached('categories')
 def get_all_categories():
     """Get all product categories"""
     try:
+        etag, last_modified = category_validators(Product.status == 'active')
+        unchanged = not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
+        
         # Get distinct categories from products
         categories = db.session.query(Category).join(Product).filter(
             Product.status == 'active'
@@ -29,7 +53,7 @@ def get_all_categories():
                 'image_url': 'https://images.unsplash.com/photo-1511688878353-3a2f5be94cd7?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80'
             })
         
-        return jsonify(formatted_categories), 200
+        return with_validators(jsonify(formatted_categories), etag, last_modified), 200
         
     except Exception as e:
         import traceback
@@ -57,9 +81,15 @@ def get_subcategories(category):
         return jsonify({'message': f'Error fetching subcategories: {str(e)}'}), 500
 
 @category_bp.route('/featured', methods=['GET'])
+@response_cache.cached('categories')
 def get_featured_categories():
     """Get categories with featured products"""
     try:
+        etag, last_modified = category_validators(Product.featured == True, Product.status == 'active')
+        unchanged = not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
+        
         # Get categories that have featured products
         featured_categories = db.session.query(Category).join(Product).filter(
             Product.featured == True,
@@ -80,35 +110,53 @@ def get_featured_categories():
                 'image_url': 'https://images.unsplash.com/photo-1511688878353-3a2f5be94cd7?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80'
             })
         
-        return jsonify(formatted_categories), 200
+        return with_validators(jsonify(formatted_categories), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'message': f'Error fetching featured categories: {str(e)}'}), 500
 
 @category_bp.route('/<category>/products', methods=['GET'])
+@query_budget(8)
 def get_products_by_category(category):
-    """Get products by category"""
+    """
+    Get active products in a category
+
+    The category is matched by slug or id; ``subcategory`` narrows the
+    listing to one of its child categories (by slug). ``view=card`` returns
+    compact product cards instead of full product dictionaries.
+    """
     try:
         # Get query parameters
         subcategory = request.args.get('subcategory')
         limit = request.args.get('limit', 20, type=int)
         offset = request.args.get('offset', 0, type=int)
+        card_view = request.args.get('view') == 'card'
         
-        # Base query
-        query = Product.query.filter_by(category=category, status='active')
+        parent = Category.query.filter(or_(Category.slug == category, Category.id == category)).first()
+        if not parent:
+            return jsonify({'message': 'Category not found'}), 404
         
-        # Apply subcategory filter if provided
+        target = parent
         if subcategory:
-            query = query.filter_by(subcategory=subcategory)
+            target = Category.query.filter_by(slug=subcategory, parent_id=parent.id).first()
+            if not target:
+                return jsonify({'message': 'Subcategory not found'}), 404
+        
+        # Base query
+        query = Product.query.filter(Product.category_id == target.id, Product.status == 'active')
         
         # Get total count
         total = query.count()
         
         # Get products with pagination
-        products = query.order_by(Product.created_at.desc()).offset(offset).limit(limit).all()
+        query = query.order_by(Product.created_at.desc()).offset(offset).limit(limit)
+        if card_view:
+            products = product_cards.get_many([row.id for row in query.with_entities(Product.id).all()])
+        else:
+            products = serialize_products(query.all())
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'total': total,
             'category': category,
             'subcategory': subcategory if subcategory else None
@@ -6,6 +6,7 @@ from datetime import datetime
 from models import db, Order, OrderItem, Cart, CartItem, Product, User
 from utils.validators import validate_order
 from utils.email_service import send_order_confirmation_email
+from utils.inventory import reserve_stock, release_stock, InsufficientStock
 
 order_bp = Blueprint('order', __name__)
 
@@ -22,7 +23,7 @@ def get_user_orders():
         offset = request.args.get('offset', 0, type=int)
         
         # Base query
-        query = Order.query.filter_by(user_id=user_id)
+        query = Order.query.filter_by(customer_id=user_id)
         
         # Apply status filter if provided
         if status:
@@ -57,7 +58,7 @@ def get_order_details(order_id):
         
         # Check if user owns the order or is an admin
         user = User.query.get(user_id)
-        if order.user_id != user_id and user.role != 'admin':
+        if order.customer_id != user_id and user.role != 'admin':
             return jsonify({'message': 'Unauthorized access to this order'}), 403
         
         return jsonify(order.to_dict()), 200
@@ -80,79 +81,80 @@ def create_order():
     try:
         # Find user's cart
         cart = Cart.query.filter_by(user_id=user_id).first()
+        cart_items = CartItem.query.filter_by(cart_id=cart.id).all() if cart else []
         
-        if not cart or not cart.items:
+        if not cart_items:
             return jsonify({'message': 'Cart is empty'}), 400
         
-        # Calculate total amount
-        total_amount = 0
-        for item in cart.items:
-            total_amount += item.price * item.quantity
+        # All cart products in one query
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_([item.product_id for item in cart_items])).all()
+        }
+        
+        for item in cart_items:
+            product = products.get(item.product_id)
+            if not product or product.status != 'active':
+                return jsonify({
+                    'message': f'Product {product.name if product else "Unknown"} is no longer available'
+                }), 400
+        
+        # Take the stock with one conditional update, so concurrent checkouts can't oversell
+        quantities = {}
+        for item in cart_items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        try:
+            reserve_stock(quantities)
+        except InsufficientStock as e:
+            db.session.rollback()
+            return jsonify({
+                'message': f'Not enough stock for {", ".join(products[product_id].name for product_id in e.product_ids)}'
+            }), 400
         
         # Create order
         order = Order(
             id=str(uuid.uuid4()),
-            user_id=user_id,
+            customer_id=user_id,
             status='pending',
-            payment_status='pending',
-            payment_method=data['payment_method'],
             shipping_address=data['shipping_address'],
             billing_address=data.get('billing_address', data['shipping_address']),
-            total_amount=total_amount,
-            notes=data.get('notes', '')
+            total_amount=0
         )
         
-        db.session.add(order)
-        db.session.flush()  # Get the ID without committing
-        
-        # Create order items from cart items
-        for cart_item in cart.items:
-            # Get product
-            product = Product.query.get(cart_item.product_id)
-            
-            if not product or product.status != 'active':
-                db.session.rollback()
-                return jsonify({
-                    'message': f'Product {product.name if product else "Unknown"} is no longer available'
-                }), 400
-            
-            if product.stock_quantity < cart_item.quantity:
-                db.session.rollback()
-                return jsonify({
-                    'message': f'Not enough stock for {product.name}'
-                }), 400
-            
-            # Create order item
-            order_item = OrderItem(
+        # Create order items from cart items, at the price paid today
+        total_amount = 0
+        for cart_item in cart_items:
+            product = products[cart_item.product_id]
+            unit_price = product.discount_price if product.discount_price is not None else product.price
+            total_amount += unit_price * cart_item.quantity
+            db.session.add(OrderItem(
                 id=str(uuid.uuid4()),
                 order_id=order.id,
-                product_id=cart_item.product_id,
+                product_id=product.id,
+                product_name=product.name,
                 quantity=cart_item.quantity,
-                price=cart_item.price,
+                price_per_unit=unit_price,
                 # If this came from an affiliate link, we would set these:
                 # affiliate_id=cart_item.affiliate_id,
                 # commission_rate=affiliate_profile.commission_rate if affiliate_profile else 0,
                 # commission_amount=calculated_commission
-            )
-            
-            db.session.add(order_item)
-            
-            # Update product stock
-            product.stock_quantity -= cart_item.quantity
+            ))
+        order.total_amount = total_amount
+        db.session.add(order)
         
         # Clear cart
         CartItem.query.filter_by(cart_id=cart.id).delete()
         
-        # Commit changes
-        db.session.commit()
-        
         # Get user for email
         user = User.query.get(user_id)
         
-        # Send order confirmation email
+        # Queue the order confirmation email with the order itself
         if user and user.email:
             send_order_confirmation_email(user.email, order)
         
+        # Commit changes
+        db.session.commit()
+        
         return jsonify({
             'message': 'Order created successfully',
             'order': order.to_dict()
@@ -170,7 +172,7 @@ def cancel_order(order_id):
     
     try:
         # Find order
-        order = Order.query.filter_by(id=order_id, user_id=user_id).first()
+        order = Order.query.filter_by(id=order_id, customer_id=user_id).first()
         
         if not order:
             return jsonify({'message': 'Order not found'}), 404
@@ -184,10 +186,12 @@ def cancel_order(order_id):
         order.updated_at = datetime.utcnow()
         
         # Restore product stock
-        for item in order.items:
-            product = Product.query.get(item.product_id)
-            if product:
-                product.stock_quantity += item.quantity
+        quantities = {}
+        for product_id, quantity in db.session.query(OrderItem.product_id, OrderItem.quantity).filter(
+            OrderItem.order_id == order.id, OrderItem.product_id.isnot(None)
+        ):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        release_stock(quantities)
         
         db.session.commit()
         
@@ -226,7 +230,7 @@ def update_order_status(order_id):
         # Check user authorization
         user = User.query.get(user_id)
         
-        if not user or (user.role != 'admin' and user_id != order.user_id):
+        if not user or (user.role != 'admin' and user_id != order.customer_id):
             return jsonify({'message': 'Unauthorized to update this order'}), 403
         
         # Update order status
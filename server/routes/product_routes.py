@@ -1,16 +1,30 @@
 from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 import uuid
 import os
 from werkzeug.utils import secure_filename
-from slugify import slugify
 
 from models import db, Product, ProductImage, SellerProfile, User, Profile, Category
 import os
 from utils.auth_helpers import seller_required, admin_required
+from utils.principal import current_principal
+from utils.serializers import serialize_products
+from utils.pagination import apply_keyset, encode_cursor, InvalidCursorError
+from utils.search import index_product, remove_product_from_index
+from utils.cache import response_cache, invalidate_catalog
+from utils.conditional import make_etag, latest, not_modified, with_validators
+from utils.slugs import assign_unique_slug
+from utils.streaming import stream_json_array, page_params
+from utils.product_cards import product_cards
+from utils.query_inspector import query_budget
 
 product_bp = Blueprint('product', __name__)
 
+# Largest page the product listing returns
+MAX_PRODUCT_PAGE_SIZE = 100
+
 @product_bp.route('/for-affiliates', methods=['GET'])
 @jwt_required()
 def get_products_for_affiliates():
@@ -29,9 +43,9 @@ def get_products_for_affiliates():
             Product.is_approved == 1
         ).order_by(Product.created_at.desc()).all()
 
+        products = [product for product, _ in products_with_commission]
         results = []
-        for product, commission_rate in products_with_commission:
-            product_dict = product.to_dict()
+        for product_dict, (_, commission_rate) in zip(serialize_products(products), products_with_commission):
             product_dict['default_commission_rate'] = float(commission_rate) if commission_rate is not None else None
             results.append(product_dict)
 
@@ -41,26 +55,57 @@ def get_products_for_affiliates():
         # from app import logger; logger.error(f"Error fetching products for affiliates: {e}")
         return jsonify({'message': 'An internal error occurred'}), 500
 
-product_bp = Blueprint('product', __name__)
-
 # Helper function to check if file extension is allowed
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Helper function returning (image_count, latest_image_update) for a set of products,
+# used as the image part of product ETags
+def image_version(product_ids):
+    if not product_ids:
+        return 0, None
+    return db.session.query(
+        func.count(ProductImage.id),
+        func.max(ProductImage.updated_at)
+    ).filter(ProductImage.product_id.in_(product_ids)).one()
+
 @product_bp.route('/', methods=['GET'])
+@query_budget(8)
+@response_cache.cached('products')
 def get_all_products():
-    """Get all active products"""
+    """
+    Get all active products
+
+    Two pagination modes are supported:
+
+    - offset mode (default): ``limit`` and ``offset``; the response includes
+      ``total`` unless ``include_total=false``.
+    - cursor mode: pass ``cursor`` (empty for the first page) and follow the
+      ``next_cursor`` from each response. Pages are keyed on
+      ``(created_at, id)`` so deep pages cost the same as the first one.
+      ``total`` is only computed when ``include_total=true``.
+
+    ``view=card`` returns compact product cards (see
+    ``utils.product_cards``) instead of full product dictionaries.
+    """
     try:
         # Get query parameters
         category = request.args.get('category')
         seller_id = request.args.get('seller_id')
         search = request.args.get('search')
-        limit = request.args.get('limit', 20, type=int)
-        offset = request.args.get('offset', 0, type=int)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PRODUCT_PAGE_SIZE)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        cursor = request.args.get('cursor')
+        use_cursor = cursor is not None
+        include_total = request.args.get('include_total', 'false' if use_cursor else 'true').lower() in ('true', '1', 'yes')
+        card_view = request.args.get('view') == 'card'
         
         # Base query - join Product with SellerProfile to access commission rate
         query = db.session.query(Product, SellerProfile.default_commission_rate).join(SellerProfile, Product.seller_id == SellerProfile.id).filter(Product.status == 'active')
+        if card_view:
+            # Cards are built separately; the page query only needs keys and validators
+            query = query.options(load_only(Product.id, Product.created_at, Product.updated_at))
         
         # Apply filters
         if category:
@@ -76,24 +121,61 @@ def get_all_products():
                                 Product.description.ilike(f'%{search}%'))
         
         # Get total count before pagination
-        total = query.count()
+        total = query.count() if include_total else None
         
         # Apply pagination
-        results = query.order_by(Product.created_at.desc()).offset(offset).limit(limit).all()
+        next_cursor = None
+        if use_cursor:
+            try:
+                page_query = apply_keyset(query, Product.created_at, Product.id, cursor or None)
+            except InvalidCursorError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+            # Fetch one extra row to find out whether another page exists
+            results = page_query.limit(limit + 1).all()
+            if results and len(results) > limit:
+                results = results[:limit]
+                last_product = results[-1][0]
+                next_cursor = encode_cursor(last_product.created_at, last_product.id)
+        else:
+            results = query.order_by(Product.created_at.desc()).offset(offset).limit(limit).all()
+
+        # Answer conditional requests from the page rows before serializing them
+        image_count, images_updated_at = image_version([product.id for product, _ in results])
+        etag = make_etag(
+            request.query_string.decode('utf-8'),
+            total,
+            next_cursor,
+            image_count,
+            images_updated_at,
+            *[(product.id, product.updated_at, commission_rate) for product, commission_rate in results]
+        )
+        last_modified = latest(images_updated_at, *[product.updated_at for product, _ in results])
+        unchanged = not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
 
         # Format products to include commission rate
-        products_list = []
-        for product, commission_rate in results:
-            product_dict = product.to_dict()
-            product_dict['commission_rate'] = float(commission_rate) if commission_rate is not None else 0
-            products_list.append(product_dict)
+        products = [product for product, _ in results]
+        if card_view:
+            products_list = product_cards.get_many([product.id for product in products])
+        else:
+            products_list = []
+            for product_dict, (_, commission_rate) in zip(serialize_products(products), results):
+                product_dict['commission_rate'] = float(commission_rate) if commission_rate is not None else 0
+                products_list.append(product_dict)
         
-        return jsonify({
+        response = {
             'products': products_list,
-            'total': total,
-            'limit': limit,
-            'offset': offset
-        }), 200
+            'limit': limit
+        }
+        if use_cursor:
+            response['next_cursor'] = next_cursor
+        else:
+            response['offset'] = offset
+        if include_total:
+            response['total'] = total
+
+        return with_validators(jsonify(response), etag, last_modified), 200
         
     except Exception as e:
         import traceback
@@ -102,6 +184,8 @@ def get_all_products():
         return jsonify({'message': f'Error fetching products: {str(e)}'}), 500
 
 @product_bp.route('/<slug>', methods=['GET'])
+@query_budget(8)
+@response_cache.cached(lambda slug: f'product:{slug}')
 def get_product(slug):
     """Get a product by slug"""
     try:
@@ -110,7 +194,14 @@ def get_product(slug):
         if not product:
             return jsonify({'message': 'Product not found'}), 404
         
-        return jsonify(product.to_dict()), 200
+        image_count, images_updated_at = image_version([product.id])
+        etag = make_etag(product.id, product.updated_at, image_count, images_updated_at)
+        last_modified = latest(product.updated_at, images_updated_at)
+        unchanged = not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
+        
+        return with_validators(jsonify(product.to_dict()), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'message': f'Error fetching product: {str(e)}'}), 500
@@ -134,19 +225,25 @@ def get_pending_products():
             User, SellerProfile.user_id == User.id
         ).filter(
             Product.is_approved == 0
-        ).order_by(Product.created_at.asc()).all()
+        )
         
         # Format the response
-        result = []
-        for product, seller_name, seller_user_id in products_with_seller:
-            product_dict = product.to_dict()
-            product_dict['sellerBusinessName'] = seller_name
-            product_dict['seller_user_id'] = seller_user_id
-            result.append(product_dict)
+        def serialize(rows):
+            products = [row[0] for row in rows]
+            result = []
+            for product_dict, (_, seller_name, seller_user_id) in zip(serialize_products(products), rows):
+                product_dict['sellerBusinessName'] = seller_name
+                product_dict['seller_user_id'] = seller_user_id
+                result.append(product_dict)
+            return result
         
         # Return real data only, no mock data
         # This ensures the admin sees the actual state of the database
-        return jsonify(result), 200
+        limit, offset = page_params()
+        return stream_json_array(
+            products_with_seller, Product.id, lambda row: row[0].id, serialize,
+            sort_column=Product.created_at, limit=limit, offset=offset
+        ), 200
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -156,6 +253,7 @@ def get_pending_products():
 @jwt_required()
 @admin_required
 def get_all_products_admin():
+    """Get every product with seller and category names, streamed (admin only)"""
     try:
         # Get all products with seller information
         products_with_seller = db.session.query(
@@ -171,18 +269,24 @@ def get_all_products_admin():
             Profile, User.id == Profile.user_id
         ).outerjoin(
             Category, Product.category_id == Category.id
-        ).order_by(Product.created_at.desc()).all()
+        )
         
         # Format the response
-        result = []
-        for product, seller_name, seller_user_id, category_name in products_with_seller:
-            product_dict = product.to_dict()
-            product_dict['seller_name'] = seller_name
-            product_dict['seller_user_id'] = seller_user_id
-            product_dict['category'] = category_name or 'Uncategorized'
-            result.append(product_dict)
+        def serialize(rows):
+            products = [row[0] for row in rows]
+            result = []
+            for product_dict, (_, seller_name, seller_user_id, category_name) in zip(serialize_products(products), rows):
+                product_dict['seller_name'] = seller_name
+                product_dict['seller_user_id'] = seller_user_id
+                product_dict['category'] = category_name or 'Uncategorized'
+                result.append(product_dict)
+            return result
         
-        return jsonify(result), 200
+        limit, offset = page_params()
+        return stream_json_array(
+            products_with_seller, Product.id, lambda row: row[0].id, serialize,
+            sort_column=Product.created_at, descending=True, limit=limit, offset=offset
+        ), 200
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -216,18 +320,9 @@ def create_product():
         if not category:
             return jsonify({'message': f'Category with slug "{category_slug}" not found'}), 400
 
-        # --- Slug Generation ---
-        base_slug = slugify(data.get('name'))
-        slug = base_slug
-        counter = 1
-        while Product.query.filter_by(slug=slug).first():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-
         # --- Product Creation ---
         new_product = Product(
             name=data.get('name'),
-            slug=slug,
             description=data.get('description'),
             long_description=data.get('long_description'),
             price=data.get('price'),
@@ -238,8 +333,8 @@ def create_product():
             status='pending',
             is_approved=0
         )
-        db.session.add(new_product)
-        db.session.flush()  # Flush to get the new_product.id
+        # Allocates the slug and flushes to get the new_product.id
+        assign_unique_slug(new_product, data.get('name'))
 
         # --- Image Upload Handling ---
         files = request.files.getlist('images')
@@ -275,6 +370,8 @@ def create_product():
             return jsonify({'message': 'No valid images were uploaded.'}), 400
 
         db.session.commit()
+        index_product(new_product)
+        invalidate_catalog(new_product.slug)
         return jsonify({
             'message': 'Product created successfully and is pending review.',
             'product': new_product.to_dict()
@@ -295,32 +392,24 @@ def create_product():
 def update_product(product_id):
     """Update an existing product (owner only)"""
     try:
-        user_id = get_jwt_identity()
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
+        seller_id = current_principal().seller_profile_id
 
         product = Product.query.get(product_id)
         if not product:
             return jsonify({'message': 'Product not found'}), 404
 
         # Authorization check: ensure the seller owns this product
-        if product.seller_id != seller_profile.id:
+        if product.seller_id != seller_id:
             return jsonify({'message': 'Unauthorized to edit this product'}), 403
 
         data = request.form
+        old_slug = product.slug
 
         # Update fields if they are provided in the request
         if 'name' in data:
             product.name = data['name']
             # Regenerate slug if name changes
-            base_slug = slugify(data['name'])
-            slug = base_slug
-            counter = 1
-            while Product.query.filter(Product.slug == slug, Product.id != product.id).first():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            product.slug = slug
+            assign_unique_slug(product, data['name'])
         
         if 'description' in data:
             product.description = data['description']
@@ -346,6 +435,8 @@ def update_product(product_id):
         # Note: Image updates are not handled in this request.
 
         db.session.commit()
+        index_product(product)
+        invalidate_catalog(old_slug, product.slug)
         return jsonify({
             'message': 'Product updated successfully and is pending re-approval.',
             'product': product.to_dict()
@@ -365,17 +456,14 @@ def update_product(product_id):
 def delete_product(product_id):
     """Delete a product (owner only)"""
     try:
-        user_id = get_jwt_identity()
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
+        seller_id = current_principal().seller_profile_id
 
         product = Product.query.get(product_id)
         if not product:
             return jsonify({'message': 'Product not found'}), 404
 
         # Authorization check
-        if product.seller_id != seller_profile.id:
+        if product.seller_id != seller_id:
             return jsonify({'message': 'Unauthorized to delete this product'}), 403
 
         # Delete associated images from the filesystem first
@@ -395,8 +483,11 @@ def delete_product(product_id):
             db.session.delete(link)
         
         # Then delete the product
+        slug = product.slug
         db.session.delete(product)
         db.session.commit()
+        remove_product_from_index(product_id)
+        invalidate_catalog(slug)
 
         return jsonify({'message': 'Product deleted successfully'}), 200
 
@@ -462,6 +553,7 @@ def upload_product_images(product_id):
                 uploaded_images.append(image)
         
         db.session.commit()
+        invalidate_catalog(product.slug)
         
         return jsonify({
             'message': 'Images uploaded successfully',
@@ -484,6 +576,8 @@ def approve_product(product_id):
         product.status = 'active'
         product.is_approved = 1
         db.session.commit()
+        index_product(product)
+        invalidate_catalog(product.slug)
         return jsonify({'message': 'Product approved successfully', 'product': product.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
@@ -501,6 +595,8 @@ def reject_product(product_id):
         product.status = 'rejected'
         product.is_approved = 2 # Using 2 for rejected
         db.session.commit()
+        index_product(product)
+        invalidate_catalog(product.slug)
         return jsonify({'message': 'Product rejected successfully', 'product': product.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
@@ -12,6 +12,9 @@ from models.seller_profile import SellerProfile
 from models.affiliate_profile import AffiliateProfile
 from models.product import Product
 from models.order import Order
+from utils.cache import invalidate_catalog
+from utils.identity import identity_map
+from utils.query_inspector import query_budget
 
 logger = logging.getLogger(__name__)
 
@@ -21,16 +24,17 @@ profile_bp = Blueprint('profile_bp', __name__, url_prefix='/api/profile')
 @jwt_required()
 def get_profile():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
     if not user or not user.profile:
         return jsonify({'message': 'Profile not found'}), 404
     return jsonify(user.profile.to_dict_full()), 200
 
 @profile_bp.route('/me', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_current_user():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -62,7 +66,7 @@ def get_current_user():
 def update_current_user_profile():
     user_id = get_jwt_identity()
     data = request.get_json()
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -96,6 +100,12 @@ def update_current_user_profile():
                 setattr(affiliate_profile, key, value)
     
     db.session.commit()
+    # Reload the expired user and profiles in one query
+    user = identity_map.user(user_id, refresh=True)
+    
+    if user.role == 'seller' and 'seller_profile' in data:
+        # Listings show the seller's business name and commission rate
+        invalidate_catalog()
     
     # Return the updated user data with full profile information
     user_data = user.to_dict()
@@ -119,7 +129,7 @@ def update_current_user_profile():
 def update_profile():
     user_id = get_jwt_identity()
     data = request.form
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
 
     if not user.profile:
         return jsonify({'message': 'Profile not found'}), 404
@@ -167,6 +177,8 @@ def update_seller_profile():
             setattr(profile, key, value)
 
     db.session.commit()
+    # Listings show the seller's business name and commission rate
+    invalidate_catalog()
     return jsonify(profile.user.profile.to_dict_full()), 200
 
 @profile_bp.route('/affiliate', methods=['PUT'])
@@ -175,7 +187,7 @@ def update_affiliate_profile():
     user_id = get_jwt_identity()
     data = request.get_json()
     
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
     if not user or user.role != 'affiliate':
         return jsonify({'message': 'User not found or not an affiliate'}), 404
     
@@ -194,7 +206,7 @@ def update_affiliate_profile():
 @jwt_required()
 def get_dashboard_stats():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = identity_map.user(user_id)
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 
-from models.search import search_products, search_sellers
+from utils.search import search_products, search_sellers, suggest
+from utils.serializers import serialize_products
 
 search_bp = Blueprint('search', __name__)
 
@@ -11,12 +12,11 @@ def search_products_route():
         # Get query parameters
         query = request.args.get('q', '')
         category = request.args.get('category')
-        subcategory = request.args.get('subcategory')
         price_min = request.args.get('price_min', type=float)
         price_max = request.args.get('price_max', type=float)
         seller_id = request.args.get('seller_id')
         featured = request.args.get('featured', type=bool)
-        sort_by = request.args.get('sort_by', 'created_at')
+        sort_by = request.args.get('sort_by', 'relevance')
         sort_order = request.args.get('sort_order', 'desc')
         limit = request.args.get('limit', 20, type=int)
         offset = request.args.get('offset', 0, type=int)
@@ -24,7 +24,6 @@ def search_products_route():
         # Build filters
         filters = {
             'category': category,
-            'subcategory': subcategory,
             'price_min': price_min,
             'price_max': price_max,
             'seller_id': seller_id,
@@ -37,11 +36,12 @@ def search_products_route():
         filters = {k: v for k, v in filters.items() if v is not None}
         
         # Search products
-        products, total = search_products(query, filters, limit, offset)
+        products, total, facets = search_products(query, filters, limit, offset)
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': serialize_products(products),
             'total': total,
+            'facets': facets,
             'query': query,
             'filters': filters
         }), 200
@@ -49,6 +49,21 @@ def search_products_route():
     except Exception as e:
         return jsonify({'message': f'Error searching products: {str(e)}'}), 500
 
+@search_bp.route('/suggest', methods=['GET'])
+def suggest_route():
+    """Autocomplete suggestions for the search box"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 8, type=int), 20)
+        
+        return jsonify({
+            'suggestions': suggest(query, limit),
+            'query': query
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Error fetching suggestions: {str(e)}'}), 500
+
 @search_bp.route('/sellers', methods=['GET'])
 def search_sellers_route():
     """Search for sellers"""
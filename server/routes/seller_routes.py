@@ -2,8 +2,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
 
-from models import db, Product, Order, SellerProfile, User
+from models import db, Product, Order, OrderItem
 from utils.auth_helpers import seller_required
+from utils.principal import current_principal
+from utils.serializers import serialize_products, serialize_orders
+from utils.streaming import stream_json_array, page_params
+from utils.cache import invalidate_catalog
+from utils.identity import identity_map
 
 logger = logging.getLogger(__name__)
 seller_bp = Blueprint('seller_bp', __name__, url_prefix='/api/sellers')
@@ -21,19 +26,14 @@ def get_seller_dashboard():
 @jwt_required()
 @seller_required
 def get_seller_dashboard_stats():
-    user_id = get_jwt_identity()
+    seller_id = current_principal().seller_profile_id
     try:
-        # Get the seller profile
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
-            
         # Get products count
-        products_count = Product.query.filter_by(seller_id=seller_profile.id).count()
+        products_count = Product.query.filter_by(seller_id=seller_id).count()
         
         # Get orders count and total sales
         # This is a simplified query. A real implementation would be more complex.
-        orders = Order.query.join(Order.items).join(Product).filter(Product.seller_id == seller_profile.id).all()
+        orders = Order.query.join(Order.items).join(Product).filter(Product.seller_id == seller_id).all()
         orders_count = len(orders)
         total_sales = sum(order.total_amount for order in orders) if orders else 0
         
@@ -44,7 +44,7 @@ def get_seller_dashboard_stats():
             # Count actual products sold from order items
             products_sold_query = db.session.query(db.func.sum(OrderItem.quantity)).join(Product).filter(
                 OrderItem.order_id.in_([order.id for order in orders]),
-                Product.seller_id == seller_profile.id
+                Product.seller_id == seller_id
             ).scalar()
             products_sold = products_sold_query or 0
         
@@ -63,17 +63,12 @@ def get_seller_dashboard_stats():
 @jwt_required()
 @seller_required
 def get_seller_recent_activity():
-    user_id = get_jwt_identity()
+    seller_id = current_principal().seller_profile_id
     try:
-        # Get the seller profile
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
-            
         # Get recent orders
         # This is a simplified query. A real implementation would be more complex.
         recent_orders = Order.query.join(Order.items).join(Product).filter(
-            Product.seller_id == seller_profile.id
+            Product.seller_id == seller_id
         ).order_by(Order.created_at.desc()).limit(5).all()
         
         # Format the recent activity data
@@ -96,27 +91,19 @@ def get_seller_recent_activity():
 @jwt_required()
 @seller_required
 def get_seller_products():
-    user_id = get_jwt_identity()
-    seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-    if not seller_profile:
-        return jsonify({'message': 'Seller profile not found'}), 404
-    products = Product.query.filter_by(seller_id=seller_profile.id).all()
-    return jsonify([product.to_dict() for product in products]), 200
+    seller_id = current_principal().seller_profile_id
+    products = Product.query.filter_by(seller_id=seller_id).all()
+    return jsonify(serialize_products(products)), 200
 
 @seller_bp.route('/top-products', methods=['GET'])
 @jwt_required()
 @seller_required
 def get_top_products():
-    user_id = get_jwt_identity()
+    seller_id = current_principal().seller_profile_id
     
     try:
-        # Get the seller profile
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
-            
         # Get products
-        products = Product.query.filter_by(seller_id=seller_profile.id).order_by(Product.created_at.desc()).limit(5).all()
+        products = Product.query.filter_by(seller_id=seller_id).order_by(Product.created_at.desc()).limit(5).all()
         
         # Format the products data
         top_products = []
@@ -140,17 +127,12 @@ def get_top_products():
 @jwt_required()
 @seller_required
 def get_seller_insights():
-    user_id = get_jwt_identity()
+    seller_id = current_principal().seller_profile_id
     timeframe = request.args.get('timeframe', '30days')
     
     try:
-        # Get the seller profile
-        seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
-            return jsonify({'message': 'Seller profile not found'}), 404
-            
         # Get products count
-        products = Product.query.filter_by(seller_id=seller_profile.id).all()
+        products = Product.query.filter_by(seller_id=seller_id).all()
         products_count = len(products)
         
         # Create mock data for insights since we don't have real data yet
@@ -198,14 +180,18 @@ def get_seller_insights():
 @jwt_required()
 @seller_required
 def get_seller_orders():
-    user_id = get_jwt_identity()
-    seller_profile = SellerProfile.query.filter_by(user_id=user_id).first()
-    if not seller_profile:
-        return jsonify({'message': 'Seller profile not found'}), 404
+    seller_id = current_principal().seller_profile_id
     
-    # This is a simplified query. A real implementation would be more complex.
-    orders = Order.query.join(Order.items).join(Product).filter(Product.seller_id == seller_profile.id).all()
-    return jsonify([order.to_dict() for order in orders]), 200
+    # Orders containing at least one of the seller's products, newest first
+    seller_order_ids = db.session.query(OrderItem.order_id).join(
+        Product, OrderItem.product_id == Product.id
+    ).filter(Product.seller_id == seller_id)
+    orders = Order.query.filter(Order.id.in_(seller_order_ids))
+    limit, offset = page_params()
+    return stream_json_array(
+        orders, Order.id, lambda order: order.id, serialize_orders,
+        sort_column=Order.created_at, descending=True, limit=limit, offset=offset
+    ), 200
 
 @seller_bp.route('/profile', methods=['GET', 'PUT'])
 @jwt_required()
@@ -217,7 +203,7 @@ def seller_profile():
     if request.method == 'GET':
         try:
             # Get the user with all related profiles
-            user = User.query.get(user_id)
+            user = identity_map.user(user_id)
             if not user:
                 return jsonify({'message': 'User not found'}), 404
                 
@@ -249,7 +235,7 @@ def seller_profile():
         
         try:
             # Get the user with all related profiles
-            user = User.query.get(user_id)
+            user = identity_map.user(user_id)
             if not user:
                 return jsonify({'message': 'User not found'}), 404
                 
@@ -264,6 +250,12 @@ def seller_profile():
                     setattr(seller_profile, key, value)
             
             db.session.commit()
+            # Listings show the seller's business name and commission rate
+            invalidate_catalog()
+            
+            # Reload the expired user and profiles in one query
+            user = identity_map.user(user_id, refresh=True)
+            seller_profile = user.seller_profile
             
             # Return the updated user data with full profile information
             user_data = user.to_dict()
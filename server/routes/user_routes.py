@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import bcrypt
 import uuid
+from sqlalchemy.orm import selectinload
 
 from models import db, User, Profile
 from utils.auth_helpers import admin_required
+from utils.streaming import stream_json_array, page_params
+from utils.passwords import password_hasher, PasswordHasherBusy, busy_response
+from utils.principal import current_principal
+from utils.identity import identity_map
+from utils.blocklist import blocklist_cache, revoke_user_tokens
 
 user_bp = Blueprint('user', __name__)
 
@@ -12,10 +17,20 @@ user_bp = Blueprint('user', __name__)
 @jwt_required()
 @admin_required
 def get_all_users():
-    """Get all users (admin only)"""
+    """Get all users, streamed; accepts optional limit/offset (admin only)"""
     try:
-        users = User.query.all()
-        return jsonify([user.to_dict() for user in users]), 200
+        # The profiles are loaded per batch so to_dict does not query per user
+        users = User.query.options(
+            selectinload(User.profile),
+            selectinload(User.seller_profile),
+            selectinload(User.affiliate_profile)
+        )
+        limit, offset = page_params()
+        return stream_json_array(
+            users, User.id, lambda user: user.id,
+            lambda batch: [user.to_dict() for user in batch],
+            sort_column=User.created_at, descending=True, limit=limit, offset=offset
+        ), 200
     except Exception as e:
         return jsonify({'message': f'Error fetching users: {str(e)}'}), 500
 
@@ -39,15 +54,15 @@ def get_user(user_id):
     
     try:
         # Check if the user is requesting their own data or is an admin
-        user = User.query.get(user_id)
+        user = identity_map.user(user_id)
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
         
-        current_user = User.query.get(current_user_id)
+        current_user = current_principal()
         
         # Only allow users to access their own data or admins to access any data
-        if current_user_id != user_id and current_user.role != 'admin':
+        if current_user_id != user_id and not (current_user and current_user.is_admin):
             return jsonify({'message': 'Unauthorized'}), 403
         
         return jsonify(user.to_dict()), 200
@@ -67,15 +82,15 @@ def update_user(user_id):
     
     try:
         # Check if the user is updating their own data or is an admin
-        current_user = User.query.get(current_user_id)
+        current_user = current_principal()
         
         if not current_user:
             return jsonify({'message': 'Current user not found'}), 404
         
-        if current_user_id != user_id and current_user.role != 'admin':
+        if current_user_id != user_id and not current_user.is_admin:
             return jsonify({'message': 'Unauthorized'}), 403
         
-        user = User.query.get(user_id)
+        user = identity_map.user(user_id)
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -90,17 +105,26 @@ def update_user(user_id):
         
         if 'password' in data and data['password']:
             # Hash new password
-            hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            user.password = hashed_password
+            user.password = password_hasher.hash(data['password'])
         
         # Only admins can update role
-        if 'role' in data and current_user.role == 'admin':
+        revocation = None
+        if 'role' in data and current_user.is_admin and data['role'] != user.role:
             user.role = data['role']
+            # Outstanding tokens carry the old role; force a refresh
+            revocation = revoke_user_tokens(user.id)
         
         db.session.commit()
+        if revocation:
+            blocklist_cache.user_revoked(revocation)
         
+        # Reload the expired user and profiles in one query
+        user = identity_map.user(user_id, refresh=True)
         return jsonify(user.to_dict()), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error updating user: {str(e)}'}), 500
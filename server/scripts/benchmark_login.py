@@ -0,0 +1,102 @@
+"""
+Benchmark login throughput and latency under concurrent load
+
+Creates (or reuses) a verified benchmark user, then fires --requests logins
+from --concurrency threads through the app's test client while another
+thread keeps polling /health. Reports login throughput, p50/p99 latency,
+how many logins the hashing pool turned away with 429, and the /health
+p99 to show whether other requests were starved.
+
+Tune the pool with BCRYPT_LOG_ROUNDS, BCRYPT_POOL_SIZE and
+BCRYPT_QUEUE_SIZE in the environment.
+
+Usage:
+    python scripts/benchmark_login.py [--requests 200] [--concurrency 16]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to import from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, limiter
+from models import db, User
+from utils.passwords import password_hasher
+
+BENCHMARK_EMAIL = 'login-benchmark@afripulse.test'
+BENCHMARK_PASSWORD = 'Benchmark@123'
+
+
+def ensure_user():
+    """Create the benchmark user with a hash at the configured work factor"""
+    user = User.query.filter_by(email=BENCHMARK_EMAIL).first()
+    if user is None:
+        user = User(id=str(uuid.uuid4()), email=BENCHMARK_EMAIL, role='customer', is_email_verified=True)
+        db.session.add(user)
+    user.password = password_hasher.hash(BENCHMARK_PASSWORD)
+    db.session.commit()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='total login attempts')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    args = parser.parse_args()
+
+    # Measure the hashing pool, not the per-IP rate limits
+    limiter.enabled = False
+
+    with app.app_context():
+        ensure_user()
+
+    latencies, statuses = [], []
+    health_latencies = []
+    done = threading.Event()
+
+    def login(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json={'email': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD})
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses.append(response.status_code)
+
+    def poll_health():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/health')
+            health_latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    health_thread = threading.Thread(target=poll_health, daemon=True)
+    health_thread.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    health_thread.join()
+
+    succeeded = statuses.count(200)
+    print(f"work factor {password_hasher.rounds}, pool {password_hasher.pool_size}, queue {password_hasher.queue_size}")
+    print(f"{args.requests} logins, {args.concurrency} clients, {elapsed:.2f}s")
+    print(f"throughput      {succeeded / elapsed:.1f} successful logins/s")
+    print(f"login latency   p50 {statistics.median(latencies):.1f}ms  p99 {percentile(latencies, 0.99):.1f}ms")
+    print(f"responses       200: {succeeded}  429: {statuses.count(429)}  other: {len(statuses) - succeeded - statuses.count(429)}")
+    print(f"/health latency p50 {statistics.median(health_latencies):.1f}ms  p99 {percentile(health_latencies, 0.99):.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark token blocklist lookups as the table grows
+
+Inserts already-expired rows into token_blocklist in bulk and, at each
+checkpoint, times:
+
+- the indexed database lookup (SELECT id FROM token_blocklist WHERE jti=?)
+- the in-memory blocklist check used by the app (utils/blocklist.py)
+
+then prunes the inserted rows and reports how long that took. Both lookups
+should stay flat from the first checkpoint to the last.
+
+Run against a scratch database; every row it inserts is expired, so the
+final prune also removes any genuinely expired entries already present.
+
+Usage:
+    python scripts/benchmark_token_blocklist.py [--rows 2000000] [--checkpoints 4] [--samples 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, TokenBlocklist
+from utils.blocklist import BlocklistCache, prune_expired_tokens
+
+INSERT_BATCH = 10000
+
+
+def insert_rows(count, expires_at):
+    """Bulk insert ``count`` revoked tokens; returns a sample of their jtis"""
+    sample = []
+    for start in range(0, count, INSERT_BATCH):
+        rows = [
+            {'id': str(uuid.uuid4()), 'jti': str(uuid.uuid4()), 'expires_at': expires_at}
+            for _ in range(min(INSERT_BATCH, count - start))
+        ]
+        db.session.execute(TokenBlocklist.__table__.insert(), rows)
+        db.session.commit()
+        sample.extend(row['jti'] for row in rows[:10])
+    return sample
+
+
+def time_calls(fn, values):
+    """Median and p99 latency of ``fn`` over ``values``, in microseconds"""
+    timings = []
+    for value in values:
+        started = time.perf_counter()
+        fn(value)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def db_lookup(jti):
+    return db.session.query(TokenBlocklist.id).filter_by(jti=jti).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000, help='total rows to insert')
+    parser.add_argument('--checkpoints', type=int, default=4, help='measurements along the way')
+    parser.add_argument('--samples', type=int, default=2000, help='lookups per measurement')
+    args = parser.parse_args()
+
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    step = args.rows // args.checkpoints
+    revoked_sample = []
+
+    with app.app_context():
+        print(f"{'rows':>10} {'db hit p50/p99 us':>20} {'db miss p50/p99 us':>20} {'filter miss p50/p99 us':>24}")
+        for checkpoint in range(1, args.checkpoints + 1):
+            revoked_sample.extend(insert_rows(step, expired))
+            total = db.session.query(TokenBlocklist.id).count()
+
+            absent = [str(uuid.uuid4()) for _ in range(args.samples)]
+            present = (revoked_sample * (args.samples // len(revoked_sample) + 1))[:args.samples]
+
+            cache = BlocklistCache()
+            cache.is_revoked(absent[0])  # builds the filter outside the timing
+
+            db_hit = time_calls(db_lookup, present)
+            db_miss = time_calls(db_lookup, absent)
+            filter_miss = time_calls(cache.is_revoked, absent)
+            print(
+                f"{total:>10} {db_hit[0]:>9.1f}/{db_hit[1]:<10.1f} {db_miss[0]:>9.1f}/{db_miss[1]:<10.1f}"
+                f" {filter_miss[0]:>11.1f}/{filter_miss[1]:<12.1f}"
+            )
+
+        started = time.perf_counter()
+        deleted = prune_expired_tokens(app.config.get('TOKEN_BLOCKLIST_PRUNE_BATCH_SIZE', 5000))
+        print(f"Pruned {deleted} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
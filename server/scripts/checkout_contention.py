@@ -0,0 +1,128 @@
+"""
+Fire parallel checkouts at one hot product and check nothing is oversold
+
+Creates a scratch seller, category and products, then runs --workers
+threads that each keep reserving stock through utils.inventory.reserve_stock
+(the same call create_order makes) until the product sells out. Every
+checkout takes --quantity units of the hot product; with --mixed, each also
+takes one unit of a second product, listed in random order, to show that
+checkouts sharing rows don't deadlock.
+
+At the end the units sold must equal the starting stock exactly and the
+stock must be zero. The script exits non-zero on any oversell, undersell or
+unexpected error, and removes the scratch rows.
+
+Run against MySQL (the production engine); SQLite serializes writers and
+proves little.
+
+Usage:
+    python scripts/checkout_contention.py [--stock 500] [--workers 32] [--quantity 1] [--mixed]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+# Add parent directory to path to import from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, User, SellerProfile, Category, Product
+from utils.inventory import reserve_stock, InsufficientStock
+
+
+def create_products(stock, count):
+    """Scratch seller, category and ``count`` products with ``stock`` units each"""
+    suffix = uuid.uuid4().hex[:8]
+    user = User(email=f'contention-{suffix}@example.com', password='x', role='seller', is_email_verified=True)
+    db.session.add(user)
+    db.session.flush()
+    seller = SellerProfile(user_id=user.id, business_name=f'Contention {suffix}')
+    category = Category(id=str(uuid.uuid4()), name=f'Contention {suffix}', slug=f'contention-{suffix}')
+    db.session.add_all([seller, category])
+    db.session.flush()
+    products = [
+        Product(
+            name=f'Hot SKU {suffix} {index}', slug=f'hot-sku-{suffix}-{index}', price=10,
+            category_id=category.id, seller_id=seller.id, status='active', is_approved=1,
+            inventory_count=stock if index == 0 else stock * 10
+        )
+        for index in range(count)
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return user.id, category.id, [product.id for product in products]
+
+
+def checkout_worker(hot_id, other_id, quantity, sold, errors, lock):
+    with app.app_context():
+        while True:
+            quantities = {hot_id: quantity}
+            if other_id:
+                quantities[other_id] = 1
+                # Hand the products over in random order; reserve_stock locks them in key order
+                quantities = dict(random.sample(list(quantities.items()), len(quantities)))
+            try:
+                reserve_stock(quantities)
+                db.session.commit()
+            except InsufficientStock:
+                db.session.rollback()
+                return
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errors.append(str(e))
+                return
+            with lock:
+                sold[0] += quantity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stock', type=int, default=500, help='units of the hot product')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent checkout threads')
+    parser.add_argument('--quantity', type=int, default=1, help='units of the hot product per checkout')
+    parser.add_argument('--mixed', action='store_true', help='also take a unit of a second product per checkout')
+    args = parser.parse_args()
+
+    with app.app_context():
+        user_id, category_id, product_ids = create_products(args.stock, 2 if args.mixed else 1)
+    hot_id = product_ids[0]
+    other_id = product_ids[1] if args.mixed else None
+
+    sold, errors, lock = [0], [], threading.Lock()
+    threads = [
+        threading.Thread(target=checkout_worker, args=(hot_id, other_id, args.quantity, sold, errors, lock))
+        for _ in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.query(Product.inventory_count).filter_by(id=hot_id).scalar()
+        expected_sold = args.stock - args.stock % args.quantity
+        print(f"{sold[0]} units sold by {args.workers} workers in {elapsed:.2f}s "
+              f"({sold[0] / args.quantity / elapsed:.0f} checkouts/s); {remaining} left, {len(errors)} errors")
+        for error in errors[:5]:
+            print(f"  error: {error}")
+
+        Product.query.filter(Product.id.in_(product_ids)).delete(synchronize_session=False)
+        Category.query.filter_by(id=category_id).delete()
+        User.query.filter_by(id=user_id).delete()
+        db.session.commit()
+
+    if errors or sold[0] != expected_sold or remaining != args.stock - expected_sold:
+        print(f"FAIL: expected {expected_sold} units sold and {args.stock - expected_sold} left")
+        sys.exit(1)
+    print("OK: no oversell")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Switch token_blocklist to daily RANGE partitions on expires_at (MySQL only)
+
+Optional: once partitioned, the pruning job drops whole days of expired
+tokens with ALTER TABLE ... DROP PARTITION instead of deleting rows, and
+keeps PARTITION_DAYS_AHEAD future partitions in place (see
+utils/blocklist.py). MySQL requires the partitioning column in every
+unique key, so the primary key becomes (id, expires_at) and expires_at
+becomes NOT NULL; rows written before expires_at existed are given
+created_at + JWT_ACCESS_TOKEN_EXPIRES.
+
+Usage:
+    python scripts/partition_token_blocklist.py           # partition
+    python scripts/partition_token_blocklist.py --remove  # back to a plain table
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import app
+from models import db
+from utils.blocklist import PARTITION_DAYS_AHEAD
+
+
+def partition_table():
+    """Convert token_blocklist to daily partitions"""
+    lifetime = int(app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+    db.session.execute(text(
+        "UPDATE token_blocklist SET expires_at = created_at + INTERVAL :lifetime SECOND "
+        "WHERE expires_at IS NULL"
+    ), {'lifetime': lifetime})
+    db.session.commit()
+
+    first = db.session.execute(text("SELECT MIN(expires_at) FROM token_blocklist")).scalar()
+    today = datetime.utcnow().date()
+    start = min(first.date(), today) if first else today
+    days = [start + timedelta(days=offset) for offset in range((today - start).days + PARTITION_DAYS_AHEAD + 1)]
+
+    definitions = ', '.join(
+        f"PARTITION p{day:%Y%m%d} VALUES LESS THAN (TO_DAYS('{day + timedelta(days=1):%Y-%m-%d}'))"
+        for day in days
+    )
+    db.session.execute(text(
+        "ALTER TABLE token_blocklist "
+        "MODIFY expires_at DATETIME NOT NULL, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, expires_at) "
+        f"PARTITION BY RANGE (TO_DAYS(expires_at)) ({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    ))
+    print(f"token_blocklist partitioned into {len(days)} daily partitions")
+
+
+def remove_partitioning():
+    """Restore the plain, unpartitioned table"""
+    db.session.execute(text("ALTER TABLE token_blocklist REMOVE PARTITIONING"))
+    db.session.execute(text(
+        "ALTER TABLE token_blocklist "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id), "
+        "MODIFY expires_at DATETIME NULL"
+    ))
+    print("token_blocklist partitioning removed")
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        if db.engine.dialect.name != 'mysql':
+            sys.exit('Partitioning is only supported on MySQL')
+        if '--remove' in sys.argv:
+            remove_partitioning()
+        else:
+            partition_table()
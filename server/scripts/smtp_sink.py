@@ -0,0 +1,115 @@
+"""
+Local SMTP stand-in for exercising the email outbox
+
+Accepts mail on localhost without TLS or authentication and prints one
+line per message received (and the whole message with --verbose). Point
+the app at it with:
+
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_AUTH=false
+
+--reject answers 550 for recipients containing the given text, and
+--fail-every N answers 451 to every Nth message, to exercise permanent
+failures and retries.
+
+Usage:
+    python scripts/smtp_sink.py [--port 1025] [--reject bounce@] [--fail-every 0] [--verbose]
+"""
+import argparse
+import socketserver
+import threading
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """One SMTP session; enough of RFC 5321 for smtplib"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('utf-8'))
+
+    def handle(self):
+        server = self.server
+        sender, recipients = None, []
+        with server.lock:
+            server.connections += 1
+            connection = server.connections
+        self.reply('220 smtp-sink ready')
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250 8BITMIME')
+            elif command == 'HELO':
+                self.reply('250 smtp-sink')
+            elif command == 'MAIL':
+                sender, recipients = line[10:].strip('<> '), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = line[8:].strip('<> ')
+                if server.reject and server.reject in recipient:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    body.append(data_line)
+                with server.lock:
+                    server.received += 1
+                    number = server.received
+                if server.fail_every and number % server.fail_every == 0:
+                    self.reply('451 Try again later')
+                    continue
+                print(
+                    f'#{number} on connection {connection} from {sender} to {", ".join(recipients)}'
+                    f' ({sum(len(b) for b in body)} bytes)',
+                    flush=True
+                )
+                if server.verbose:
+                    print(b''.join(body).decode('utf-8', 'replace'), flush=True)
+                self.reply('250 OK: queued')
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, reject=None, fail_every=0, verbose=False):
+        super().__init__(address, SMTPSinkHandler)
+        self.reject = reject
+        self.fail_every = fail_every
+        self.verbose = verbose
+        self.received = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--reject', help='answer 550 for recipients containing this text')
+    parser.add_argument('--fail-every', type=int, default=0, help='answer 451 to every Nth message')
+    parser.add_argument('--verbose', action='store_true', help='print whole messages')
+    args = parser.parse_args()
+
+    with SMTPSink((args.host, args.port), args.reject, args.fail_every, args.verbose) as server:
+        print(f'SMTP sink listening on {args.host}:{args.port}', flush=True)
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Shared fixtures for the server tests
+
+The app runs under TestingConfig (FLASK_ENV=testing), so the query
+inspector is on and QUERY_BUDGET_STRICT turns a route going over its query
+budget into a QueryBudgetExceeded error. The database is TEST_DATABASE_URL,
+or a scratch SQLite file when it isn't set; point it at a MySQL database to
+run the concurrency tests against the production engine.
+
+Usage:
+    cd server && python -m pytest -q
+"""
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+# Add the server directory to the path so the app and models import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch_dir = tempfile.mkdtemp(prefix='afripulse-tests-')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ.setdefault('TEST_DATABASE_URL', f"sqlite:///{os.path.join(_scratch_dir, 'test.sqlite')}")
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(LONGTEXT, 'sqlite')
+def _compile_longtext_sqlite(type_, compiler, **kw):
+    return 'TEXT'
+
+
+from app import app as flask_app
+from models import db, User, Profile, SellerProfile, Category, Product, ProductImage
+from utils.blocklist import blocklist_cache
+from utils.principal import token_claims
+
+
+def _serialize_sqlite_writers(engine):
+    """
+    Make every SQLite transaction take the write lock up front
+
+    pysqlite starts transactions lazily, so two connections that both read
+    and then write fail with "database is locked" instead of waiting.
+    ``BEGIN IMMEDIATE`` makes concurrent transactions queue on the lock.
+    """
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute('PRAGMA busy_timeout = 30000')
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        # Straight to the driver, so the query inspector doesn't count it
+        connection.connection.driver_connection.execute('BEGIN IMMEDIATE')
+
+
+@pytest.fixture(scope='session')
+def app():
+    with flask_app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            _serialize_sqlite_writers(db.engine)
+        db.create_all()
+        # Build the token blocklist filter up front; inside the first
+        # authenticated request its queries would count against that
+        # route's budget
+        blocklist_cache.is_revoked('')
+    yield flask_app
+    with flask_app.app_context():
+        db.drop_all()
+    shutil.rmtree(_scratch_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(app):
+    """Empty every table after each test"""
+    yield
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_headers(user_id):
+    """Authorization header carrying an access token for a user; needs an app context"""
+    token = create_access_token(identity=user_id, additional_claims=token_claims(db.session.get(User, user_id)))
+    return {'Authorization': f'Bearer {token}'}
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements run inside the block; needs an app context"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def create_user(role, name):
+    """A verified user with a profile; needs an app context"""
+    user = User(email=f'{role}-{uuid.uuid4().hex[:8]}@example.com', password='x', role=role, is_email_verified=True)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Profile(user_id=user.id, name=name))
+    return user
+
+
+# Fixtures below return ids rather than model instances: tests open their
+# own app context for each block of database work, and requests made by the
+# test client must not share it, or ``g`` would carry over between them.
+
+@pytest.fixture
+def customer(app):
+    with app.app_context():
+        user = create_user('customer', 'Test Customer')
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def seller(app):
+    """(user id, seller profile id) of a seller"""
+    with app.app_context():
+        user = create_user('seller', 'Test Seller')
+        seller_profile = SellerProfile(user_id=user.id, business_name='Test Store')
+        db.session.add(seller_profile)
+        db.session.commit()
+        return user.id, seller_profile.id
+
+
+@pytest.fixture
+def make_products(app, seller):
+    """Factory for ids of active, approved products of the ``seller`` fixture, one image each"""
+    with app.app_context():
+        category = Category(id=str(uuid.uuid4()), name='Test Category', slug=f'test-category-{uuid.uuid4().hex[:8]}')
+        db.session.add(category)
+        db.session.commit()
+        category_id = category.id
+
+    def make(count, inventory_count=10):
+        product_ids = []
+        with app.app_context():
+            for index in range(count):
+                suffix = uuid.uuid4().hex[:8]
+                product = Product(
+                    name=f'Test Product {suffix}', slug=f'test-product-{suffix}', price=10 + index,
+                    category_id=category_id, seller_id=seller[1], status='active', is_approved=1,
+                    inventory_count=inventory_count
+                )
+                db.session.add(product)
+                db.session.flush()
+                db.session.add(ProductImage(product_id=product.id, image_url=f'/uploads/{suffix}.jpg', is_primary=1))
+                product_ids.append(product.id)
+            db.session.commit()
+        return product_ids
+
+    return make
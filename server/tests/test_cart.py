@@ -0,0 +1,221 @@
+"""
+Cart writes through POST /api/cart/items and PATCH /api/cart/
+
+Adds are upserts on the (cart_id, product_id) key, so requests fired twice,
+even at the same moment, end in one cart with one line per product. PATCH
+folds its operations into one change per product before writing anything,
+and refuses the whole request when a product is unknown. A line never
+holds more than MAX_CART_QUANTITY units: larger quantities, and adds that
+would sum past it, are refused with a 400 and leave the cart as it was.
+"""
+import threading
+
+import pytest
+
+from conftest import auth_headers
+from models import db, Cart, CartItem
+from utils.carts import MAX_CART_QUANTITY, add_cart_item, get_or_create_cart, parse_cart_operations
+from utils.guest_cart import GUEST_CART_HEADER, encode_guest_cart
+
+
+@pytest.fixture
+def headers(app, customer):
+    with app.app_context():
+        return auth_headers(customer)
+
+
+def _cart_quantities(app, user_id):
+    with app.app_context():
+        return dict(
+            db.session.query(CartItem.product_id, CartItem.quantity)
+            .join(Cart).filter(Cart.user_id == user_id)
+        )
+
+
+def _post_in_parallel(app, headers, bodies):
+    start = threading.Barrier(len(bodies))
+    statuses = []
+    lock = threading.Lock()
+
+    def post(body):
+        client = app.test_client()
+        start.wait()
+        response = client.post('/api/cart/items', json=body, headers=headers)
+        with lock:
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=post, args=(body,)) for body in bodies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def _patch(client, headers, *operations):
+    return client.patch('/api/cart/', json={'operations': list(operations)}, headers=headers)
+
+
+def test_double_fired_add_makes_one_line_with_the_summed_quantity(app, customer, headers, make_products):
+    product_id, = make_products(1)
+    statuses = _post_in_parallel(app, headers, [{'product_id': product_id, 'quantity': 2}] * 2)
+
+    assert statuses == [200, 200]
+    with app.app_context():
+        assert Cart.query.filter_by(user_id=customer).count() == 1
+    assert _cart_quantities(app, customer) == {product_id: 4}
+
+
+def test_parallel_adds_of_different_products_share_one_cart(app, customer, headers, make_products):
+    product_ids = make_products(4)
+    statuses = _post_in_parallel(app, headers, [{'product_id': product_id} for product_id in product_ids])
+
+    assert statuses == [200] * 4
+    with app.app_context():
+        assert Cart.query.filter_by(user_id=customer).count() == 1
+    assert _cart_quantities(app, customer) == {product_id: 1 for product_id in product_ids}
+
+
+def test_add_to_an_existing_line_increments_it(app, client, customer, headers, make_products):
+    product_id, = make_products(1)
+    for quantity in (1, 3):
+        response = client.post('/api/cart/items', json={'product_id': product_id, 'quantity': quantity}, headers=headers)
+        assert response.status_code == 200
+    items = response.get_json()['items']
+    assert [(item['product_id'], item['quantity']) for item in items] == [(product_id, 4)]
+    assert _cart_quantities(app, customer) == {product_id: 4}
+
+
+@pytest.mark.parametrize('operations', [
+    [{'op': 'set', 'quantity': 1000000000000}],
+    [{'op': 'add', 'quantity': MAX_CART_QUANTITY + 1}],
+    [{'op': 'set', 'quantity': MAX_CART_QUANTITY}, {'op': 'add', 'quantity': 1}],
+    [{'op': 'add', 'quantity': MAX_CART_QUANTITY - 1}, {'op': 'add', 'quantity': 2}],
+])
+def test_patch_over_the_quantity_cap_is_refused(app, client, customer, headers, make_products, operations):
+    product_id, = make_products(1)
+    response = _patch(client, headers, *[dict(operation, product_id=product_id) for operation in operations])
+    assert response.status_code == 400
+    assert _cart_quantities(app, customer) == {}
+
+
+def test_adds_summing_past_the_cap_with_the_cart_are_refused(app, client, customer, headers, make_products):
+    product_id, = make_products(1)
+    assert _patch(client, headers, {'op': 'set', 'product_id': product_id, 'quantity': MAX_CART_QUANTITY - 1}).status_code == 200
+
+    assert _patch(client, headers, {'op': 'add', 'product_id': product_id, 'quantity': 2}).status_code == 400
+    response = client.post('/api/cart/items', json={'product_id': product_id, 'quantity': 2}, headers=headers)
+    assert response.status_code == 400
+    assert _cart_quantities(app, customer) == {product_id: MAX_CART_QUANTITY - 1}
+
+    response = client.post('/api/cart/items', json={'product_id': product_id, 'quantity': 1}, headers=headers)
+    assert response.status_code == 200
+    assert _cart_quantities(app, customer) == {product_id: MAX_CART_QUANTITY}
+
+
+def test_upserted_increments_stop_at_the_cap(app, customer, make_products):
+    product_id, = make_products(1)
+    with app.app_context():
+        cart = get_or_create_cart(customer)
+        add_cart_item(cart.id, product_id, MAX_CART_QUANTITY)
+        add_cart_item(cart.id, product_id, MAX_CART_QUANTITY)
+        db.session.commit()
+    assert _cart_quantities(app, customer) == {product_id: MAX_CART_QUANTITY}
+
+
+def test_guest_cart_over_the_cap_is_refused(app, client, make_products):
+    product_id, = make_products(1)
+    with app.app_context():
+        token = encode_guest_cart({product_id: MAX_CART_QUANTITY})
+    response = client.post('/api/cart/items', json={'product_id': product_id}, headers={GUEST_CART_HEADER: token})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('operations, expected', [
+    ([('add', 2), ('set', 5), ('remove', None), ('add', 3)], ('set', 3)),
+    ([('add', 2), ('add', 3)], ('add', 5)),
+    ([('set', 4), ('add', 1)], ('set', 5)),
+    ([('add', 2), ('set', 0)], ('remove', 0)),
+    ([('remove', None), ('add', 1)], ('set', 1)),
+])
+def test_operations_fold_into_one_change_per_product(operations, expected):
+    folded = parse_cart_operations([
+        {'op': op, 'product_id': 'p1', **({} if quantity is None else {'quantity': quantity})}
+        for op, quantity in operations
+    ])
+    assert folded == {'p1': expected}
+
+
+def test_patch_applies_the_folded_operations(app, client, customer, headers, make_products):
+    kept_id, replaced_id, removed_id, readded_id = make_products(4)
+    assert _patch(
+        client, headers,
+        {'op': 'add', 'product_id': replaced_id, 'quantity': 3},
+        {'op': 'add', 'product_id': removed_id},
+        {'op': 'add', 'product_id': readded_id, 'quantity': 4},
+    ).status_code == 200
+
+    response = _patch(
+        client, headers,
+        {'op': 'add', 'product_id': kept_id},
+        {'op': 'add', 'product_id': kept_id},
+        {'op': 'add', 'product_id': replaced_id, 'quantity': 2},
+        {'op': 'set', 'product_id': replaced_id, 'quantity': 5},
+        {'op': 'remove', 'product_id': removed_id},
+        {'op': 'add', 'product_id': readded_id, 'quantity': 2},
+        {'op': 'set', 'product_id': readded_id, 'quantity': 7},
+        {'op': 'remove', 'product_id': readded_id},
+        {'op': 'add', 'product_id': readded_id, 'quantity': 1},
+    )
+    assert response.status_code == 200
+    expected = {kept_id: 2, replaced_id: 5, readded_id: 1}
+    assert {item['product_id']: item['quantity'] for item in response.get_json()['items']} == expected
+    assert _cart_quantities(app, customer) == expected
+
+
+def test_patch_with_only_removals_does_not_create_a_cart(app, client, customer, headers, make_products):
+    product_id, = make_products(1)
+    response = _patch(client, headers, {'op': 'remove', 'product_id': product_id}, {'op': 'set', 'product_id': product_id, 'quantity': 0})
+    assert response.status_code == 200
+    assert response.get_json()['items'] == []
+    with app.app_context():
+        assert Cart.query.filter_by(user_id=customer).count() == 0
+
+
+def test_patch_with_an_unknown_product_changes_nothing(app, client, customer, headers, make_products):
+    product_id, = make_products(1)
+    response = _patch(
+        client, headers,
+        {'op': 'add', 'product_id': product_id},
+        {'op': 'set', 'product_id': 'no-such-product', 'quantity': 1},
+    )
+    assert response.status_code == 404
+    assert response.get_json()['product_ids'] == ['no-such-product']
+    assert _cart_quantities(app, customer) == {}
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'operations': []},
+    {'operations': [{'op': 'replace', 'product_id': 'p1'}]},
+    {'operations': [{'op': 'add'}]},
+    {'operations': [{'op': 'add', 'product_id': 'p1', 'quantity': 0}]},
+    {'operations': [{'op': 'set', 'product_id': 'p1', 'quantity': True}]},
+])
+def test_patch_with_malformed_operations_is_refused(client, headers, body):
+    assert client.patch('/api/cart/', json=body, headers=headers).status_code == 400
+
+
+def test_guest_patch_folds_into_the_token(app, client, make_products):
+    first_id, second_id = make_products(2)
+    response = _patch(
+        client, {},
+        {'op': 'add', 'product_id': first_id, 'quantity': 2},
+        {'op': 'add', 'product_id': second_id},
+        {'op': 'set', 'product_id': first_id, 'quantity': 4},
+        {'op': 'remove', 'product_id': second_id},
+    )
+    assert response.status_code == 200
+    token = response.get_json()['guest_token']
+    items = client.get('/api/cart/', headers={GUEST_CART_HEADER: token}).get_json()['items']
+    assert [(item['product_id'], item['quantity']) for item in items] == [(first_id, 4)]
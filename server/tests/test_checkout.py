@@ -0,0 +1,85 @@
+"""
+Parallel checkouts through POST /api/orders/ must never oversell
+
+Every customer has the hot product in their cart and all of them check out
+at once. Exactly as many orders as the stock covers may succeed; the rest
+must be refused with a 400, and the stock must end at what is left over.
+"""
+import threading
+
+import pytest
+
+from conftest import auth_headers, create_user
+from models import db, Cart, CartItem, Product, OrderItem
+
+ORDER = {'shipping_address': '12 Marina Road, Lagos', 'payment_method': 'mobile_money'}
+
+
+def _customers_with_cart(app, count, quantities):
+    """Auth headers of ``count`` customers whose carts hold ``quantities``"""
+    with app.app_context():
+        users = []
+        for index in range(count):
+            user = create_user('customer', f'Buyer {index}')
+            cart = Cart(user_id=user.id)
+            db.session.add(cart)
+            db.session.flush()
+            for product_id, quantity in quantities.items():
+                db.session.add(CartItem(cart_id=cart.id, product_id=product_id, quantity=quantity))
+            users.append(user)
+        db.session.commit()
+        return [auth_headers(user.id) for user in users]
+
+
+def _checkout_in_parallel(app, headers):
+    start = threading.Barrier(len(headers))
+    statuses = []
+    lock = threading.Lock()
+
+    def checkout(user_headers):
+        client = app.test_client()
+        start.wait()
+        response = client.post('/api/orders/', json=ORDER, headers=user_headers)
+        with lock:
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=checkout, args=(user_headers,)) for user_headers in headers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def _inventory(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).inventory_count
+
+
+@pytest.mark.parametrize('quantity', [1, 2])
+def test_parallel_checkouts_do_not_oversell(app, make_products, quantity):
+    stock = 5
+    hot_id, = make_products(1, inventory_count=stock)
+    headers = _customers_with_cart(app, 12, {hot_id: quantity})
+
+    statuses = _checkout_in_parallel(app, headers)
+
+    expected_orders = stock // quantity
+    assert sorted(statuses) == [201] * expected_orders + [400] * (len(headers) - expected_orders)
+    assert _inventory(app, hot_id) == stock - expected_orders * quantity
+    with app.app_context():
+        sold = db.session.query(db.func.sum(OrderItem.quantity)).filter_by(product_id=hot_id).scalar()
+    assert sold == expected_orders * quantity
+
+
+def test_parallel_checkouts_sharing_products_take_all_or_nothing(app, make_products):
+    hot_id, = make_products(1, inventory_count=3)
+    other_id, = make_products(1, inventory_count=100)
+    headers = _customers_with_cart(app, 8, {other_id: 1, hot_id: 1})
+
+    statuses = _checkout_in_parallel(app, headers)
+
+    assert sorted(statuses) == [201] * 3 + [400] * 5
+    assert _inventory(app, hot_id) == 0
+    # Refused checkouts gave back the unit of the other product they had taken
+    assert _inventory(app, other_id) == 97
@@ -0,0 +1,83 @@
+"""
+A guest cart token merges into a user's cart at most once
+
+The login response only clears the cookie, so a client can keep sending the
+same X-Guest-Cart header; later logins must not add its lines again.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from conftest import create_user
+from models import db, Cart, CartItem, MergedGuestCart
+from routes import auth_routes
+from utils.guest_cart import GUEST_CART_HEADER, encode_guest_cart, prune_merged_guest_carts
+
+
+@pytest.fixture
+def login(app, client, monkeypatch):
+    """Log the returned user in, sending the given guest cart headers"""
+    # create_user stores the password as is; skip the bcrypt worker pool
+    monkeypatch.setattr(auth_routes.password_hasher, 'check', lambda password, hashed: password == hashed)
+    with app.app_context():
+        user = create_user('customer', 'Guest Buyer')
+        db.session.commit()
+        email = user.email
+
+    def log_in(headers=None):
+        response = client.post('/api/auth/login', json={'email': email, 'password': 'x'}, headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()['user']['id']
+
+    return log_in
+
+
+def _cart_quantities(app, user_id):
+    with app.app_context():
+        return dict(
+            db.session.query(CartItem.product_id, CartItem.quantity)
+            .join(Cart).filter(Cart.user_id == user_id)
+        )
+
+
+def test_replayed_guest_cart_header_merges_once(app, client, make_products, login):
+    first_id, second_id = make_products(2)
+    with app.app_context():
+        token = encode_guest_cart({first_id: 2, second_id: 1})
+    headers = {GUEST_CART_HEADER: token}
+
+    user_id = login(headers)
+    assert _cart_quantities(app, user_id) == {first_id: 2, second_id: 1}
+
+    login(headers)
+    assert _cart_quantities(app, user_id) == {first_id: 2, second_id: 1}
+
+    # The merged token now reads as an empty guest cart, and edits start a new one
+    assert client.get('/api/cart/', headers=headers).get_json()['items'] == []
+    response = client.post('/api/cart/items', json={'product_id': first_id, 'quantity': 1}, headers=headers)
+    new_token = response.get_json()['guest_token']
+    assert [item['quantity'] for item in response.get_json()['items']] == [1]
+
+    login({GUEST_CART_HEADER: new_token})
+    assert _cart_quantities(app, user_id) == {first_id: 3, second_id: 1}
+
+
+def test_merge_record_is_refused_twice_and_pruned_after_expiry(app, make_products, login):
+    product_id, = make_products(1)
+    with app.app_context():
+        token = encode_guest_cart({product_id: 1})
+    user_id = login({GUEST_CART_HEADER: token})
+
+    with app.app_context():
+        cart_id, = [row.id for row in MergedGuestCart.query]
+        # A second merge of the same cart, e.g. a concurrent login, is turned away by the primary key
+        db.session.add(MergedGuestCart(id=cart_id, expires_at=datetime.utcnow()))
+        with pytest.raises(IntegrityError):
+            db.session.flush()
+        db.session.rollback()
+
+        expires_at = db.session.get(MergedGuestCart, cart_id).expires_at
+        assert prune_merged_guest_carts(now=expires_at) == 0
+        assert prune_merged_guest_carts(now=expires_at + timedelta(seconds=1)) == 1
+    assert _cart_quantities(app, user_id) == {product_id: 1}
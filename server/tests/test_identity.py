@@ -0,0 +1,31 @@
+"""
+The request identity map counts the loads it avoids
+
+A second lookup of the same user and the profile relationships filled in by
+the joined query are all served without a query, and each is counted.
+"""
+from flask import g
+
+from conftest import auth_headers, count_queries
+from utils.identity import PROFILE_RELATIONSHIPS, identity_map
+from utils.metrics import IDENTITY_LOADS_AVOIDED
+
+
+def test_lookups_and_profiles_are_counted_as_avoided_loads(app, customer):
+    with app.test_request_context():
+        with count_queries() as statements:
+            user = identity_map.user(customer)
+            assert identity_map.user(customer) is user
+            user.profile, user.seller_profile, user.affiliate_profile
+        assert len(statements) == 1
+        assert g.identity_map_avoided == len(PROFILE_RELATIONSHIPS) + 1
+
+
+def test_avoided_loads_reach_the_endpoint_metric(app, client, customer):
+    labels = ('profile_bp', 'profile_bp.get_current_user')
+    before = IDENTITY_LOADS_AVOIDED.labels(*labels)._value.get()
+    with app.app_context():
+        headers = auth_headers(customer)
+    assert client.get('/api/profile/me', headers=headers).status_code == 200
+    assert IDENTITY_LOADS_AVOIDED.labels(*labels)._value.get() > before
+
@@ -0,0 +1,30 @@
+"""
+SQL timings survive statements that fail
+
+A statement that raises never reaches ``after_cursor_execute``; its start
+time must not stay behind on the pooled connection and skew the statements
+run after it.
+"""
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+from utils.metrics import request_metrics
+
+
+def test_failed_statement_leaves_no_timing_behind(app):
+    with app.test_request_context():
+        request_metrics._start()
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+
+        connection = db.session.connection()
+        connection.execute(text('SELECT 1'))
+        assert g.metrics_sql_count == 1
+        assert 0 <= g.metrics_sql_time < 1
+        assert 'metrics_started' not in connection.info
+        db.session.remove()
@@ -0,0 +1,76 @@
+"""
+Back-pressure of the password hashing pool
+
+A hash that times out keeps its pool slot until bcrypt actually finishes;
+otherwise every timed-out request would free a slot for a new one while its
+bcrypt call still occupies a pool process, and the queue bound would stop
+holding. Timeouts and dead pool processes surface as
+``PasswordHasherUnavailable`` so the routes answer 503, not 500.
+"""
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import create_user
+from models import db
+from routes import auth_routes
+from utils.passwords import PasswordHasher, PasswordHasherBusy, PasswordHasherUnavailable
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    hasher.init_app(SimpleNamespace(config={'BCRYPT_POOL_SIZE': 1, 'BCRYPT_QUEUE_SIZE': 0, 'BCRYPT_TIMEOUT': 0.5}))
+    yield hasher
+    hasher.shutdown()
+
+
+def test_timed_out_call_holds_its_slot_until_done(hasher):
+    with pytest.raises(PasswordHasherUnavailable):
+        hasher._run(time.sleep, 3)
+
+    # The sleep is still running in the pool, so there is no room yet
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(time.sleep, 0)
+
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            hasher._run(time.sleep, 0)
+            break
+        except PasswordHasherBusy:
+            assert time.monotonic() < deadline, 'slot never released'
+            time.sleep(0.1)
+
+
+def test_failed_submit_releases_its_slot(hasher):
+    def unavailable():
+        raise RuntimeError('pool unavailable')
+
+    hasher._get_executor = unavailable
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            hasher._run(time.sleep, 0)
+
+
+def test_pool_process_dying_mid_call_is_unavailable_and_restarts_the_pool(hasher):
+    with pytest.raises(PasswordHasherUnavailable):
+        hasher._run(os._exit, 1)
+    assert hasher._run(abs, -1) == 1
+
+
+@pytest.mark.parametrize('error, status', [(PasswordHasherBusy(), 429), (PasswordHasherUnavailable(), 503)])
+def test_login_answers_hashing_errors_with_back_pressure(app, client, monkeypatch, error, status):
+    def check(password, hashed):
+        raise error
+
+    monkeypatch.setattr(auth_routes.password_hasher, 'check', check)
+    with app.app_context():
+        user = create_user('customer', 'Waiting Buyer')
+        db.session.commit()
+        email = user.email
+    response = client.post('/api/auth/login', json={'email': email, 'password': 'x'})
+    assert response.status_code == status
+    assert 'Retry-After' in response.headers
@@ -0,0 +1,24 @@
+"""
+Out-of-range page sizes on GET /api/products/ are clamped, not errors
+"""
+import pytest
+
+from routes.product_routes import MAX_PRODUCT_PAGE_SIZE
+
+
+@pytest.mark.parametrize('query', ['limit=0&cursor=', 'limit=-5&cursor=', 'limit=0', 'limit=-5&offset=-3'])
+def test_page_size_below_one_returns_one_product(client, make_products, query):
+    make_products(3)
+    response = client.get(f'/api/products/?{query}')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    assert body['limit'] == 1
+    assert len(body['products']) == 1
+    if 'cursor=' in query:
+        assert body['next_cursor']
+
+
+def test_page_size_above_the_maximum_is_clamped(client):
+    body = client.get(f'/api/products/?limit={MAX_PRODUCT_PAGE_SIZE * 10}&cursor=').get_json()
+    assert body['limit'] == MAX_PRODUCT_PAGE_SIZE
+    assert body['products'] == [] and body['next_cursor'] is None
@@ -0,0 +1,90 @@
+"""
+Budgeted routes stay within their query budgets
+
+TestingConfig sets QUERY_BUDGET_STRICT, so a request over its route's
+``query_budget`` raises QueryBudgetExceeded and fails the test. Each listing
+is loaded with more rows than its budget, so a per-row query can't hide.
+"""
+import pytest
+
+from conftest import auth_headers
+from models import db, Cart, CartItem, Category, Product
+from utils.guest_cart import GUEST_CART_HEADER, encode_guest_cart
+
+PRODUCTS = 25
+
+
+def _assert_within_budget(app, response, path):
+    endpoint, _ = app.url_map.bind('localhost').match(path.split('?')[0], method='GET')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert int(response.headers['X-Query-Count']) <= app.view_functions[endpoint].query_budget
+
+
+def _get(app, client, path, **kwargs):
+    """GET ``path`` and check it stayed within its route's budget"""
+    response = client.get(path, **kwargs)
+    _assert_within_budget(app, response, path)
+    return response
+
+
+@pytest.fixture
+def catalog(app, make_products):
+    """Slugs of the products and their category"""
+    product_ids = make_products(PRODUCTS)
+    with app.app_context():
+        slugs = [slug for slug, in db.session.query(Product.slug).filter(Product.id.in_(product_ids))]
+        category = db.session.query(Category).join(Product).filter(Product.id == product_ids[0]).one()
+        return {'product_ids': product_ids, 'slugs': slugs, 'category': category.slug}
+
+
+@pytest.mark.parametrize('query', [
+    f'limit={PRODUCTS}',
+    f'limit={PRODUCTS}&view=card',
+    f'limit={PRODUCTS}&cursor=',
+])
+def test_product_list(app, client, catalog, query):
+    response = _get(app, client, f'/api/products/?{query}')
+    items = response.get_json().get('products') or response.get_json().get('items')
+    assert len(items) == PRODUCTS
+
+
+def test_product_page(app, client, catalog):
+    _get(app, client, f"/api/products/{catalog['slugs'][0]}")
+
+
+def test_category_list_and_products(app, client, catalog):
+    _get(app, client, '/api/categories/')
+    _get(app, client, f"/api/categories/{catalog['category']}/products?limit={PRODUCTS}")
+
+
+def test_cart(app, client, catalog, customer):
+    with app.app_context():
+        cart = Cart(user_id=customer)
+        db.session.add(cart)
+        db.session.flush()
+        for product_id in catalog['product_ids']:
+            db.session.add(CartItem(cart_id=cart.id, product_id=product_id, quantity=2))
+        db.session.commit()
+        headers = auth_headers(customer)
+
+    response = _get(app, client, '/api/cart/', headers=headers)
+    assert len(response.get_json()['items']) == PRODUCTS
+
+
+def test_guest_cart(app, client, catalog):
+    with app.app_context():
+        token = encode_guest_cart({product_id: 1 for product_id in catalog['product_ids']})
+    response = _get(app, client, '/api/cart/', headers={GUEST_CART_HEADER: token})
+    assert len(response.get_json()['items']) == PRODUCTS
+
+
+def test_empty_cart(app, client, customer):
+    with app.app_context():
+        headers = auth_headers(customer)
+    _get(app, client, '/api/cart/', headers=headers)
+
+
+def test_current_profile(app, client, customer):
+    with app.app_context():
+        headers = auth_headers(customer)
+    _get(app, client, '/api/profile/me', headers=headers)
@@ -0,0 +1,34 @@
+"""
+Re-indexing one product reads only that product's sales
+
+``_index_query`` sums units sold with a subquery correlated to each product,
+so the single-product query run on every product create or update never
+aggregates the rest of the order history.
+"""
+from conftest import count_queries
+from models import db, Order, OrderItem, Product
+from utils.search import _index_query
+
+
+def _sell(customer_id, product_id, quantities):
+    order = Order(customer_id=customer_id, total_amount=0)
+    db.session.add(order)
+    db.session.flush()
+    for quantity in quantities:
+        db.session.add(OrderItem(order_id=order.id, product_id=product_id, product_name='Sold', quantity=quantity, price_per_unit=1))
+
+
+def test_units_sold_per_product(app, customer, make_products):
+    sold_id, other_id, unsold_id = make_products(3)
+    with app.app_context():
+        _sell(customer, sold_id, [2, 3])
+        _sell(customer, other_id, [7])
+        db.session.commit()
+
+        rows = {row.id: row.units_sold for row in _index_query()}
+        assert rows == {sold_id: 5, other_id: 7, unsold_id: None}
+
+        with count_queries() as statements:
+            row = _index_query().filter(Product.id == sold_id).one()
+        assert row.units_sold == 5
+        assert 'GROUP BY' not in statements[0].upper()
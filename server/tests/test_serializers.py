@@ -0,0 +1,41 @@
+"""
+serialize_products must cost the same number of queries for any page size
+
+A product page loads its categories, sellers and images with one query
+each; a lazy load per product would make the count grow with the page.
+"""
+import pytest
+
+from conftest import count_queries
+from models import db, Product
+from utils.serializers import serialize_products
+
+
+@pytest.mark.parametrize('page_size', [1, 5, 40])
+def test_serialize_products_query_count(app, make_products, page_size):
+    product_ids = make_products(page_size)
+    with app.app_context():
+        products = Product.query.filter(Product.id.in_(product_ids)).all()
+
+        with count_queries() as statements:
+            result = serialize_products(products)
+
+        assert len(result) == page_size
+        assert len(statements) == 3, '\n'.join(statements)
+
+
+def test_serialize_products_matches_to_dict(app, make_products):
+    product_ids = make_products(5)
+    with app.app_context():
+        products = Product.query.filter(Product.id.in_(product_ids)).order_by(Product.id).all()
+        expected = [product.to_dict() for product in products]
+        db.session.expire_all()
+
+        products = Product.query.filter(Product.id.in_(product_ids)).order_by(Product.id).all()
+        assert serialize_products(products) == expected
+
+
+def test_serialize_products_empty(app):
+    with app.app_context(), count_queries() as statements:
+        assert serialize_products([]) == []
+    assert statements == []
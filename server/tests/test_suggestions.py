@@ -0,0 +1,63 @@
+"""
+SuggestionIndex must rank the same as a full scan while entries change
+
+Short prefixes are answered from incrementally maintained top lists and
+longer ones from a per-prefix cache; both are checked against a brute-force
+ranking of every matching entry after each batch of random changes.
+"""
+import heapq
+import random
+
+import pytest
+
+from utils.search_index import SuggestionIndex
+
+WORDS = ['ankara', 'dress', 'kente', 'shirt', 'bead', 'necklace', 'wax', 'print', 'bag', 'kaftan', 'dashiki']
+PREFIXES = ['a', 'an', 'ank', 'd', 'da', 'k', 'ankara', 'ankara d', 'kente s', 'store', 'z']
+
+
+def _add(index, rng, product_id):
+    number = int(product_id[1:])
+    index.add_product(
+        product_id,
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+        product_id,
+        rng.randint(0, 50),
+        category=(f'c{number % 7}', f'{WORDS[number % 7].title()} Category', f'c{number % 7}'),
+        seller=(f's{number % 13}', f'{WORDS[number % 11].title()} Store {number % 13}')
+    )
+
+
+def _brute_force(index, prefix, limit):
+    prefix = index.normalize(prefix)
+    matches = {entry_key for entry_key, entry in index._entries.items() if any(key.startswith(prefix) for key in entry['keys'])}
+    return [entry_key[1] for entry_key in heapq.nsmallest(limit, matches, key=index._rank)]
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_suggestions_match_a_full_scan_under_changes(seed):
+    rng = random.Random(seed)
+    index = SuggestionIndex()
+    for number in range(300):
+        _add(index, rng, f'p{number}')
+    index.precompute_short_prefixes()
+
+    for _ in range(40):
+        for _ in range(25):
+            product_id = f'p{rng.randrange(400)}'
+            if rng.random() < 0.3:
+                index.remove_product(product_id)
+            else:
+                _add(index, rng, product_id)
+        for prefix in PREFIXES:
+            limit = rng.choice([1, 5, 20])
+            assert [item['id'] for item in index.suggest(prefix, limit)] == _brute_force(index, prefix, limit)
+
+
+def test_suggestions_without_precomputed_prefixes():
+    rng = random.Random(4)
+    index = SuggestionIndex()
+    for number in range(100):
+        _add(index, rng, f'p{number}')
+    for prefix in PREFIXES:
+        assert [item['id'] for item in index.suggest(prefix, 8)] == _brute_force(index, prefix, 8)
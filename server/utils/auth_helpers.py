@@ -1,39 +1,33 @@
 from functools import wraps
-from flask import jsonify, g
-from flask_jwt_extended import get_jwt_identity
+from flask import jsonify
 
-from models import User, Profile
+from utils.principal import current_principal
 
 def admin_required(fn):
     """Decorator to check if user is an admin"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'admin':
+        principal = current_principal()
+
+        if not principal or not principal.is_admin:
             return jsonify({'message': 'Admin access required'}), 403
-        
+
         return fn(*args, **kwargs)
     return wrapper
 
 def seller_required(fn):
-    """Decorator to check if user is a seller and attach their profile to g."""
+    """Decorator to check if user is a seller with a seller profile."""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'seller':
+        principal = current_principal()
+
+        if not principal or principal.role != 'seller':
             return jsonify({'message': 'Seller access required'}), 403
 
-        seller_profile = Profile.query.filter_by(user_id=user_id).first()
-        if not seller_profile:
+        if not principal.seller_profile_id:
             # This case might happen if a user has the 'seller' role but their profile is incomplete or deleted.
             return jsonify({'message': 'Seller profile not found.'}), 404
 
-        g.seller_profile = seller_profile
-        
         return fn(*args, **kwargs)
     return wrapper
 
@@ -41,11 +35,10 @@ def affiliate_required(f):
     """Decorator to check if user is an affiliate"""
     @wraps(f)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'affiliate':
+        principal = current_principal()
+
+        if not principal or principal.role != 'affiliate':
             return jsonify({'message': 'Affiliate access required'}), 403
-            
+
         return f(*args, **kwargs)
     return wrapper
@@ -0,0 +1,465 @@
+import hashlib
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, or_, text
+
+from models import db, TokenBlocklist
+from utils.cache import response_cache, RedisCacheBackend
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Revoked tokens the filter is sized for before it is rebuilt larger
+BLOOM_CAPACITY = int(os.environ.get('TOKEN_BLOCKLIST_BLOOM_CAPACITY', 100000))
+
+# Target false positive rate; false positives cost one DB lookup
+BLOOM_ERROR_RATE = float(os.environ.get('TOKEN_BLOCKLIST_BLOOM_ERROR_RATE', 0.001))
+
+# Confirmed revoked jtis remembered per worker
+CONFIRMED_MAX_ENTRIES = int(os.environ.get('TOKEN_BLOCKLIST_LRU_SIZE', 10000))
+
+# Rows are re-read this far behind the watermark, covering transactions
+# that committed out of created_at order
+REFRESH_OVERLAP = timedelta(seconds=int(os.environ.get('TOKEN_BLOCKLIST_REFRESH_OVERLAP_SECONDS', 5)))
+
+# Touched on every revocation when the response cache has no shared backend
+SIGNAL_FILE = os.environ.get(
+    'TOKEN_BLOCKLIST_SIGNAL_FILE',
+    os.path.join(tempfile.gettempdir(), 'afripulse-token-blocklist.signal')
+)
+
+# Response cache namespace used as the revocation counter with Redis
+SIGNAL_NAMESPACE = 'token_blocklist'
+
+# Daily partitions kept ahead of today when the table is partitioned
+# (see scripts/partition_token_blocklist.py)
+PARTITION_DAYS_AHEAD = int(os.environ.get('TOKEN_BLOCKLIST_PARTITION_DAYS_AHEAD', 7))
+
+# MySQL named lock held by the one worker rotating partitions
+PARTITION_ROTATION_LOCK = 'token_blocklist_rotate'
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings
+
+    ``in`` never misses an added value; it may (rarely) report a value that
+    was never added.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class _FileSignal:
+    """
+    Revocation counter shared by the workers of one host through a file
+
+    Each bump appends a byte, so the (mtime, size) pair changes even when two
+    bumps land within the filesystem's timestamp resolution.
+    """
+
+    max_size = 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        return stat.st_mtime_ns, stat.st_size
+
+    def bump(self):
+        with open(self.path, 'ab') as signal_file:
+            if signal_file.tell() >= self.max_size:
+                signal_file.truncate(0)
+            signal_file.write(b'.')
+
+
+class _CacheSignal:
+    """Revocation counter kept with the response cache's shared namespace versions"""
+
+    def version(self):
+        return response_cache.backend.get_version(SIGNAL_NAMESPACE)
+
+    def bump(self):
+        response_cache.backend.bump_version(SIGNAL_NAMESPACE)
+
+
+class BlocklistCache:
+    """
+    Answers "is this token revoked?" without a query for the common case
+
+    Every revoked jti is kept in a Bloom filter, so tokens that were never
+    revoked (nearly all of them) are accepted from memory. A filter hit is
+    confirmed against the database once and remembered in a bounded LRU.
+
+    Workers learn about revocations made elsewhere through a shared signal:
+    Redis when the response cache uses it, otherwise a file on the host.
+    When the signal moves, new ``token_blocklist`` rows are pulled by
+    ``created_at`` before the token is checked.
+
+    Rows with a ``user_id`` revoke every access token that user was issued
+    before ``issued_before`` (e.g. after a role change, so stale role claims
+    stop working); they are kept in a small dict rather than the filter.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._signal = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._confirmed = OrderedDict()
+            self._user_revocations = {}
+            self._watermark = None
+            self._seen_version = None
+
+    def _get_signal(self):
+        if self._signal is None:
+            if isinstance(response_cache.backend, RedisCacheBackend):
+                self._signal = _CacheSignal()
+            else:
+                self._signal = _FileSignal(SIGNAL_FILE)
+        return self._signal
+
+    def _pull(self, since=None):
+        query = db.session.query(
+            TokenBlocklist.jti,
+            TokenBlocklist.created_at,
+            TokenBlocklist.user_id,
+            TokenBlocklist.issued_before
+        )
+        if since is not None:
+            query = query.filter(TokenBlocklist.created_at >= since - REFRESH_OVERLAP)
+        for jti, created_at, user_id, issued_before in query.execution_options(yield_per=1000):
+            if user_id is not None:
+                self._add_user_revocation(user_id, issued_before)
+            elif jti not in self._filter:
+                self._filter.add(jti)
+            if created_at is not None and (self._watermark is None or created_at > self._watermark):
+                self._watermark = created_at
+
+    def _add_user_revocation(self, user_id, issued_before):
+        if issued_before is None:
+            return
+        cutoff = issued_before.replace(tzinfo=timezone.utc).timestamp()
+        if cutoff > self._user_revocations.get(user_id, 0):
+            self._user_revocations[user_id] = cutoff
+
+    def _rebuild(self):
+        count = db.session.query(TokenBlocklist.id).count()
+        self._filter = BloomFilter(max(BLOOM_CAPACITY, count * 2), BLOOM_ERROR_RATE)
+        self._user_revocations = {}
+        self._watermark = None
+        self._pull()
+        logger.info(f'Token blocklist filter built with {count} revoked tokens')
+
+    def _sync(self):
+        signal = self._get_signal()
+        try:
+            version = signal.version()
+        except Exception as e:
+            logger.error(f"Failed to read token blocklist signal: {str(e)}")
+            version = None
+
+        if self._filter is None:
+            self._rebuild()
+        elif version is None or version != self._seen_version:
+            self._pull(self._watermark)
+            if self._filter.count > self._filter.capacity:
+                self._rebuild()
+        self._seen_version = version
+
+    def is_revoked(self, jti):
+        """
+        Whether a token id has been revoked
+
+        Args:
+            jti (str): The token's ``jti`` claim
+
+        Returns:
+            bool: True if the token is in the blocklist
+        """
+        with self._lock:
+            self._sync()
+        return self._jti_revoked(jti)
+
+    def is_token_revoked(self, payload):
+        """
+        Whether a decoded token is revoked, by its jti or by a user-wide revocation
+
+        Args:
+            payload (dict): Decoded JWT payload
+
+        Returns:
+            bool: True if the token must be rejected
+        """
+        with self._lock:
+            self._sync()
+            if payload.get('type') == 'access':
+                cutoff = self._user_revocations.get(payload.get('sub'))
+                if cutoff is not None and payload.get('iat', 0) < cutoff:
+                    return True
+        return self._jti_revoked(payload['jti'])
+
+    def _jti_revoked(self, jti):
+        with self._lock:
+            if jti in self._confirmed:
+                self._confirmed.move_to_end(jti)
+                return True
+            if jti not in self._filter:
+                return False
+
+        # Filter hit: either revoked or a false positive
+        revoked = db.session.query(TokenBlocklist.id).filter_by(jti=jti).first() is not None
+        if revoked:
+            with self._lock:
+                self._confirmed[jti] = True
+                while len(self._confirmed) > CONFIRMED_MAX_ENTRIES:
+                    self._confirmed.popitem(last=False)
+        return revoked
+
+    def revoked(self, jti):
+        """
+        Record a revocation that was just committed to ``token_blocklist``
+
+        Adds the jti locally and moves the shared signal so other workers
+        pull it before their next check.
+        """
+        with self._lock:
+            if self._filter is not None and jti not in self._filter:
+                self._filter.add(jti)
+            self._confirmed[jti] = True
+        self._signal_revocation()
+
+    def user_revoked(self, entry):
+        """Record a user-wide revocation that was just committed (see ``revoke_user_tokens``)"""
+        with self._lock:
+            self._add_user_revocation(entry.user_id, entry.issued_before)
+        self._signal_revocation()
+
+    def _signal_revocation(self):
+        try:
+            self._get_signal().bump()
+        except Exception as e:
+            logger.error(f"Failed to signal token revocation: {str(e)}")
+
+
+blocklist_cache = BlocklistCache()
+
+
+def revoke_user_tokens(user_id):
+    """
+    Revoke every access token issued to a user so far
+
+    Used when something carried in the token's claims (such as the role)
+    changes; the client then gets a 401 and refreshes, receiving a token
+    with up-to-date claims. The row is added to the session; call
+    ``blocklist_cache.user_revoked(entry)`` after committing it.
+
+    Args:
+        user_id (str): The user whose tokens are revoked
+
+    Returns:
+        TokenBlocklist: The pending blocklist entry
+    """
+    # ``iat`` has whole-second precision; a token refreshed later in this
+    # same second must not be caught by the cutoff
+    now = datetime.utcnow().replace(microsecond=0)
+    entry = TokenBlocklist(
+        jti=str(uuid.uuid4()),
+        user_id=user_id,
+        issued_before=now,
+        # No token issued before now outlives the access token lifetime
+        expires_at=now + current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    )
+    db.session.add(entry)
+    return entry
+
+
+def _daily_partitions():
+    """
+    Daily partitions of a partitioned MySQL token_blocklist
+
+    Returns:
+        list: (partition name, expiry date) pairs, empty when the table is
+        not partitioned or the database is not MySQL
+    """
+    if db.engine.dialect.name != 'mysql':
+        return []
+    names = db.session.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'token_blocklist' "
+        "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+    )).scalars().all()
+    partitions = []
+    for name in names:
+        if name == 'pmax':
+            continue
+        partitions.append((name, datetime.strptime(name, 'p%Y%m%d').date()))
+    return partitions
+
+
+def _rotate_partitions(today):
+    """
+    Drop daily partitions that only hold expired tokens and add upcoming ones
+
+    Every worker's pruner calls this, so the partition changes run under the
+    MySQL named lock ``PARTITION_ROTATION_LOCK``. The first worker to get it
+    rotates; the others skip straight away instead of repeating the same
+    DDL, which would fail on partitions that are already gone. The ALTERs
+    only run when a day has passed, so the table's metadata lock is taken
+    about once a day.
+
+    Returns:
+        int: Number of partitions dropped
+    """
+    if db.engine.dialect.name != 'mysql':
+        return 0
+    if not db.session.execute(text("SELECT GET_LOCK(:name, 0)"), {'name': PARTITION_ROTATION_LOCK}).scalar():
+        return 0
+    try:
+        return _rotate_locked_partitions(today)
+    finally:
+        db.session.execute(text("SELECT RELEASE_LOCK(:name)"), {'name': PARTITION_ROTATION_LOCK})
+
+
+def _rotate_locked_partitions(today):
+    partitions = _daily_partitions()
+    if not partitions:
+        return 0
+
+    expired = [name for name, day in partitions if day < today]
+    if expired:
+        db.session.execute(text(f"ALTER TABLE token_blocklist DROP PARTITION {', '.join(expired)}"))
+
+    last_day = partitions[-1][1]
+    upcoming = [today + timedelta(days=offset) for offset in range(PARTITION_DAYS_AHEAD + 1)]
+    upcoming = [day for day in upcoming if day > last_day]
+    if upcoming:
+        definitions = ', '.join(
+            f"PARTITION p{day:%Y%m%d} VALUES LESS THAN (TO_DAYS('{day + timedelta(days=1):%Y-%m-%d}'))"
+            for day in upcoming
+        )
+        db.session.execute(text(
+            f"ALTER TABLE token_blocklist REORGANIZE PARTITION pmax INTO "
+            f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        ))
+    return len(expired)
+
+
+def prune_expired_tokens(batch_size=5000, now=None):
+    """
+    Delete blocklist rows whose token has expired
+
+    An expired token is rejected before the blocklist is consulted, so its
+    row serves no purpose. On a partitioned table whole days are dropped
+    first; the remaining expired rows are deleted in batches of
+    ``batch_size``, committing after each, so locks stay short. Rows written
+    before ``expires_at`` existed are removed once they are older than the
+    access token lifetime plus a day.
+
+    Args:
+        batch_size (int): Rows deleted per statement
+        now (datetime): Current UTC time, for testing
+
+    Returns:
+        int: Number of rows deleted in batches (partition drops not included)
+    """
+    now = now or datetime.utcnow()
+    try:
+        dropped = _rotate_partitions(now.date())
+    except Exception as e:
+        # The batched delete below still removes the expired rows
+        db.session.rollback()
+        logger.error(f"Token blocklist partition rotation failed: {str(e)}")
+        dropped = 0
+
+    legacy_cutoff = now - current_app.config['JWT_ACCESS_TOKEN_EXPIRES'] - timedelta(days=1)
+    expired = or_(
+        TokenBlocklist.expires_at < now,
+        and_(TokenBlocklist.expires_at.is_(None), TokenBlocklist.created_at < legacy_cutoff)
+    )
+
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.query(TokenBlocklist.id).filter(expired).limit(batch_size)]
+        if not ids:
+            break
+        TokenBlocklist.query.filter(TokenBlocklist.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    logger.info(f'Pruned {deleted} expired blocklist rows and {dropped} partitions')
+    return deleted
+
+
+def start_blocklist_pruner(app):
+    """
+    Run ``prune_expired_tokens`` every ``TOKEN_BLOCKLIST_PRUNE_INTERVAL`` seconds
+
+    Started by the serving processes only: gunicorn's ``post_worker_init``
+    hook and ``python app.py``. Every worker runs its own daemon thread; the
+    sleep is jittered so they rarely overlap. Overlapping batched deletes
+    are harmless, and partition rotation is serialized by a named lock (see
+    ``_rotate_partitions``). Set the interval to 0 to disable the thread and
+    prune from cron with ``flask prune-token-blocklist`` instead.
+
+    Returns:
+        Thread: The pruner thread, or None when disabled
+    """
+    interval = app.config.get('TOKEN_BLOCKLIST_PRUNE_INTERVAL', 0)
+    if not interval:
+        return None
+    batch_size = app.config.get('TOKEN_BLOCKLIST_PRUNE_BATCH_SIZE', 5000)
+
+    def run():
+        while True:
+            time.sleep(interval * random.uniform(0.75, 1.25))
+            with app.app_context():
+                try:
+                    prune_expired_tokens(batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Token blocklist pruning failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='token-blocklist-pruner', daemon=True)
+    thread.start()
+    return thread
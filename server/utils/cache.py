@@ -0,0 +1,205 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import request, make_response
+
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+
+class LocalCacheBackend:
+    """
+    In-process LRU cache with per-entry TTL
+
+    Entries live in a single worker's memory. Good enough for one process,
+    but with several gunicorn workers an invalidation only reaches the worker
+    that handled the write; the TTL bounds how stale the others can get.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, namespace):
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisCacheBackend:
+    """
+    Redis-backed cache shared by every worker
+
+    Namespace versions are Redis counters, so a write handled by one worker
+    invalidates the entry for all of them. Eviction is left to Redis'
+    ``maxmemory-policy`` (e.g. ``allkeys-lru``) plus the per-entry TTL.
+    """
+
+    def __init__(self, url, prefix='afripulse:cache:'):
+        import redis  # Optional dependency, only needed for the shared backend
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        body, status, mimetype, headers = json.loads(raw)
+        return base64.b64decode(body), status, mimetype, headers
+
+    def set(self, key, value, ttl):
+        body, status, mimetype, headers = value
+        raw = json.dumps([base64.b64encode(body).decode('ascii'), status, mimetype, headers])
+        self._client.set(self._prefix + key, raw, ex=max(int(ttl), 1))
+
+    def get_version(self, namespace):
+        raw = self._client.get(f'{self._prefix}version:{namespace}')
+        return int(raw) if raw is not None else 0
+
+    def bump_version(self, namespace):
+        self._client.incr(f'{self._prefix}version:{namespace}')
+
+    def clear(self):
+        keys = list(self._client.scan_iter(f'{self._prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+# Response headers stored with a cached entry so hits keep their validators
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+class ResponseCache:
+    """
+    Versioned cache for anonymous GET responses
+
+    Each cached route belongs to a namespace. The cache key embeds the
+    namespace's current version, so bumping the version from a write path
+    makes every old entry for that namespace unreachable at once; the stale
+    entries then age out through LRU/TTL.
+    """
+
+    def __init__(self, app=None):
+        self.backend = LocalCacheBackend()
+        self.default_ttl = 60
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'local')
+        if backend == 'redis':
+            self.backend = RedisCacheBackend(app.config['RESPONSE_CACHE_REDIS_URL'])
+        else:
+            self.backend = LocalCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+    def invalidate(self, *namespaces):
+        """Invalidate every cached response in the given namespaces"""
+        for namespace in namespaces:
+            try:
+                self.backend.bump_version(namespace)
+            except Exception as e:
+                logger.error(f"Failed to invalidate cache namespace {namespace}: {str(e)}")
+
+    def _key(self, namespace):
+        args = urlencode(sorted(request.args.items(multi=True)))
+        version = self.backend.get_version(namespace)
+        return f'{namespace}:v{version}:{request.path}?{args}'
+
+    def cached(self, namespace, ttl=None):
+        """
+        Cache successful GET responses of a view
+
+        Args:
+            namespace (str or callable): Namespace name, or a function taking
+                the view's keyword arguments and returning one
+            ttl (int): Seconds to keep an entry, defaults to RESPONSE_CACHE_TTL
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return fn(*args, **kwargs)
+
+                name = namespace(**kwargs) if callable(namespace) else namespace
+                try:
+                    key = self._key(name)
+                    hit = self.backend.get(key)
+                except Exception as e:
+                    logger.error(f"Response cache lookup failed: {str(e)}")
+                    return fn(*args, **kwargs)
+
+                if hit is not None:
+                    body, status, mimetype, headers = hit
+                    response = make_response(body, status)
+                    response.mimetype = mimetype
+                    response.headers.update(headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    # Turns the hit into a 304 when the client's validators still match
+                    return response.make_conditional(request)
+
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    try:
+                        self.backend.set(
+                            key,
+                            (
+                                response.get_data(),
+                                response.status_code,
+                                response.mimetype,
+                                {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                            ),
+                            ttl or self.default_ttl
+                        )
+                    except Exception as e:
+                        logger.error(f"Response cache store failed: {str(e)}")
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_catalog(*slugs):
+    """Invalidate cached catalog reads after a product write"""
+    response_cache.invalidate('products', 'categories', *[f'product:{slug}' for slug in slugs if slug])
@@ -0,0 +1,240 @@
+from sqlalchemy import case, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db, Cart, CartItem
+
+
+def _insert(model):
+    """Dialect-specific INSERT that supports an upsert clause"""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        return mysql.insert(model)
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    raise NotImplementedError(f'Cart upserts are not supported on {dialect}')
+
+
+def _inserted(stmt):
+    """The row the INSERT tried to write, for use in the update clause"""
+    return stmt.inserted if db.engine.dialect.name == 'mysql' else stmt.excluded
+
+
+def _on_conflict(stmt, index_elements, **values):
+    """Attach the dialect's 'update these columns on a duplicate key' clause"""
+    if db.engine.dialect.name == 'mysql':
+        return stmt.on_duplicate_key_update(**values)
+    if values:
+        return stmt.on_conflict_do_update(index_elements=index_elements, set_=values)
+    return stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+
+def find_cart(user_id):
+    """
+    The user's cart, or None if they have never added anything
+
+    Reads never create a cart; ``get_or_create_cart`` does that on the
+    first write.
+    """
+    return Cart.query.filter_by(user_id=user_id).first()
+
+
+def get_or_create_cart(user_id):
+    """
+    The user's cart, created on first use
+
+    Creation is an insert that ignores the duplicate key on ``user_id``, so
+    two concurrent first writes end up sharing one cart instead of one of
+    them failing. The cart is then re-read with a locking read: under
+    REPEATABLE READ a plain SELECT would still see the transaction's old
+    snapshot, without the row a concurrent request just committed, while
+    ``SELECT ... FOR UPDATE`` reads the latest committed version. The
+    caller commits.
+
+    Args:
+        user_id (str): Cart owner
+
+    Returns:
+        Cart: The user's cart
+    """
+    cart = find_cart(user_id)
+    if cart is not None:
+        return cart
+
+    stmt = _insert(Cart).values(user_id=user_id)
+    # MySQL has no "do nothing"; re-assigning the key column is the no-op update
+    values = {'user_id': _inserted(stmt).user_id} if db.engine.dialect.name == 'mysql' else {}
+    db.session.execute(_on_conflict(stmt, ['user_id'], **values))
+    return Cart.query.filter_by(user_id=user_id).with_for_update().first()
+
+
+# Most operations accepted by one bulk cart update
+MAX_CART_OPERATIONS = 100
+
+# Most units of one product a cart line may hold
+MAX_CART_QUANTITY = 999
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+
+
+class CartOperationError(ValueError):
+    """A bulk cart operation is malformed"""
+
+
+def _upsert_cart_items(cart_id, quantities, increment):
+    """
+    Write cart lines for several products in one statement
+
+    Args:
+        cart_id (str): Cart id
+        quantities (dict): Units by product id
+        increment (bool): Add to an existing line's quantity rather than replace it
+    """
+    stmt = _insert(CartItem).values([
+        {'cart_id': cart_id, 'product_id': product_id, 'quantity': quantity}
+        for product_id, quantity in quantities.items()
+    ])
+    quantity = _inserted(stmt).quantity
+    if increment:
+        # Capped in SQL too, so concurrent adds can't push a line past the limit
+        total = CartItem.__table__.c.quantity + quantity
+        quantity = case((total > MAX_CART_QUANTITY, MAX_CART_QUANTITY), else_=total)
+    db.session.execute(_on_conflict(
+        stmt, ['cart_id', 'product_id'],
+        quantity=quantity,
+        updated_at=func.now()
+    ))
+
+
+def add_cart_item(cart_id, product_id, quantity):
+    """
+    Add ``quantity`` of a product to a cart in one statement
+
+    Runs ``INSERT ... ON DUPLICATE KEY UPDATE quantity = quantity + ?`` (or
+    the ``ON CONFLICT`` equivalent) against the ``(cart_id, product_id)``
+    unique key: a new product gets a line, an existing line has its quantity
+    increased, and requests fired twice can't create two lines. The caller
+    commits.
+
+    Args:
+        cart_id (str): Cart id
+        product_id (str): Product id
+        quantity (int): Units to add
+    """
+    _upsert_cart_items(cart_id, {product_id: quantity}, increment=True)
+
+
+def parse_cart_operations(operations):
+    """
+    Validate a bulk cart request and fold it into one change per product
+
+    Operations apply in order: ``add`` adds units, ``set`` replaces the
+    quantity (0 removes the line) and ``remove`` drops the line. Several
+    operations on the same product collapse into their net effect, so an
+    ``add`` after a ``set`` or ``remove`` becomes a ``set``. No quantity,
+    given or folded, may exceed ``MAX_CART_QUANTITY``.
+
+    Args:
+        operations (list): Dicts with ``op``, ``product_id`` and, for
+            ``add``/``set``, ``quantity``
+
+    Returns:
+        dict: ``(action, quantity)`` by product id, action being 'add',
+        'set' or 'remove'
+
+    Raises:
+        CartOperationError: If the list or one of its operations is invalid
+    """
+    if not isinstance(operations, list) or not operations:
+        raise CartOperationError('operations must be a non-empty list')
+    if len(operations) > MAX_CART_OPERATIONS:
+        raise CartOperationError(f'At most {MAX_CART_OPERATIONS} operations per request')
+
+    changes = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise CartOperationError(f'Operation {index} must be an object')
+        op = operation.get('op')
+        product_id = operation.get('product_id')
+        quantity = operation.get('quantity', 1 if op == 'add' else None)
+        if op not in CART_OPERATIONS:
+            raise CartOperationError(f"Operation {index}: op must be one of {', '.join(CART_OPERATIONS)}")
+        if not product_id or not isinstance(product_id, str):
+            raise CartOperationError(f'Operation {index}: product_id is required')
+        if op == 'add' and (not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1):
+            raise CartOperationError(f'Operation {index}: quantity must be a positive integer')
+        if op == 'set' and (not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0):
+            raise CartOperationError(f'Operation {index}: quantity must be a non-negative integer')
+        if op in ('add', 'set') and quantity > MAX_CART_QUANTITY:
+            raise CartOperationError(f'Operation {index}: quantity must be at most {MAX_CART_QUANTITY}')
+
+        if op == 'set' and quantity == 0:
+            op = 'remove'
+        action, current = changes.get(product_id, (None, 0))
+        if op == 'remove':
+            changes[product_id] = ('remove', 0)
+        elif op == 'set':
+            changes[product_id] = ('set', quantity)
+        elif action == 'remove':
+            changes[product_id] = ('set', quantity)
+        else:
+            changes[product_id] = (action or 'add', current + quantity)
+        if changes[product_id][1] > MAX_CART_QUANTITY:
+            raise CartOperationError(f'Operation {index}: a cart holds at most {MAX_CART_QUANTITY} of a product')
+    return changes
+
+
+def check_cart_quantities(cart, changes):
+    """
+    Make sure folded changes keep every line of a cart within the limit
+
+    ``add`` changes are checked against the quantities already in the cart,
+    with one query; ``set`` quantities were checked by
+    ``parse_cart_operations``.
+
+    Args:
+        cart (Cart): The user's cart, or None if they have none yet
+        changes (dict): Output of ``parse_cart_operations``
+
+    Raises:
+        CartOperationError: If a line would hold more than MAX_CART_QUANTITY units
+    """
+    added = {product_id: quantity for product_id, (action, quantity) in changes.items() if action == 'add'}
+    if cart is None or not added:
+        return
+    current = db.session.query(CartItem.product_id, CartItem.quantity).filter(
+        CartItem.cart_id == cart.id,
+        CartItem.product_id.in_(list(added))
+    )
+    over = [product_id for product_id, quantity in current if quantity + added[product_id] > MAX_CART_QUANTITY]
+    if over:
+        raise CartOperationError(f'A cart holds at most {MAX_CART_QUANTITY} of a product')
+
+
+def apply_cart_operations(cart, changes):
+    """
+    Apply folded cart changes with at most three statements
+
+    All increments go in one multi-row upsert, all replacements in another
+    and all removals in one DELETE. Increments stop at
+    ``MAX_CART_QUANTITY``. The caller validates the products (and, to refuse
+    rather than cap, ``check_cart_quantities``) and commits.
+
+    Args:
+        cart (Cart): The user's cart
+        changes (dict): Output of ``parse_cart_operations``
+    """
+    added = {product_id: quantity for product_id, (action, quantity) in changes.items() if action == 'add'}
+    replaced = {product_id: quantity for product_id, (action, quantity) in changes.items() if action == 'set'}
+    removed = [product_id for product_id, (action, _) in changes.items() if action == 'remove']
+
+    if added:
+        _upsert_cart_items(cart.id, added, increment=True)
+    if replaced:
+        _upsert_cart_items(cart.id, replaced, increment=False)
+    if removed:
+        CartItem.query.filter(
+            CartItem.cart_id == cart.id,
+            CartItem.product_id.in_(removed)
+        ).delete(synchronize_session=False)
@@ -0,0 +1,62 @@
+import hashlib
+from datetime import timezone
+
+from flask import request, make_response
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from the parts that identify a representation"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def latest(*timestamps):
+    """Most recent of the given datetimes, ignoring None"""
+    values = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(values) if values else None
+
+
+def _as_utc(timestamp):
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Check the request's validators against the current ones
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since`` as per
+    RFC 7232. Call this before serializing so a match skips the work.
+
+    Args:
+        etag (str): Current ETag value (unquoted)
+        last_modified (datetime): Current modification time
+
+    Returns:
+        Response: A 304 response carrying the validators, or None if the
+        client's copy is stale
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified is not None:
+        # HTTP dates have one-second resolution
+        matched = _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return with_validators(make_response('', 304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag and Last-Modified headers to a response"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return response
@@ -0,0 +1,304 @@
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, EmailOutbox
+from utils.email_service import (
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, FROM_EMAIL,
+    SMTP_STARTTLS, SMTP_AUTH, SMTP_TIMEOUT
+)
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+
+class PermanentDeliveryError(Exception):
+    """The server rejected the message itself; retrying will not help"""
+
+
+def build_message(to_email, subject, html_content):
+    """Build the MIME message for an outbox entry"""
+    message = MIMEMultipart('alternative')
+    message['Subject'] = subject
+    message['From'] = FROM_EMAIL
+    message['To'] = to_email
+    message.attach(MIMEText(html_content, 'html'))
+    return message.as_string()
+
+
+class _Connection:
+    """An authenticated SMTP session and how much it has been used"""
+
+    def __init__(self):
+        self.smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            self.smtp.starttls()
+        if SMTP_USER and SMTP_PASSWORD:
+            self.smtp.login(SMTP_USER, SMTP_PASSWORD)
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def is_alive(self):
+        try:
+            return self.smtp.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPConnectionPool:
+    """
+    Reuses authenticated SMTP connections across messages and batches
+
+    Connections idle for longer than ``idle_timeout`` are checked with NOOP
+    before reuse, and each is retired after ``max_messages`` messages since
+    many providers cap the messages per session.
+    """
+
+    def __init__(self, idle_timeout=60, max_messages=100):
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle = queue.LifoQueue()
+
+    def acquire(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return _Connection()
+            if time.monotonic() - connection.last_used < self.idle_timeout or connection.is_alive():
+                return connection
+            connection.close()
+
+    def release(self, connection, broken=False):
+        connection.last_used = time.monotonic()
+        if broken or connection.sent >= self.max_messages:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    def send(self, to_email, raw_message):
+        """
+        Send one message, reconnecting once if the pooled session was dropped
+
+        Raises:
+            PermanentDeliveryError: If the server rejected the message
+            smtplib.SMTPException, OSError: On transient failures
+        """
+        for attempt in range(2):
+            connection = self.acquire()
+            try:
+                connection.smtp.sendmail(FROM_EMAIL, to_email, raw_message)
+            except smtplib.SMTPServerDisconnected:
+                self.release(connection, broken=True)
+                if attempt:
+                    raise
+                continue
+            except smtplib.SMTPRecipientsRefused as e:
+                self.release(connection)
+                raise PermanentDeliveryError(str(e.recipients))
+            except smtplib.SMTPDataError as e:
+                self.release(connection)
+                if 500 <= e.smtp_code < 600:
+                    raise PermanentDeliveryError(f'{e.smtp_code} {e.smtp_error!r}')
+                raise
+            except Exception:
+                self.release(connection, broken=True)
+                raise
+            connection.sent += 1
+            self.release(connection)
+            return
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class EmailSender:
+    """
+    Background delivery of the email outbox
+
+    Each pass claims a batch of due entries, marking them ``sending`` with a
+    lease so other workers skip them (``SKIP LOCKED`` on MySQL), sends them
+    over pooled SMTP connections and records the outcome. Failed sends are
+    retried with exponential backoff up to ``max_attempts``; messages the
+    server rejects outright are marked ``failed`` at once. An entry whose
+    worker died mid-send is picked up again when its lease lapses, so
+    delivery is at least once.
+
+    Every serving worker runs a sender thread (see ``start``) that polls
+    every ``interval`` seconds and is woken straight away when its own
+    process commits a new entry.
+    """
+
+    def __init__(self, app=None):
+        self.interval = 0
+        self.batch_size = 50
+        self.concurrency = 2
+        self.max_attempts = 8
+        self.retry_base_delay = 30
+        self.retry_max_delay = 3600
+        self.lease = 300
+        self.pool = SMTPConnectionPool()
+        self._wake = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('EMAIL_SENDER_INTERVAL', self.interval)
+        self.batch_size = app.config.get('EMAIL_SENDER_BATCH_SIZE', self.batch_size)
+        self.concurrency = app.config.get('EMAIL_SENDER_CONCURRENCY', self.concurrency)
+        self.max_attempts = app.config.get('EMAIL_SENDER_MAX_ATTEMPTS', self.max_attempts)
+        self.retry_base_delay = app.config.get('EMAIL_SENDER_RETRY_BASE_DELAY', self.retry_base_delay)
+        self.pool = SMTPConnectionPool(
+            idle_timeout=app.config.get('SMTP_IDLE_TIMEOUT', 60),
+            max_messages=app.config.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100)
+        )
+
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def _after_commit(self, session):
+        if session.info.pop('email_outbox_wake', False):
+            self._wake.set()
+
+    def _after_rollback(self, session):
+        session.info.pop('email_outbox_wake', None)
+
+    def start(self, app):
+        """
+        Start the sender thread of this process
+
+        Started by the serving processes only: gunicorn's ``post_worker_init``
+        hook and ``python app.py``, so migrations, scripts and
+        ``flask send-outbox-emails`` never run one. Set
+        ``EMAIL_SENDER_INTERVAL`` to 0 to send from cron with that command
+        instead.
+
+        Returns:
+            Thread: The sender thread, or None when disabled
+        """
+        if not self.interval:
+            return None
+        if SMTP_AUTH and not (SMTP_USER and SMTP_PASSWORD):
+            logger.error("SMTP credentials (SMTP_USER, SMTP_PASSWORD) are not set; queued emails will not be sent.")
+            return None
+
+        def run():
+            while True:
+                self._wake.wait(self.interval * random.uniform(0.75, 1.25))
+                self._wake.clear()
+                with app.app_context():
+                    try:
+                        self.send_pending()
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Email outbox pass failed: {str(e)}")
+                    finally:
+                        db.session.remove()
+
+        self._thread = threading.Thread(target=run, name='email-outbox-sender', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _claim(self):
+        now = datetime.utcnow()
+        entries = EmailOutbox.query.filter(
+            EmailOutbox.status.in_(('pending', 'sending')),
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        claimed = []
+        for entry in entries:
+            entry.status = 'sending'
+            entry.attempts += 1
+            entry.next_attempt_at = now + timedelta(seconds=self.lease)
+            claimed.append((entry.id, entry.to_email, entry.subject, entry.html_content, entry.attempts))
+        db.session.commit()
+        return claimed
+
+    def _deliver(self, claimed):
+        entry_id, to_email, subject, html_content, attempts = claimed
+        try:
+            self.pool.send(to_email, build_message(to_email, subject, html_content))
+            return entry_id, attempts, None, False
+        except PermanentDeliveryError as e:
+            return entry_id, attempts, str(e), True
+        except Exception as e:
+            return entry_id, attempts, f'{type(e).__name__}: {e}', False
+
+    def _backoff(self, attempts):
+        delay = min(self.retry_base_delay * 2 ** (attempts - 1), self.retry_max_delay)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _record(self, results):
+        entries = {
+            entry.id: entry
+            for entry in EmailOutbox.query.filter(EmailOutbox.id.in_([result[0] for result in results]))
+        }
+        now = datetime.utcnow()
+        for entry_id, attempts, error, permanent in results:
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            if error is None:
+                entry.status = 'sent'
+                entry.sent_at = now
+                entry.last_error = None
+            elif permanent or attempts >= self.max_attempts:
+                entry.status = 'failed'
+                entry.last_error = error
+                logger.error(f"Giving up on email {entry_id} to {entry.to_email} after {attempts} attempt(s): {error}")
+            else:
+                entry.status = 'pending'
+                entry.last_error = error
+                entry.next_attempt_at = now + self._backoff(attempts)
+                logger.warning(f"Email {entry_id} to {entry.to_email} failed (attempt {attempts}), will retry: {error}")
+        db.session.commit()
+
+    def send_pending(self):
+        """
+        Deliver every due outbox entry, one claimed batch at a time
+
+        Returns:
+            tuple: (sent, failed) counts, failed including retries scheduled
+        """
+        sent = failed = 0
+        while True:
+            claimed = self._claim()
+            if not claimed:
+                break
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                results = list(executor.map(self._deliver, claimed))
+            self._record(results)
+            sent += sum(1 for result in results if result[2] is None)
+            failed += sum(1 for result in results if result[2] is not None)
+            if len(claimed) < self.batch_size:
+                break
+        if sent or failed:
+            logger.info(f"Email outbox: {sent} sent, {failed} failed")
+        return sent, failed
+
+
+email_sender = EmailSender()
@@ -0,0 +1,79 @@
+import os
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Email templates shipped with the server
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'emails')
+
+
+class EmailTemplates:
+    """
+    Email templates compiled once per process
+
+    Templates are Jinja2 files under templates/emails, autoescaped, and
+    compiled to Python when the app starts (``init_app``) rather than on
+    the first email. Nothing is re-read from disk afterwards, so rendering
+    is just running the compiled template over the data it is given.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR):
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(['html']),
+            auto_reload=False,
+            cache_size=-1
+        )
+        self._templates = {}
+
+    def init_app(self, app):
+        self.compile_all()
+
+    def compile_all(self):
+        """Compile every template; called at startup"""
+        for name in self.env.list_templates(extensions=['html']):
+            self._templates[name] = self.env.get_template(name)
+        logger.info(f"Compiled {len(self._templates)} email templates")
+
+    def get(self, name):
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.env.get_template(name)
+        return template
+
+    def render(self, name, **context):
+        """
+        Render one email
+
+        Args:
+            name (str): Template file name, e.g. 'verification.html'
+            **context: Template variables
+
+        Returns:
+            str: Rendered HTML
+        """
+        return self.get(name).render(context)
+
+    def render_many(self, name, contexts, shared=None):
+        """
+        Render one template for many recipients
+
+        Args:
+            name (str): Template file name
+            contexts (iterable): One dict of variables per recipient
+            shared (dict): Variables common to every recipient
+
+        Yields:
+            str: Rendered HTML, in the order of ``contexts``
+        """
+        template = self.get(name)
+        shared = shared or {}
+        for context in contexts:
+            yield template.render({**shared, **context})
+
+
+email_templates = EmailTemplates()
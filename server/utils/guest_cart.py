@@ -0,0 +1,292 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, MergedGuestCart, Product
+from utils.carts import apply_cart_operations, get_or_create_cart, MAX_CART_QUANTITY
+from utils.logger import setup_logger
+from utils.product_cards import product_cards
+
+# Setup logger
+logger = setup_logger()
+
+# Where the client sends the guest cart token; the header wins over the cookie
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_HEADER = 'X-Guest-Cart'
+
+# Seconds a guest cart token stays valid after its last change
+GUEST_CART_MAX_AGE = int(os.environ.get('GUEST_CART_MAX_AGE_SECONDS', 30 * 24 * 3600))
+
+# Lines a guest cart may hold; keeps the token well under the 4KB cookie limit
+MAX_GUEST_CART_LINES = 50
+
+
+class GuestCartError(ValueError):
+    """A guest cart change can't be applied"""
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='guest-cart')
+
+
+def encode_guest_cart(lines, cart_id=None):
+    """
+    Sign a guest cart into a compact URL-safe token
+
+    Args:
+        lines (dict): Quantity by product id
+        cart_id (str): The guest cart's id; a new one is minted when omitted
+
+    Returns:
+        str: Token holding ``{'id': cart_id, 'lines': [[product_id, quantity], ...]}``
+    """
+    return _serializer().dumps({
+        'id': cart_id or str(uuid.uuid4()),
+        'lines': [[product_id, quantity] for product_id, quantity in lines.items()]
+    })
+
+
+def decode_guest_cart(token):
+    """
+    Read a guest cart token
+
+    Tokens with a bad signature, past ``GUEST_CART_MAX_AGE`` or with a
+    malformed payload read as an empty cart rather than an error.
+
+    Args:
+        token (str): Token from ``encode_guest_cart``
+
+    Returns:
+        tuple: ``(cart_id, lines)``; lines are the quantity by product id,
+        in the order they were added. ``cart_id`` is None for an empty cart.
+    """
+    if not token:
+        return None, {}
+    try:
+        payload = _serializer().loads(token, max_age=GUEST_CART_MAX_AGE)
+    except BadSignature:
+        return None, {}
+    if not isinstance(payload, dict) or not isinstance(payload.get('id'), str) or not isinstance(payload.get('lines'), list):
+        return None, {}
+    lines = {}
+    for line in payload['lines'][:MAX_GUEST_CART_LINES]:
+        if (isinstance(line, list) and len(line) == 2 and isinstance(line[0], str)
+                and isinstance(line[1], int) and not isinstance(line[1], bool) and line[1] > 0):
+            lines[line[0]] = line[1]
+    if not lines:
+        return None, {}
+    return payload['id'], lines
+
+
+def read_guest_cart():
+    """
+    The guest cart sent with the current request, from the header or cookie
+
+    A cart that was already merged into a user's cart reads as empty, so
+    the next change to it starts a new cart.
+
+    Returns:
+        tuple: ``(cart_id, lines)``, see ``decode_guest_cart``
+    """
+    cart_id, lines = decode_guest_cart(request.headers.get(GUEST_CART_HEADER) or request.cookies.get(GUEST_CART_COOKIE))
+    if cart_id and db.session.get(MergedGuestCart, cart_id) is not None:
+        return None, {}
+    return cart_id, lines
+
+
+def missing_guest_products(changes):
+    """
+    Products a guest cart change adds or sets that don't exist
+
+    Checked against the product card cache, so a guest cart change normally
+    doesn't touch the database at all.
+
+    Args:
+        changes (dict): Output of ``utils.carts.parse_cart_operations``
+
+    Returns:
+        list: Unknown product ids
+    """
+    product_ids = [product_id for product_id, (action, _) in changes.items() if action != 'remove']
+    if not product_ids:
+        return []
+    found = {card['id'] for card in product_cards.get_many(product_ids)}
+    return [product_id for product_id in product_ids if product_id not in found]
+
+
+def apply_guest_operations(lines, changes):
+    """
+    Apply folded cart changes to a guest cart
+
+    Args:
+        lines (dict): Current guest cart
+        changes (dict): Output of ``utils.carts.parse_cart_operations``
+
+    Returns:
+        dict: The new guest cart
+
+    Raises:
+        GuestCartError: If the cart would hold more than MAX_GUEST_CART_LINES
+            products, or a line more than MAX_CART_QUANTITY units
+    """
+    lines = dict(lines)
+    for product_id, (action, quantity) in changes.items():
+        if action == 'remove':
+            lines.pop(product_id, None)
+        elif action == 'set':
+            lines[product_id] = quantity
+        else:
+            lines[product_id] = lines.get(product_id, 0) + quantity
+        if lines.get(product_id, 0) > MAX_CART_QUANTITY:
+            raise GuestCartError(f'A cart holds at most {MAX_CART_QUANTITY} of a product')
+    if len(lines) > MAX_GUEST_CART_LINES:
+        raise GuestCartError(f'A guest cart holds at most {MAX_GUEST_CART_LINES} products')
+    return lines
+
+
+def serialize_guest_cart(lines):
+    """
+    Price a guest cart from the product card cache
+
+    Same shape as ``utils.serializers.serialize_cart``, with the product id
+    as the line id. Products that no longer exist are left out. Nothing is
+    written, and nothing is read from the database for cached products.
+
+    Args:
+        lines (dict): Quantity by product id
+
+    Returns:
+        dict: Cart dictionary with ``items``, ``item_count`` and ``total``
+    """
+    items = []
+    total = Decimal('0')
+    item_count = 0
+    for card in product_cards.get_many(list(lines)):
+        quantity = lines[card['id']]
+        unit_price = card['discount_price'] if card['discount_price'] is not None else card['price']
+        line_total = Decimal(str(unit_price or 0)) * quantity
+        total += line_total
+        item_count += quantity
+        items.append({
+            'id': card['id'],
+            'product_id': card['id'],
+            'quantity': quantity,
+            'name': card['name'],
+            'slug': card['slug'],
+            'image_url': card['image_url'],
+            'sellerBusinessName': card['sellerBusinessName'],
+            'price': card['price'],
+            'discount_price': card['discount_price'],
+            'unit_price': unit_price,
+            'line_total': float(line_total)
+        })
+    return {
+        'id': None,
+        'user_id': None,
+        'items': items,
+        'item_count': item_count,
+        'total': float(total)
+    }
+
+
+def set_guest_cart_cookie(response, token):
+    """Store the guest cart token on the client, or drop the cookie when there is none"""
+    if not token:
+        return clear_guest_cart_cookie(response)
+    response.set_cookie(
+        GUEST_CART_COOKIE, token,
+        max_age=GUEST_CART_MAX_AGE, httponly=True, samesite='Lax', secure=request.is_secure
+    )
+    return response
+
+
+def clear_guest_cart_cookie(response):
+    response.delete_cookie(GUEST_CART_COOKIE, httponly=True, samesite='Lax', secure=request.is_secure)
+    return response
+
+
+def merge_guest_cart(user_id, lines):
+    """
+    Move a guest cart into the user's cart in one batch
+
+    Products still in the catalog are checked with one query and added to
+    the user's cart with a single multi-row upsert, so quantities add up
+    with whatever the user already had. The caller commits.
+
+    Args:
+        user_id (str): The user who just logged in
+        lines (dict): Guest cart to merge
+
+    Returns:
+        int: Number of products merged
+    """
+    if not lines:
+        return 0
+    found = {row.id for row in db.session.query(Product.id).filter(Product.id.in_(list(lines))).all()}
+    changes = {product_id: ('add', quantity) for product_id, quantity in lines.items() if product_id in found}
+    if not changes:
+        return 0
+    apply_cart_operations(get_or_create_cart(user_id), changes)
+    logger.info(f"Merged {len(changes)} guest cart products into the cart of user {user_id}")
+    return len(changes)
+
+
+def merge_request_guest_cart(user_id):
+    """
+    Merge the guest cart sent with the current request and commit
+
+    A guest cart is merged at most once: its id is inserted into
+    ``merged_guest_carts`` in the same transaction as the merge, and the
+    primary key turns away a second merge, even a concurrent one. A client
+    that keeps sending the same ``X-Guest-Cart`` header after logging in
+    therefore adds nothing on later logins. A failed merge is logged and
+    rolled back; it never fails the login.
+
+    Args:
+        user_id (str): The user who just logged in
+
+    Returns:
+        bool: Whether a guest cart was merged, i.e. its cookie can be cleared
+    """
+    cart_id, lines = read_guest_cart()
+    if not lines:
+        return False
+    try:
+        db.session.add(MergedGuestCart(
+            id=cart_id,
+            expires_at=datetime.utcnow() + timedelta(seconds=GUEST_CART_MAX_AGE)
+        ))
+        db.session.flush()
+        merge_guest_cart(user_id, lines)
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        logger.info(f"Guest cart {cart_id} was already merged; not merging it into the cart of user {user_id}")
+        return False
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to merge guest cart for user {user_id}: {str(e)}")
+        return False
+
+
+def prune_merged_guest_carts(now=None):
+    """
+    Delete merge records whose guest cart tokens have all expired
+
+    Args:
+        now (datetime): Current UTC time, for tests
+
+    Returns:
+        int: Number of rows deleted
+    """
+    now = now or datetime.utcnow()
+    deleted = MergedGuestCart.query.filter(MergedGuestCart.expires_at < now).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -1,8 +1,7 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
 
-from models import User
+from utils.principal import current_principal
 
 def role_required(role):
     """
@@ -12,17 +11,16 @@ def role_required(role):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            principal = current_principal()
             
-            if not user:
+            if not principal:
                 return jsonify({'message': 'User not found'}), 404
                 
             if isinstance(role, list):
-                if user.role not in role:
+                if principal.role not in role:
                     return jsonify({'message': f'Access denied. Required roles: {", ".join(role)}'}), 403
             else:
-                if user.role != role:
+                if principal.role != role:
                     return jsonify({'message': f'Access denied. Required role: {role}'}), 403
                     
             return fn(*args, **kwargs)
@@ -0,0 +1,82 @@
+from flask import g, has_request_context, request
+from sqlalchemy.orm import joinedload
+
+from models import User
+from utils.logger import setup_logger
+from utils.metrics import count_identity_loads_avoided
+
+# Setup logger
+logger = setup_logger()
+
+# Profile relationships loaded together with the user
+PROFILE_RELATIONSHIPS = (User.profile, User.seller_profile, User.affiliate_profile)
+
+
+class RequestIdentityMap:
+    """
+    Request-local map of users with their profile rows already loaded
+
+    The first lookup of a user in a request runs one query joining
+    ``profiles``, ``seller_profiles`` and ``affiliate_profiles``; later
+    lookups of the same user, and every ``user.profile`` /
+    ``user.seller_profile`` / ``user.affiliate_profile`` access, are served
+    from memory. Without it each of those costs its own query.
+
+    Loads avoided are counted per request: lookups answered from the map,
+    plus the profile relationships each joined query filled in, which would
+    otherwise be lazy-loaded one query each. The count is logged at debug
+    level when the request ends and added to the
+    ``afripulse_identity_map_loads_avoided_total`` metric.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.teardown_request(self._report)
+
+    def _users(self):
+        if 'identity_map' not in g:
+            g.identity_map = {}
+            g.identity_map_avoided = 0
+        return g.identity_map
+
+    def user(self, user_id, refresh=False):
+        """
+        Get a user with its profiles, loading them at most once per request
+
+        Args:
+            user_id (str): The user's ID
+            refresh (bool): Reload the rows, e.g. after a commit expired them
+
+        Returns:
+            User: The user, or None if it does not exist
+        """
+        users = self._users()
+        if user_id in users and not refresh:
+            g.identity_map_avoided += 1
+            return users[user_id]
+
+        query = User.query.options(*(joinedload(relationship) for relationship in PROFILE_RELATIONSHIPS))
+        if refresh:
+            query = query.execution_options(populate_existing=True)
+        users[user_id] = query.filter(User.id == user_id).first()
+        if users[user_id] is not None:
+            g.identity_map_avoided += len(PROFILE_RELATIONSHIPS)
+        return users[user_id]
+
+    def _report(self, exc=None):
+        if not has_request_context():
+            return
+        avoided = g.get('identity_map_avoided', 0)
+        if not avoided:
+            return
+        logger.debug(
+            f"Identity map: {len(g.identity_map)} user(s) loaded, "
+            f"{avoided} load(s) avoided for {request.method} {request.path}"
+        )
+        count_identity_loads_avoided(avoided)
+
+
+identity_map = RequestIdentityMap()
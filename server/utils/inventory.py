@@ -0,0 +1,73 @@
+from sqlalchemy import case
+
+from models import db, Product
+
+
+class InsufficientStock(Exception):
+    """One or more products don't have the stock an order asks for"""
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Not enough stock for {', '.join(product_ids)}")
+
+
+def _adjust_stock(quantities, sign):
+    """One UPDATE that moves ``inventory_count`` of every product by ``sign * quantity``"""
+    product_ids = sorted(quantities)
+    delta = case(
+        {product_id: quantities[product_id] for product_id in product_ids},
+        value=Product.id
+    )
+    stmt = db.update(Product).where(Product.id.in_(product_ids))
+    if sign < 0:
+        stmt = stmt.where(Product.inventory_count >= delta)
+    result = db.session.execute(
+        stmt.values(inventory_count=Product.inventory_count + sign * delta),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def reserve_stock(quantities):
+    """
+    Take stock for an order, all or nothing, without overselling
+
+    A single conditional ``UPDATE products SET inventory_count =
+    inventory_count - q WHERE id = ... AND inventory_count >= q`` covers
+    every product. The check and the decrement happen under the same row
+    lock, so concurrent checkouts of the last units can't both succeed, and
+    rows are locked in primary key order, so checkouts sharing products
+    don't deadlock. The update runs in a savepoint: if any product is short,
+    the units taken from the others are given back before raising.
+
+    Args:
+        quantities (dict): Units by product id
+
+    Raises:
+        InsufficientStock: If any product has fewer units than requested
+    """
+    if not quantities:
+        return
+    savepoint = db.session.begin_nested()
+    if _adjust_stock(quantities, -1) == len(quantities):
+        savepoint.commit()
+        return
+    savepoint.rollback()
+
+    short = [
+        product_id for product_id, inventory_count in db.session.query(Product.id, Product.inventory_count)
+        .filter(Product.id.in_(list(quantities)))
+        if (inventory_count or 0) < quantities[product_id]
+    ]
+    raise InsufficientStock(short or sorted(quantities))
+
+
+def release_stock(quantities):
+    """
+    Put stock back, e.g. when an order is canceled
+
+    Args:
+        quantities (dict): Units by product id
+    """
+    if quantities:
+        _adjust_stock(quantities, 1)
@@ -1,46 +1,168 @@
+import atexit
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 'json' writes one compact JSON object per line; 'text' is the readable format
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text' if os.environ.get('FLASK_ENV', 'development') == 'development' else 'json')
+
+# Records waiting for the writer thread; beyond this they are dropped rather
+# than blocking the request thread
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+_lock = threading.Lock()
+
+
+def _reset_lock_after_fork():
+    # Another thread may have held the lock at fork time; the child starts unlocked
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per record, with any ``fields`` passed as extra"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic line format, with ``fields`` appended as key=value pairs"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    @staticmethod
+    def _value(value):
+        if value is None or isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str) and value and not any(c.isspace() or c == '"' for c in value):
+            return value
+        return json.dumps(value, separators=(',', ':'), default=str)
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={self._value(value)}' for key, value in fields.items())
+        return line
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever waiting on it
+
+    If the queue is full the record is dropped and counted. The writer
+    thread is (re)started from here when missing, which also covers worker
+    processes forked after the logger was configured: a forked child gets a
+    fresh queue, since the parent's lock may have been held mid-``put`` by
+    its writer thread at fork time.
+    """
+
+    def __init__(self, handlers, maxsize=LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with _lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    self.queue = queue.Queue(self.maxsize)
+                self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Flush queued records and stop the writer thread"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
 
 def setup_logger():
-    """Configure and return a logger instance"""
-    # Create logs directory if it doesn't exist
-    log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Get environment
-    env = os.environ.get('FLASK_ENV', 'development')
-    
-    # Set log level based on environment
-    log_level = logging.DEBUG if env == 'development' else logging.INFO
-    
-    # Create logger
+    """
+    Configure (once per process) and return the application logger
+
+    The logger itself only has a queue handler; a listener thread writes
+    the records to the console and the rotating log file, so log I/O never
+    happens on the request thread.
+    """
     logger = logging.getLogger('afripulse')
-    logger.setLevel(log_level)
-    
-    # Clear existing handlers if any
-    if logger.handlers:
-        logger.handlers.clear()
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Create console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Create file handler
-    file_handler = RotatingFileHandler(
-        os.path.join(log_dir, f'app_{env}.log'),
-        maxBytes=10485760,  # 10MB
-        backupCount=10
-    )
-    file_handler.setLevel(log_level)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+    if getattr(logger, '_afripulse_configured', False):
+        return logger
+
+    with _lock:
+        if getattr(logger, '_afripulse_configured', False):
+            return logger
+
+        # Create logs directory if it doesn't exist
+        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+
+        # Get environment
+        env = os.environ.get('FLASK_ENV', 'development')
+
+        # Set log level based on environment
+        log_level = logging.DEBUG if env == 'development' else logging.INFO
+        logger.setLevel(log_level)
+        logger.propagate = False
+
+        # Clear existing handlers if any
+        if logger.handlers:
+            logger.handlers.clear()
+
+        # Create formatter
+        formatter = JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter()
+
+        # Create console handler
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(log_level)
+        console_handler.setFormatter(formatter)
+
+        # Create file handler
+        file_handler = RotatingFileHandler(
+            os.path.join(log_dir, f'app_{env}.log'),
+            maxBytes=10485760,  # 10MB
+            backupCount=10
+        )
+        file_handler.setLevel(log_level)
+        file_handler.setFormatter(formatter)
+
+        queue_handler = _NonBlockingQueueHandler([console_handler, file_handler])
+        logger.addHandler(queue_handler)
+        atexit.register(queue_handler.stop)
+
+        logger._afripulse_configured = True
+
     return logger
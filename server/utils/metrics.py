@@ -0,0 +1,155 @@
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+
+from models import db
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Label used for requests that matched no route (keeps label cardinality bounded)
+UNMATCHED_ENDPOINT = 'unmatched'
+
+# Label used for statements run outside a request (background threads, CLI)
+BACKGROUND_ENDPOINT = 'background'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUESTS = Counter(
+    'afripulse_http_requests_total', 'HTTP requests handled',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+LATENCY = Histogram(
+    'afripulse_http_request_duration_seconds', 'Time to handle a request, including streamed bodies',
+    ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'afripulse_http_response_size_bytes', 'Response body size (responses with a known length)',
+    ['blueprint', 'endpoint'], buckets=SIZE_BUCKETS
+)
+SQL_STATEMENTS = Counter(
+    'afripulse_db_statements_total', 'SQL statements executed',
+    ['blueprint', 'endpoint']
+)
+SQL_TIME = Counter(
+    'afripulse_db_statement_seconds_total', 'Time spent executing SQL statements',
+    ['blueprint', 'endpoint']
+)
+SQL_PER_REQUEST = Histogram(
+    'afripulse_db_statements_per_request', 'SQL statements executed per request',
+    ['blueprint', 'endpoint'], buckets=STATEMENT_BUCKETS
+)
+IDENTITY_LOADS_AVOIDED = Counter(
+    'afripulse_identity_map_loads_avoided_total',
+    'User and profile loads the request identity map made unnecessary',
+    ['blueprint', 'endpoint']
+)
+
+
+def _labels():
+    endpoint = request.endpoint or UNMATCHED_ENDPOINT
+    return request.blueprint or 'app', endpoint
+
+
+class RequestMetrics:
+    """
+    Prometheus metrics per blueprint endpoint
+
+    Request count, latency and response size come from request hooks; SQL
+    statement counts and time come from cursor events on ``db.engine`` and
+    are attributed to the request that ran them. Everything is observed at
+    teardown so streamed responses are measured to their last byte.
+
+    Under gunicorn, set ``PROMETHEUS_MULTIPROC_DIR`` (see gunicorn.conf.py)
+    and every worker writes its samples there; ``/metrics`` then reports the
+    sum over all workers whichever worker answers the scrape.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._response)
+        app.teardown_request(self._finish)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+
+    def _response(self, response):
+        g.metrics_status = response.status_code
+        g.metrics_size = None if response.is_streamed else response.content_length
+        return response
+
+    def _finish(self, exc=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        blueprint, endpoint = _labels()
+        status = g.get('metrics_status', 500 if exc else 200)
+        REQUESTS.labels(blueprint, endpoint, request.method, str(status)).inc()
+        LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        size = g.get('metrics_size')
+        if size is not None:
+            RESPONSE_SIZE.labels(blueprint, endpoint).observe(size)
+        count = g.get('metrics_sql_count', 0)
+        SQL_PER_REQUEST.labels(blueprint, endpoint).observe(count)
+        if count:
+            SQL_STATEMENTS.labels(blueprint, endpoint).inc(count)
+            SQL_TIME.labels(blueprint, endpoint).inc(g.get('metrics_sql_time', 0.0))
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's own execution context: a statement that
+        # raises never reaches after_cursor_execute, and its start time is
+        # dropped with the context instead of lingering on the connection
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_sql_count += 1
+            g.metrics_sql_time += elapsed
+        else:
+            SQL_STATEMENTS.labels('app', BACKGROUND_ENDPOINT).inc()
+            SQL_TIME.labels('app', BACKGROUND_ENDPOINT).inc(elapsed)
+
+
+request_metrics = RequestMetrics()
+
+
+def count_identity_loads_avoided(count):
+    """Add loads the request identity map avoided to the current endpoint's counter"""
+    if request_metrics.enabled:
+        IDENTITY_LOADS_AVOIDED.labels(*_labels()).inc(count)
+
+
+def metrics_response():
+    """Every metric in the Prometheus text format, summed over workers when multiprocess"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import or_, and_
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Encode a (created_at, id) keyset position as an opaque cursor string
+
+    Args:
+        created_at (datetime): Sort timestamp of the last row on the page,
+            or None for a row without one
+        row_id (str): Primary key of the last row on the page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``
+
+    Args:
+        cursor (str): Cursor from a previous response
+
+    Returns:
+        tuple: (created_at, id); created_at is None when the page ended
+        among rows without a timestamp
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(row_id, str) or not (created_at is None or isinstance(created_at, str)):
+            raise ValueError('cursor must hold a timestamp (or null) and an id')
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), row_id
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from e
+
+
+def keyset_after(sort_column, id_column, sort_value, row_id, descending=True):
+    """
+    Condition selecting the rows after a ``(sort_value, row_id)`` position
+
+    Rows are taken to be ordered by ``(sort_column, id_column)``, both
+    ascending or both descending. NULL sort values come first ascending and
+    last descending, as in MySQL and SQLite, and are ordered by id among
+    themselves.
+
+    Args:
+        sort_column: Column sorted on
+        id_column: Primary key column used as a tie-breaker
+        sort_value: ``sort_column`` value of the last row seen (may be None)
+        row_id: Primary key of the last row seen
+        descending (bool): Direction of the ordering
+
+    Returns:
+        ColumnElement: Filter condition
+    """
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < row_id)
+        return or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id),
+            sort_column.is_(None)
+        )
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > row_id), sort_column.isnot(None))
+    return or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > row_id)
+    )
+
+
+def apply_keyset(query, created_at_column, id_column, cursor):
+    """
+    Restrict and order a query for newest-first keyset pagination
+
+    Rows are ordered by ``(created_at DESC, id DESC)`` and, when a cursor is
+    given, only rows strictly after that position are returned. This lets
+    the database seek straight to the page instead of scanning and
+    discarding ``offset`` rows.
+
+    Rows with a NULL timestamp sort after all others (MySQL and SQLite put
+    NULLs last in descending order) and are paged by id alone.
+
+    Args:
+        query: SQLAlchemy query to paginate
+        created_at_column: Timestamp column to sort on
+        id_column: Primary key column used as a tie-breaker
+        cursor (str): Cursor from a previous page, or None for the first page
+
+    Returns:
+        Query: The filtered and ordered query
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(keyset_after(created_at_column, id_column, created_at, row_id))
+    return query.order_by(created_at_column.desc(), id_column.desc())
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from flask import jsonify
+
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool has no room for another request"""
+
+
+class PasswordHasherUnavailable(PasswordHasherBusy):
+    """Raised when a hash did not finish in time or its pool process died"""
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded process pool
+
+    A bcrypt call at a production work factor takes a few hundred
+    milliseconds of CPU. Running it in worker processes keeps that CPU off
+    the request-serving process, so a burst of logins does not stall the
+    other requests of the same gunicorn worker.
+
+    At most ``pool_size`` hashes run at once and ``queue_size`` more may
+    wait. Past that, ``PasswordHasherBusy`` is raised straight away (the
+    routes answer 429) rather than letting requests pile up behind the pool.
+    A call that outlasts ``timeout`` or whose pool process dies raises
+    ``PasswordHasherUnavailable`` (503).
+    The pool is created on first use, i.e. after gunicorn has forked.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.pool_size = max((os.cpu_count() or 2) // 2, 1)
+        self.queue_size = self.pool_size * 4
+        self.timeout = 10
+        self.start_method = 'spawn'
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.pool_size + self.queue_size)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', self.rounds)
+        self.pool_size = app.config.get('BCRYPT_POOL_SIZE') or self.pool_size
+        self.queue_size = app.config.get('BCRYPT_QUEUE_SIZE', self.pool_size * 4)
+        self.timeout = app.config.get('BCRYPT_TIMEOUT', self.timeout)
+        self.start_method = app.config.get('BCRYPT_POOL_START_METHOD', self.start_method)
+        self._slots = threading.BoundedSemaphore(self.pool_size + self.queue_size)
+        self.shutdown()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A pool process died; start a fresh pool and retry once
+                logger.error('Password hashing pool was broken, restarting it')
+                self.shutdown()
+                future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is freed when bcrypt is done, not when we stop waiting:
+        # a call that timed out still occupies a pool process until it ends
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherUnavailable(f'Password hashing took longer than {self.timeout}s')
+        except BrokenProcessPool:
+            logger.error('Password hashing pool broke during a call, restarting it')
+            self.shutdown()
+            raise PasswordHasherUnavailable('Password hashing pool process died')
+
+    def hash(self, password):
+        """
+        Hash a password with the configured work factor
+
+        Args:
+            password (str): Plain-text password
+
+        Returns:
+            str: bcrypt hash
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated
+            PasswordHasherUnavailable: If the call timed out or the pool broke
+        """
+        return self._run(_hashpw, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def check(self, password, hashed):
+        """
+        Check a password against a stored bcrypt hash
+
+        Args:
+            password (str): Plain-text password
+            hashed (str or bytes): Stored hash
+
+        Returns:
+            bool: True if the password matches
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated
+            PasswordHasherUnavailable: If the call timed out or the pool broke
+        """
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self._run(_checkpw, password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def busy_response(error=None):
+    """
+    Response for requests turned away by the hashing pool
+
+    Args:
+        error (PasswordHasherBusy): The error raised, if any
+
+    Returns:
+        tuple: 503 for ``PasswordHasherUnavailable``, 429 otherwise
+    """
+    if isinstance(error, PasswordHasherUnavailable):
+        response = jsonify({'message': 'Authentication is temporarily unavailable, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    response = jsonify({'message': 'Too many authentication requests, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
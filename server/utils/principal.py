@@ -0,0 +1,88 @@
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from models import db, User, SellerProfile, AffiliateProfile
+
+
+def token_claims(user):
+    """
+    Authorization claims embedded in a user's access tokens
+
+    Args:
+        user (User): The user the token is issued to
+
+    Returns:
+        dict: role, seller_profile_id and affiliate_profile_id
+    """
+    return {
+        'role': user.role,
+        'seller_profile_id': user.seller_profile.id if user.seller_profile else None,
+        'affiliate_profile_id': user.affiliate_profile.id if user.affiliate_profile else None
+    }
+
+
+class Principal:
+    """The authenticated caller of the current request, as described by its token"""
+
+    __slots__ = ('user_id', 'role', 'seller_profile_id', 'affiliate_profile_id')
+
+    def __init__(self, user_id, role, seller_profile_id=None, affiliate_profile_id=None):
+        self.user_id = user_id
+        self.role = role
+        self.seller_profile_id = seller_profile_id
+        self.affiliate_profile_id = affiliate_profile_id
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def has_role(self, role):
+        """Check the role against one role name or a list of them"""
+        if isinstance(role, (list, tuple, set)):
+            return self.role in role
+        return self.role == role
+
+    def __repr__(self):
+        return f'<Principal {self.user_id} role={self.role}>'
+
+
+def _load_principal(user_id):
+    """Build a principal from the database, for tokens issued before claims existed"""
+    row = db.session.query(
+        User.role,
+        SellerProfile.id,
+        AffiliateProfile.id
+    ).outerjoin(
+        SellerProfile, SellerProfile.user_id == User.id
+    ).outerjoin(
+        AffiliateProfile, AffiliateProfile.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    role, seller_profile_id, affiliate_profile_id = row
+    return Principal(user_id, role, seller_profile_id, affiliate_profile_id)
+
+
+def current_principal():
+    """
+    Principal for the current request, built once and kept on ``flask.g``
+
+    Read from the access token's claims, so no query is needed. Must be
+    called inside a ``jwt_required`` view.
+
+    Returns:
+        Principal: The caller, or None if the user no longer exists
+    """
+    if 'principal' not in g:
+        claims = get_jwt()
+        user_id = get_jwt_identity()
+        if 'role' in claims:
+            g.principal = Principal(
+                user_id,
+                claims['role'],
+                claims.get('seller_profile_id'),
+                claims.get('affiliate_profile_id')
+            )
+        else:
+            g.principal = _load_principal(user_id)
+    return g.principal
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from models import db, Product, ProductImage, Category, SellerProfile
+from utils.cache import response_cache
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Seconds a card may be served before it is rebuilt from the database
+CARD_TTL_SECONDS = int(os.environ.get('PRODUCT_CARD_TTL_SECONDS', 300))
+
+# Cards kept per worker
+CARD_MAX_ENTRIES = int(os.environ.get('PRODUCT_CARD_MAX_ENTRIES', 10000))
+
+# Cards are rebuilt whenever this response cache namespace is invalidated
+CARD_NAMESPACE = 'products'
+
+
+def _card_query():
+    """Exactly the columns a product card needs, with the primary image url"""
+    primary_image = db.session.query(ProductImage.image_url).filter(
+        ProductImage.product_id == Product.id
+    ).order_by(
+        ProductImage.is_primary.desc(),
+        ProductImage.display_order,
+        ProductImage.created_at
+    ).limit(1).correlate(Product).scalar_subquery()
+
+    return db.session.query(
+        Product.id,
+        Product.name,
+        Product.slug,
+        Product.price,
+        Product.discount_price,
+        Category.name.label('category_name'),
+        SellerProfile.business_name,
+        SellerProfile.default_commission_rate,
+        primary_image.label('image_url')
+    ).outerjoin(
+        Category, Product.category_id == Category.id
+    ).outerjoin(
+        SellerProfile, Product.seller_id == SellerProfile.id
+    )
+
+
+def _to_card(row):
+    return {
+        'id': row.id,
+        'name': row.name,
+        'slug': row.slug,
+        'price': float(row.price) if row.price is not None else None,
+        'discount_price': float(row.discount_price) if row.discount_price is not None else None,
+        'image_url': row.image_url,
+        'category': row.category_name,
+        'sellerBusinessName': row.business_name,
+        'commission_rate': float(row.default_commission_rate) if row.default_commission_rate is not None else 0
+    }
+
+
+class ProductCardCache:
+    """
+    Compact, pre-serialized product cards for catalog listings
+
+    A card holds only what a listing tile shows, so a page of cards is a
+    fraction of the size of full ``Product.to_dict()`` output and costs
+    nothing to serialize once cached. Missing cards are built with a single
+    projection query per page.
+
+    Cards are dropped as a whole whenever the ``products`` response cache
+    namespace is invalidated (every product, image and seller write goes
+    through ``invalidate_catalog``), so with the Redis backend a write made
+    on one worker reaches the cards of every worker. The TTL bounds
+    staleness for anything written outside the API.
+    """
+
+    def __init__(self, max_entries=CARD_MAX_ENTRIES, ttl=CARD_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cards = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _sync_version(self):
+        try:
+            version = response_cache.backend.get_version(CARD_NAMESPACE)
+        except Exception as e:
+            logger.error(f"Failed to read product card version: {str(e)}")
+            version = None
+        if version is None or version != self._version:
+            self._cards.clear()
+            self._version = version
+
+    def get_many(self, product_ids):
+        """
+        Cards for the given products, in the same order
+
+        Args:
+            product_ids (list): Product ids
+
+        Returns:
+            list: Card dictionaries; ids that no longer exist are skipped
+        """
+        now = time.monotonic()
+        cards = {}
+        with self._lock:
+            self._sync_version()
+            version = self._version
+            for product_id in product_ids:
+                item = self._cards.get(product_id)
+                if item is not None and item[1] > now:
+                    self._cards.move_to_end(product_id)
+                    cards[product_id] = item[0]
+
+        missing = [product_id for product_id in product_ids if product_id not in cards]
+        if missing:
+            built = {row.id: _to_card(row) for row in _card_query().filter(Product.id.in_(missing)).all()}
+            cards.update(built)
+            with self._lock:
+                if self._version != version:
+                    # Invalidated while the cards were being built
+                    return [cards[product_id] for product_id in product_ids if product_id in cards]
+                for product_id, card in built.items():
+                    self._cards[product_id] = (card, now + self.ttl)
+                    self._cards.move_to_end(product_id)
+                while len(self._cards) > self.max_entries:
+                    self._cards.popitem(last=False)
+
+        return [cards[product_id] for product_id in product_ids if product_id in cards]
+
+    def clear(self):
+        with self._lock:
+            self._cards.clear()
+
+
+product_cards = ProductCardCache()
@@ -0,0 +1,180 @@
+import os
+import traceback
+from functools import wraps
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Root of the server code; the first stack frame under it (outside this
+# module) is reported as the origin of a repeated statement
+SERVER_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class QueryBudgetExceeded(Exception):
+    """A route ran more SQL statements than its declared budget"""
+
+
+def query_budget(limit):
+    """
+    Declare the most SQL statements a route may run per request
+
+    Checked by the query inspector in development and testing; a request
+    over budget fails in testing (``QUERY_BUDGET_STRICT``) and is logged
+    otherwise. Put it below the route decorator.
+
+    Args:
+        limit (int): Maximum statements per request
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            g.query_budget = limit
+            return fn(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def _origin():
+    """First frame of our own code that led to the current statement"""
+    for frame in reversed(traceback.extract_stack()):
+        if (frame.filename.startswith(SERVER_ROOT) and 'site-packages' not in frame.filename
+                and not frame.filename.endswith('query_inspector.py')):
+            return f'{os.path.relpath(frame.filename, SERVER_ROOT)}:{frame.lineno} in {frame.name} ({frame.line})'
+    return None
+
+
+class _StatementGroup:
+    __slots__ = ('statement', 'count', 'relationship', 'origin')
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.count = 0
+        self.relationship = None
+        self.origin = None
+
+
+class QueryInspector:
+    """
+    Development/testing aid that finds N+1 queries and enforces query budgets
+
+    Every SQL statement of a request is grouped by its text (parameters are
+    bound separately, so a lazy load repeated per row is one group). Groups
+    run more than ``QUERY_INSPECTOR_REPEAT_THRESHOLD`` times are reported at
+    the end of the request with the route, the ORM relationship whose lazy
+    load emitted them (when there is one) and the line of our code that
+    triggered them. Routes decorated with ``query_budget`` are also checked
+    against their limit.
+
+    Enabled with ``QUERY_INSPECTOR_ENABLED`` (development and testing); it
+    walks the stack for repeated statements, so keep it off in production.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 5
+        self.strict = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('QUERY_INSPECTOR_ENABLED', False)
+        if not self.enabled:
+            return
+        self.threshold = app.config.get('QUERY_INSPECTOR_REPEAT_THRESHOLD', self.threshold)
+        self.strict = app.config.get('QUERY_BUDGET_STRICT', False)
+        app.before_request(self._start)
+        app.after_request(self._check)
+        app.teardown_request(self._report)
+        event.listen(Session, 'do_orm_execute', self._do_orm_execute)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def _start(self):
+        g.query_groups = {}
+        g.query_count = 0
+
+    def _do_orm_execute(self, orm_execute_state):
+        if not has_request_context() or 'query_groups' not in g:
+            return
+        relationship = None
+        if orm_execute_state.is_relationship_load:
+            path = orm_execute_state.loader_strategy_path
+            if path is not None and len(path):
+                relationship = str(path[-1])
+        g.query_relationship = relationship
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or 'query_groups' not in g:
+            return
+        g.query_count += 1
+        group = g.query_groups.get(statement)
+        if group is None:
+            group = g.query_groups[statement] = _StatementGroup(statement)
+        group.count += 1
+        relationship = g.pop('query_relationship', None)
+        if relationship and not group.relationship:
+            group.relationship = relationship
+        if group.count == 2:
+            group.origin = _origin()
+
+    def repeated(self):
+        """Statement groups of the current request over the repeat threshold, worst first"""
+        groups = g.get('query_groups') or {}
+        return sorted(
+            (group for group in groups.values() if group.count > self.threshold),
+            key=lambda group: group.count, reverse=True
+        )
+
+    def _route(self):
+        return f'{request.method} {request.path} ({request.endpoint or "unmatched"})'
+
+    def _over_budget(self):
+        budget = g.get('query_budget')
+        count = g.get('query_count', 0)
+        if budget is not None and count > budget:
+            return f'{self._route()} ran {count} SQL statements, budget is {budget}'
+        return None
+
+    def _check(self, response):
+        if 'query_groups' not in g:
+            return response
+        response.headers['X-Query-Count'] = str(g.query_count)
+        if self.strict and not response.is_streamed:
+            message = self._over_budget()
+            if message:
+                g.query_budget_reported = True
+                raise QueryBudgetExceeded(f'{message}\n{self.describe()}')
+        return response
+
+    def describe(self):
+        """Human-readable report of the repeated statements of the current request"""
+        lines = []
+        for group in self.repeated():
+            culprit = f'lazy load of {group.relationship}' if group.relationship else 'statement'
+            lines.append(f'  {group.count}x {culprit} from {group.origin or "unknown"}: {group.statement[:160]}')
+        return '\n'.join(lines)
+
+    def _report(self, exc=None):
+        if not has_request_context() or 'query_groups' not in g:
+            return
+        repeated = self.repeated()
+        over_budget = None if g.get('query_budget_reported') else self._over_budget()
+        if repeated:
+            logger.warning(
+                f'Possible N+1 in {self._route()}: {g.query_count} statements, '
+                f'{len(repeated)} repeated more than {self.threshold} times\n{self.describe()}'
+            )
+        if over_budget:
+            logger.warning(over_budget)
+        g.pop('query_groups', None)
+
+
+query_inspector = QueryInspector()
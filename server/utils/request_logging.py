@@ -0,0 +1,130 @@
+import fnmatch
+import random
+import re
+import time
+
+from flask import g, request
+
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Per-route verbosity levels, least to most verbose:
+#   off     - nothing is logged
+#   summary - one line: method, path, status, duration, sizes
+#   sampled - the summary, plus bodies for a sample of requests
+#   full    - the summary with headers and bodies for every request
+VERBOSITY_LEVELS = ('off', 'summary', 'sampled', 'full')
+
+# Headers never written to the log
+SENSITIVE_HEADERS = {'authorization', 'cookie', 'set-cookie'}
+
+# JSON string values masked in logged bodies
+SENSITIVE_FIELDS = re.compile(r'("[^"]*(?:password|token|secret)[^"]*"\s*:\s*)"(?:[^"\\]|\\.)*"', re.IGNORECASE)
+
+
+def parse_route_verbosity(spec):
+    """
+    Parse 'pattern=level' pairs separated by commas
+
+    Args:
+        spec (str): e.g. '/health=off,/api/auth/*=summary'
+
+    Returns:
+        list: (pattern, level) tuples, in the order given
+    """
+    rules = []
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        pattern, level = (part.strip() for part in item.split('=', 1))
+        if level not in VERBOSITY_LEVELS:
+            raise ValueError(f'Unknown request log verbosity {level!r} for {pattern!r}')
+        rules.append((pattern, level))
+    return rules
+
+
+class RequestLogger:
+    """
+    One structured log line per request, with optional sampled bodies
+
+    The verbosity of a request is the level of the first
+    ``REQUEST_LOG_ROUTES`` pattern matching its path (fnmatch syntax), or
+    ``REQUEST_LOG_VERBOSITY``. Bodies are cut to ``REQUEST_LOG_BODY_MAX_BYTES``
+    and, at the ``sampled`` level, only attached to a
+    ``REQUEST_LOG_BODY_SAMPLE_RATE`` fraction of requests. Response bodies
+    are taken as raw bytes, never re-parsed, and streamed responses are
+    left untouched.
+    """
+
+    def __init__(self, app=None):
+        self.default_level = 'sampled'
+        self.rules = []
+        self.sample_rate = 0.0
+        self.body_max_bytes = 1024
+        self._levels = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_level = app.config.get('REQUEST_LOG_VERBOSITY', self.default_level)
+        self.rules = parse_route_verbosity(app.config.get('REQUEST_LOG_ROUTES', ''))
+        self.sample_rate = app.config.get('REQUEST_LOG_BODY_SAMPLE_RATE', self.sample_rate)
+        self.body_max_bytes = app.config.get('REQUEST_LOG_BODY_MAX_BYTES', self.body_max_bytes)
+        self._levels = {}
+        app.before_request(self._start)
+        app.after_request(self._log)
+
+    def level_for(self, path):
+        """Verbosity for a request path; cached per distinct path"""
+        level = self._levels.get(path)
+        if level is None:
+            level = next((rule_level for pattern, rule_level in self.rules if fnmatch.fnmatchcase(path, pattern)), self.default_level)
+            if len(self._levels) < 4096:
+                self._levels[path] = level
+        return level
+
+    def _start(self):
+        g.request_started = time.perf_counter()
+
+    def _body(self, data):
+        if not data:
+            return None
+        text = SENSITIVE_FIELDS.sub(r'\1"***"', data[:self.body_max_bytes].decode('utf-8', 'replace'))
+        return text + '...' if len(data) > self.body_max_bytes else text
+
+    def _log(self, response):
+        level = self.level_for(request.path)
+        if level == 'off':
+            return response
+
+        started = g.get('request_started')
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round((time.perf_counter() - started) * 1000, 1) if started else None,
+            'ip': request.remote_addr,
+            'req_bytes': request.content_length or 0,
+            'resp_bytes': response.content_length
+        }
+        if request.endpoint:
+            fields['endpoint'] = request.endpoint
+
+        with_bodies = level == 'full' or (level == 'sampled' and self.sample_rate and random.random() < self.sample_rate)
+        if level == 'full':
+            fields['headers'] = {k: v for k, v in request.headers.items() if k.lower() not in SENSITIVE_HEADERS}
+        if with_bodies:
+            if request.mimetype == 'multipart/form-data':
+                fields['req_body'] = '[multipart/form-data]'
+            else:
+                fields['req_body'] = self._body(request.get_data(cache=True))
+            if not response.is_streamed and not response.direct_passthrough:
+                fields['resp_body'] = self._body(response.get_data())
+
+        logger.info(f"{request.method} {request.path} {response.status_code}", extra={'fields': fields})
+        return response
+
+
+request_logger = RequestLogger()
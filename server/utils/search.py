@@ -1,10 +1,197 @@
-from sqlalchemy import or_, and_, func
-from models import db, Product, User, Profile, SellerProfile
+import os
+import time
+
+from sqlalchemy import or_, func
+from models import db, Product, User, Profile, SellerProfile, Category, OrderItem
+from utils.logger import setup_logger
+from utils.search_index import ProductSearchIndex, IndexedProduct, SuggestionIndex
+
+# Setup logger
+logger = setup_logger()
+
+# How often (seconds) a worker pulls product changes made by other workers
+REFRESH_SECONDS = int(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 30))
+
+product_index = ProductSearchIndex()
+suggestion_index = SuggestionIndex()
+_sync_state = {'watermark': None, 'checked_at': 0.0}
+
+
+def _index_query():
+    """Columns needed to index a product, with its category and seller names"""
+    # Correlated to each product row, so re-indexing one product sums only
+    # its own order lines (through the order_items.product_id foreign key
+    # index) instead of grouping the whole order history
+    units_sold = db.session.query(
+        func.sum(OrderItem.quantity)
+    ).filter(OrderItem.product_id == Product.id).correlate(Product).scalar_subquery()
+
+    return db.session.query(
+        Product.id,
+        Product.name,
+        Product.slug,
+        Product.description,
+        Product.price,
+        Product.discount_price,
+        Product.featured,
+        Product.status,
+        Product.created_at,
+        Product.updated_at,
+        Product.category_id,
+        Product.seller_id,
+        Category.name.label('category_name'),
+        Category.slug.label('category_slug'),
+        SellerProfile.business_name,
+        units_sold.label('units_sold')
+    ).outerjoin(
+        Category, Product.category_id == Category.id
+    ).outerjoin(
+        SellerProfile, Product.seller_id == SellerProfile.id
+    )
+
+
+def _apply_row(row):
+    """Add an indexed row to the index, or drop it if it is no longer active"""
+    if row.status != 'active':
+        product_index.remove(row.id)
+        suggestion_index.remove_product(row.id)
+        return
+
+    price = row.discount_price if row.discount_price is not None else row.price
+    doc = IndexedProduct(
+        id=row.id,
+        name=row.name or '',
+        category_id=row.category_id,
+        category_slug=row.category_slug,
+        category_name=row.category_name,
+        seller_id=row.seller_id,
+        seller_name=row.business_name,
+        price=float(price) if price is not None else 0.0,
+        featured=bool(row.featured),
+        created_at=row.created_at.timestamp() if row.created_at else 0.0
+    )
+    product_index.add(doc, {
+        'name': row.name,
+        'description': row.description,
+        'category': row.category_name,
+        'seller': row.business_name
+    })
+    suggestion_index.add_product(
+        row.id,
+        row.name,
+        row.slug,
+        int(row.units_sold or 0),
+        category=(row.category_id, row.category_name, row.category_slug),
+        seller=(row.seller_id, row.business_name)
+    )
+
+
+def _advance_watermark(updated_at):
+    if updated_at and (_sync_state['watermark'] is None or updated_at > _sync_state['watermark']):
+        _sync_state['watermark'] = updated_at
+
+
+def rebuild_product_index():
+    """Rebuild the product search index from the database"""
+    product_index.clear()
+    suggestion_index.clear()
+    _sync_state['watermark'] = None
+
+    rows = _index_query().filter(Product.status == 'active').execution_options(yield_per=1000)
+    for row in rows:
+        _apply_row(row)
+        _advance_watermark(row.updated_at)
+    suggestion_index.precompute_short_prefixes()
+
+    product_index.built = True
+    _sync_state['checked_at'] = time.monotonic()
+    logger.info(f'Product search index built with {len(product_index)} products')
+
+
+def refresh_product_index(force=False):
+    """
+    Pull products changed since the last sync into the index
+
+    Each gunicorn worker keeps its own index, so changes made through another
+    worker are picked up here by ``updated_at``. Calls are throttled to once
+    every ``REFRESH_SECONDS`` unless ``force`` is set.
+    """
+    if not product_index.built:
+        rebuild_product_index()
+        return
+
+    now = time.monotonic()
+    if not force and now - _sync_state['checked_at'] < REFRESH_SECONDS:
+        return
+    _sync_state['checked_at'] = now
+
+    query = _index_query()
+    if _sync_state['watermark'] is not None:
+        query = query.filter(Product.updated_at >= _sync_state['watermark'])
+    for row in query.all():
+        _apply_row(row)
+        _advance_watermark(row.updated_at)
+
+
+def index_product(product):
+    """Re-index a single product after it was created, updated, approved or rejected"""
+    if not product_index.built:
+        return
+    try:
+        row = _index_query().filter(Product.id == product.id).first()
+        if row is None:
+            product_index.remove(product.id)
+        else:
+            _apply_row(row)
+    except Exception as e:
+        logger.error(f"Failed to index product {product.id}: {str(e)}")
+
+
+def remove_product_from_index(product_id):
+    """Drop a deleted product from the search index"""
+    product_index.remove(product_id)
+    suggestion_index.remove_product(product_id)
+
+
+def _build_filters(filters):
+    """
+    Turn search filters into named predicates over IndexedProduct
+
+    The names match the facets they narrow so the index can count each
+    facet as if its own filter were not applied.
+    """
+    checks = {}
+
+    if filters.get('category'):
+        category = filters['category']
+        checks['category'] = lambda doc: category in (doc.category_id, doc.category_slug)
+
+    price_min = filters.get('price_min')
+    price_max = filters.get('price_max')
+    if price_min is not None or price_max is not None:
+        checks['price'] = lambda doc: (
+            (price_min is None or doc.price >= price_min) and
+            (price_max is None or doc.price <= price_max)
+        )
+
+    if filters.get('seller_id'):
+        seller_id = filters['seller_id']
+        checks['seller'] = lambda doc: doc.seller_id == seller_id
+
+    if filters.get('featured') is not None:
+        featured = bool(filters['featured'])
+        checks['featured'] = lambda doc: doc.featured == featured
+
+    return checks
+
 
 def search_products(query_text, filters=None, limit=20, offset=0):
     """
-    Search products by name, description, or category
+    Search products by name, description, category or seller name
     
+    Results come from the in-memory BM25 index and are ranked by relevance
+    unless another sort is requested.
+
     Args:
         query_text (str): Search query
         filters (dict): Optional filters like category, price_min, price_max, etc.
@@ -12,82 +199,52 @@ def search_products(query_text, filters=None, limit=20, offset=0):
         offset (int): Offset for pagination
         
     Returns:
-        tuple: (products, total_count)
+        tuple: (products, total_count, facets) where facets holds category,
+        seller and price bucket counts for the matching products
     """
-    # Base query
-    query = Product.query.filter_by(status='active')
-    
-    # Apply search
-    if query_text:
-        search_term = f"%{query_text}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(search_term),
-                Product.description.ilike(search_term),
-                Product.category.ilike(search_term),
-                Product.subcategory.ilike(search_term)
-            )
-        )
-    
-    # Apply filters
-    if filters:
-        if filters.get('category'):
-            query = query.filter(Product.category == filters['category'])
-        
-        if filters.get('subcategory'):
-            query = query.filter(Product.subcategory == filters['subcategory'])
-        
-        if filters.get('price_min') is not None:
-            query = query.filter(
-                or_(
-                    and_(Product.sale_price.isnot(None), Product.sale_price >= filters['price_min']),
-                    and_(Product.sale_price.is_(None), Product.price >= filters['price_min'])
-                )
-            )
-        
-        if filters.get('price_max') is not None:
-            query = query.filter(
-                or_(
-                    and_(Product.sale_price.isnot(None), Product.sale_price <= filters['price_max']),
-                    and_(Product.sale_price.is_(None), Product.price <= filters['price_max'])
-                )
-            )
-        
-        if filters.get('seller_id'):
-            query = query.filter(Product.seller_id == filters['seller_id'])
-        
-        if filters.get('featured') is not None:
-            query = query.filter(Product.featured == filters['featured'])
-    
-    # Get total count
-    total_count = query.count()
-    
-    # Apply sorting
-    sort_by = filters.get('sort_by', 'created_at') if filters else 'created_at'
-    sort_order = filters.get('sort_order', 'desc') if filters else 'desc'
-    
-    if sort_by == 'price':
-        # Sort by sale price if available, otherwise by regular price
-        if sort_order == 'asc':
-            query = query.order_by(
-                func.coalesce(Product.sale_price, Product.price).asc()
-            )
-        else:
-            query = query.order_by(
-                func.coalesce(Product.sale_price, Product.price).desc()
-            )
-    else:
-        # Sort by other fields
-        sort_column = getattr(Product, sort_by, Product.created_at)
-        if sort_order == 'asc':
-            query = query.order_by(sort_column.asc())
-        else:
-            query = query.order_by(sort_column.desc())
-    
-    # Apply pagination
-    products = query.limit(limit).offset(offset).all()
-    
-    return products, total_count
+    filters = filters or {}
+    refresh_product_index()
+
+    product_ids, total_count, facets = product_index.search(
+        query_text,
+        filters=_build_filters(filters),
+        sort_by=filters.get('sort_by', 'relevance'),
+        sort_order=filters.get('sort_order', 'desc'),
+        limit=limit,
+        offset=offset
+    )
+    if not product_ids:
+        return [], total_count, facets
+
+    products_by_id = {
+        product.id: product
+        for product in Product.query.filter(Product.id.in_(product_ids)).all()
+    }
+
+    products = []
+    for product_id in product_ids:
+        product = products_by_id.get(product_id)
+        if product is None:
+            # Deleted through another worker since the last refresh
+            remove_product_from_index(product_id)
+            continue
+        products.append(product)
+
+    return products, total_count, facets
+
+def suggest(prefix, limit=10):
+    """
+    Prefix completions for product, category and seller names
+
+    Args:
+        prefix (str): What the user has typed so far
+        limit (int): Maximum number of suggestions
+
+    Returns:
+        list: Suggestions ordered by popularity
+    """
+    refresh_product_index()
+    return suggestion_index.suggest(prefix, limit)
 
 def search_sellers(query_text, limit=20, offset=0):
     """
@@ -106,7 +263,7 @@ def search_sellers(query_text, limit=20, offset=0):
         db.session.query(User, Profile, SellerProfile)
         .join(Profile, User.id == Profile.user_id)
         .join(SellerProfile, User.id == SellerProfile.user_id)
-        .filter(User.role == 'seller', SellerProfile.is_verified == True)
+        .filter(User.role == 'seller', SellerProfile.verified == True)
     )
     
     # Apply search
@@ -0,0 +1,553 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict, Counter
+
+# Field weights used when folding term frequencies into one document score.
+# A match in the product name counts for more than one buried in the description.
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'seller': 2.0,
+    'description': 1.0
+}
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000)
+
+STOPWORDS = {'a', 'an', 'and', 'the', 'of', 'for', 'with', 'in', 'on', 'to', 'by'}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Suggestion prefixes this short keep a live list of their best entries
+# instead of being scanned; the list is deeper than the largest request so
+# entries can drop out of it without forcing a rescan
+SHORT_PREFIX_LENGTH = 3
+SHORT_PREFIX_KEEP = 40
+
+
+def tokenize_words(text):
+    """Split text into lowercase, accent-folded words"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    folded = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    return TOKEN_PATTERN.findall(folded)
+
+
+def tokenize(text):
+    """Split text into search terms, dropping stopwords"""
+    return [token for token in tokenize_words(text) if token not in STOPWORDS]
+
+
+class IndexedProduct:
+    """
+    Per-product data kept in the index for ranking and filtering
+
+    ``price`` is the effective selling price (discount price when set) and
+    ``created_at`` is a POSIX timestamp so both sort without None checks.
+    """
+
+    __slots__ = (
+        'id', 'name', 'category_id', 'category_slug', 'category_name',
+        'seller_id', 'seller_name', 'price', 'featured', 'created_at',
+        'length', 'terms'
+    )
+
+    def __init__(self, **fields):
+        for key in self.__slots__:
+            setattr(self, key, fields.get(key))
+
+
+class ProductSearchIndex:
+    """
+    In-memory inverted index over active products, ranked with BM25
+
+    Each term maps to a posting list of ``{product_id: weighted_tf}``. A query
+    only touches the posting lists of its own terms, so its cost depends on
+    how many products match rather than on the size of the catalog.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)
+        self._docs = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+        self.built = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, product_id):
+        return product_id in self._docs
+
+    def clear(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._docs = {}
+            self._total_length = 0.0
+            self.built = False
+
+    def add(self, doc, fields):
+        """
+        Add or replace a product in the index
+
+        Args:
+            doc (IndexedProduct): Product metadata used for filtering
+            fields (dict): Field name -> text to index (see FIELD_WEIGHTS)
+        """
+        term_weights = defaultdict(float)
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokenize(text):
+                term_weights[token] += weight
+
+        with self._lock:
+            self._remove_locked(doc.id)
+            doc.length = sum(term_weights.values())
+            doc.terms = tuple(term_weights)
+            for term, weight in term_weights.items():
+                self._postings[term][doc.id] = weight
+            self._docs[doc.id] = doc
+            self._total_length += doc.length
+
+    def remove(self, product_id):
+        """Remove a product from the index if present"""
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def _remove_locked(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def get(self, product_id):
+        return self._docs.get(product_id)
+
+    def score(self, query_text):
+        """
+        Score every product matching any query term
+
+        Returns:
+            dict: product_id -> BM25 score
+        """
+        terms = set(tokenize(query_text))
+        scores = defaultdict(float)
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count or not terms:
+                return scores
+            avg_length = self._total_length / doc_count or 1.0
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[product_id].length / avg_length)
+                    scores[product_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query_text, filters=None, sort_by='relevance', sort_order='desc', limit=20, offset=0):
+        """
+        Run a query against the index and count facets for the result set
+
+        Filtering and facet counting happen in a single pass over the
+        candidates. A candidate that fails exactly one filter still counts
+        towards that filter's own facet, so e.g. the category facet shows
+        how many hits each other category would have given the remaining
+        filters.
+
+        Args:
+            query_text (str): Free-text query; empty matches every product
+            filters (dict): Filter name -> predicate taking an IndexedProduct.
+                Filters named 'category', 'seller' or 'price' are disjunctive
+                with respect to their own facet.
+            sort_by (str): 'relevance', 'price', 'created_at' or 'name'
+            sort_order (str): 'asc' or 'desc'
+            limit (int): Number of ids to return
+            offset (int): Offset for pagination
+
+        Returns:
+            tuple: (product_ids, total_count, facets)
+        """
+        filters = filters or {}
+        if query_text and tokenize(query_text):
+            scores = self.score(query_text)
+        else:
+            scores = None
+            if sort_by == 'relevance':
+                sort_by = 'created_at'
+
+        with self._lock:
+            if scores is None:
+                candidates = list(self._docs.values())
+            else:
+                # A product may have been removed since it was scored
+                candidates = [self._docs[product_id] for product_id in scores if product_id in self._docs]
+
+        hits = []
+        counts = {'category': Counter(), 'seller': Counter(), 'price': Counter()}
+        labels = {'category': {}, 'seller': {}}
+        for doc in candidates:
+            failed = [name for name, check in filters.items() if not check(doc)]
+            if len(failed) > 1 or (failed and failed[0] not in counts):
+                continue
+            if not failed:
+                hits.append(doc)
+            for facet in (failed or counts):
+                if facet == 'price':
+                    counts['price'][bisect.bisect_right(PRICE_BUCKETS, doc.price) - 1] += 1
+                elif facet == 'category':
+                    counts['category'][doc.category_id] += 1
+                    labels['category'].setdefault(doc.category_id, doc)
+                else:
+                    counts['seller'][doc.seller_id] += 1
+                    labels['seller'].setdefault(doc.seller_id, doc)
+
+        total = len(hits)
+        window = max(offset, 0) + max(limit, 0)
+        reverse = sort_order != 'asc'
+
+        if sort_by == 'relevance':
+            key = lambda doc: (scores[doc.id], doc.created_at)
+        elif sort_by == 'price':
+            key = lambda doc: doc.price
+        elif sort_by == 'name':
+            key = lambda doc: doc.name.lower()
+        else:
+            key = lambda doc: doc.created_at
+
+        if reverse:
+            ranked = heapq.nlargest(window, hits, key=key)
+        else:
+            ranked = heapq.nsmallest(window, hits, key=key)
+
+        page = ranked[offset:offset + limit]
+        return [doc.id for doc in page], total, self._format_facets(counts, labels)
+
+    @staticmethod
+    def _format_facets(counts, labels):
+        price_facet = []
+        for position, lower in enumerate(PRICE_BUCKETS):
+            upper = PRICE_BUCKETS[position + 1] if position + 1 < len(PRICE_BUCKETS) else None
+            price_facet.append({'min': lower, 'max': upper, 'count': counts['price'].get(position, 0)})
+
+        return {
+            'category': [
+                {
+                    'id': category_id,
+                    'name': labels['category'][category_id].category_name,
+                    'slug': labels['category'][category_id].category_slug,
+                    'count': count
+                }
+                for category_id, count in counts['category'].most_common()
+            ],
+            'seller': [
+                {
+                    'id': seller_id,
+                    'name': labels['seller'][seller_id].seller_name,
+                    'count': count
+                }
+                for seller_id, count in counts['seller'].most_common()
+            ],
+            'price': price_facet
+        }
+
+
+class SuggestionIndex:
+    """
+    Prefix index for search-as-you-type over product, category and seller names
+
+    Every word-start suffix of a name ("ankara dress" -> "ankara dress",
+    "dress") is kept in one sorted list, so a prefix lookup is a bisect
+    followed by a short scan. New keys are collected unsorted and merged
+    with a single sort before the next lookup, so a full rebuild costs one
+    sort rather than an insertion per key. Category and seller popularity
+    is the number of active products they have; products carry their own
+    popularity (units sold).
+
+    Prefixes of up to SHORT_PREFIX_LENGTH characters match too much of the
+    catalog to scan per request, so their best SHORT_PREFIX_KEEP entries are
+    kept up to date as entries change. Longer prefixes are cached until an
+    entry they match changes.
+    """
+
+    def __init__(self, cache_size=2048):
+        self._keys = []
+        self._pending = []
+        self._merges = 0
+        self._entries = {}
+        self._products = {}
+        self._short_top = {}
+        self._cache = {}
+        self._cache_size = cache_size
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._pending = []
+            self._entries = {}
+            self._products = {}
+            self._short_top = {}
+            self._cache = {}
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join(tokenize_words(text))
+
+    @staticmethod
+    def _short_prefixes(keys):
+        return {key[:length] for key in keys for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1)}
+
+    def _rank(self, entry_key):
+        # The entry key breaks ties, so top lists and scans agree on the order
+        entry = self._entries[entry_key]
+        return (-entry['popularity'], entry['text'].lower(), entry_key)
+
+    def _sorted_keys_locked(self):
+        if len(self._pending) > 64:
+            # Timsort merges the sorted run and the new keys in near-linear time
+            self._keys.extend(self._pending)
+            self._keys.sort()
+        elif self._pending:
+            # A handful of keys from live updates: cheaper to place one by one
+            for item in self._pending:
+                bisect.insort(self._keys, item)
+        if self._pending:
+            self._pending = []
+            self._merges += 1
+        return self._keys
+
+    def _changed_locked(self, keys):
+        """Drop the cached results of every long prefix of ``keys``"""
+        if not self._cache:
+            return
+        for key in keys:
+            for length in range(SHORT_PREFIX_LENGTH + 1, len(key) + 1):
+                self._cache.pop(key[:length], None)
+
+    def _rank_short_locked(self, entry_key, keys):
+        """
+        Place an added or re-ranked entry in the top lists of its short prefixes
+
+        A top list holds the best entries of its prefix in order; unless it
+        is ``complete``, every entry left out ranks below its last one. An
+        entry that now ranks below that point just leaves the list, so the
+        list shrinks instead of going stale.
+        """
+        if not self._short_top:
+            return
+        rank = self._rank(entry_key)
+        for prefix in self._short_prefixes(keys):
+            top = self._short_top.get(prefix)
+            if top is None:
+                continue
+            entries = top['entries']
+            if entry_key in entries:
+                entries.remove(entry_key)
+            if not top['complete'] and (not entries or rank >= self._rank(entries[-1])):
+                continue
+            entries.insert(bisect.bisect_left([self._rank(other) for other in entries], rank), entry_key)
+            if len(entries) > SHORT_PREFIX_KEEP:
+                del entries[SHORT_PREFIX_KEEP:]
+                top['complete'] = False
+
+    def _unrank_short_locked(self, entry_key, keys):
+        """Take a dropped entry out of the top lists of its short prefixes"""
+        if not self._short_top:
+            return
+        for prefix in self._short_prefixes(keys):
+            top = self._short_top.get(prefix)
+            if top is not None and entry_key in top['entries']:
+                top['entries'].remove(entry_key)
+
+    def _put_locked(self, entry_key, text, slug, popularity):
+        existing = self._entries.get(entry_key)
+        if existing is not None and existing['text'] == text:
+            existing['slug'] = slug
+            existing['popularity'] = popularity
+            self._rank_short_locked(entry_key, existing['keys'])
+            self._changed_locked(existing['keys'])
+            return
+        if existing is not None:
+            self._drop_locked(entry_key)
+        words = tokenize_words(text)
+        keys = [' '.join(words[i:]) for i in range(len(words))]
+        self._pending.extend((key, entry_key) for key in keys)
+        self._entries[entry_key] = {
+            'text': text,
+            'slug': slug,
+            'popularity': popularity,
+            'keys': keys,
+            'merges': self._merges
+        }
+        self._rank_short_locked(entry_key, keys)
+        self._changed_locked(keys)
+
+    def _drop_locked(self, entry_key):
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return
+        self._unrank_short_locked(entry_key, entry['keys'])
+        self._changed_locked(entry['keys'])
+        del self._entries[entry_key]
+        if entry['merges'] == self._merges and self._pending:
+            # Its keys haven't been merged into the sorted list yet
+            for key in entry['keys']:
+                self._pending.remove((key, entry_key))
+            return
+        sorted_keys = self._keys
+        for key in entry['keys']:
+            position = bisect.bisect_left(sorted_keys, (key, entry_key))
+            if position < len(sorted_keys) and sorted_keys[position] == (key, entry_key):
+                del sorted_keys[position]
+
+    def _adjust_group_locked(self, kind, group_id, name, slug, delta):
+        if not group_id:
+            return
+        entry_key = (kind, group_id)
+        entry = self._entries.get(entry_key)
+        count = (entry['popularity'] if entry else 0) + delta
+        if count <= 0 or not name:
+            self._drop_locked(entry_key)
+        else:
+            self._put_locked(entry_key, name, slug, count)
+
+    def add_product(self, product_id, name, slug, popularity, category=None, seller=None):
+        """
+        Add or update an active product
+
+        Args:
+            product_id (str): Product id
+            name (str): Product name
+            slug (str): Product slug
+            popularity (int): Ranking weight for the product itself
+            category (tuple): (category_id, name, slug) or None
+            seller (tuple): (seller_id, business_name) or None
+        """
+        category = category or (None, None, None)
+        seller = seller or (None, None)
+        with self._lock:
+            self._remove_product_locked(product_id)
+            self._put_locked(('product', product_id), name, slug, popularity)
+            self._adjust_group_locked('category', category[0], category[1], category[2], 1)
+            self._adjust_group_locked('seller', seller[0], seller[1], None, 1)
+            self._products[product_id] = (category, seller)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._remove_product_locked(product_id)
+
+    def _remove_product_locked(self, product_id):
+        groups = self._products.pop(product_id, None)
+        if groups is None:
+            return
+        category, seller = groups
+        self._drop_locked(('product', product_id))
+        self._adjust_group_locked('category', category[0], category[1], category[2], -1)
+        self._adjust_group_locked('seller', seller[0], seller[1], None, -1)
+
+    def _matches_locked(self, prefix):
+        """Every entry with a key starting with ``prefix``, by scanning the sorted keys"""
+        sorted_keys = self._sorted_keys_locked()
+        matches = set()
+        position = bisect.bisect_left(sorted_keys, (prefix,))
+        while position < len(sorted_keys) and sorted_keys[position][0].startswith(prefix):
+            matches.add(sorted_keys[position][1])
+            position += 1
+        return matches
+
+    def _short_top_locked(self, prefix, limit):
+        """Top list of a short prefix holding at least ``limit`` entries if it has them"""
+        top = self._short_top.get(prefix)
+        if top is None or (not top['complete'] and len(top['entries']) < limit):
+            matches = self._matches_locked(prefix)
+            top = self._short_top[prefix] = {
+                'entries': heapq.nsmallest(SHORT_PREFIX_KEEP, matches, key=self._rank),
+                'complete': len(matches) <= SHORT_PREFIX_KEEP
+            }
+        return top['entries']
+
+    def precompute_short_prefixes(self):
+        """
+        Build the top list of every short prefix in one pass, e.g. after a rebuild
+
+        Keys are grouped by their first SHORT_PREFIX_LENGTH characters; a
+        shorter prefix then only has to rank the top lists of its longer
+        ones, since anything those leave out ranks below KEEP entries of
+        its own prefix.
+        """
+        with self._lock:
+            candidates = defaultdict(set)
+            complete = defaultdict(lambda: True)
+            for key, entry_key in self._sorted_keys_locked():
+                candidates[key[:SHORT_PREFIX_LENGTH]].add(entry_key)
+
+            short_top = {}
+            for length in range(SHORT_PREFIX_LENGTH, 0, -1):
+                for prefix in [prefix for prefix in candidates if len(prefix) == length]:
+                    members = candidates[prefix]
+                    top = short_top[prefix] = {
+                        'entries': heapq.nsmallest(SHORT_PREFIX_KEEP, members, key=self._rank),
+                        'complete': complete[prefix] and len(members) <= SHORT_PREFIX_KEEP
+                    }
+                    if length > 1:
+                        candidates[prefix[:-1]].update(top['entries'])
+                        complete[prefix[:-1]] = complete[prefix[:-1]] and top['complete']
+            self._short_top = short_top
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return the most popular names starting with ``prefix``
+
+        Returns:
+            list: dicts with text, type, id, slug and popularity
+        """
+        prefix = self.normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        short = len(prefix) <= SHORT_PREFIX_LENGTH and limit <= SHORT_PREFIX_KEEP
+        with self._lock:
+            if short:
+                top = self._short_top_locked(prefix, limit)[:limit]
+            else:
+                cached = self._cache.get(prefix, {}).get(limit)
+                if cached is not None:
+                    return cached
+                top = heapq.nsmallest(limit, self._matches_locked(prefix), key=self._rank)
+
+            results = [
+                {
+                    'text': self._entries[entry_key]['text'],
+                    'type': entry_key[0],
+                    'id': entry_key[1],
+                    'slug': self._entries[entry_key]['slug'],
+                    'popularity': self._entries[entry_key]['popularity']
+                }
+                for entry_key in top
+            ]
+
+            if not short:
+                if prefix not in self._cache and len(self._cache) >= self._cache_size:
+                    self._cache = {}
+                self._cache.setdefault(prefix, {})[limit] = results
+            return results
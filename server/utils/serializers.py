@@ -0,0 +1,198 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from models import db, Product, ProductImage, Category, SellerProfile, OrderItem, CartItem
+
+
+def load_product_relations(products):
+    """
+    Load the categories, sellers and images for a page of products
+
+    Args:
+        products (list): Product instances
+
+    Returns:
+        tuple: (categories, sellers, images) dicts keyed by category id,
+        seller profile id and product id respectively
+    """
+    category_ids = {product.category_id for product in products if product.category_id}
+    seller_ids = {product.seller_id for product in products if product.seller_id}
+    product_ids = [product.id for product in products]
+
+    categories = {}
+    if category_ids:
+        categories = {
+            category.id: category
+            for category in Category.query.filter(Category.id.in_(category_ids)).all()
+        }
+
+    sellers = {}
+    if seller_ids:
+        sellers = {
+            seller.id: seller
+            for seller in SellerProfile.query.filter(SellerProfile.id.in_(seller_ids)).all()
+        }
+
+    images = defaultdict(list)
+    if product_ids:
+        image_rows = ProductImage.query.filter(
+            ProductImage.product_id.in_(product_ids)
+        ).order_by(ProductImage.display_order, ProductImage.created_at).all()
+        for image in image_rows:
+            images[image.product_id].append(image)
+
+    return categories, sellers, images
+
+
+def serialize_products(products):
+    """
+    Serialize a list of products using a fixed number of queries
+
+    Equivalent to ``[product.to_dict() for product in products]`` but the
+    category, seller and image rows for the whole list are fetched with one
+    query each instead of lazily per product.
+
+    Args:
+        products (list): Product instances
+
+    Returns:
+        list: Product dictionaries in the same order as ``products``
+    """
+    products = list(products)
+    if not products:
+        return []
+
+    categories, sellers, images = load_product_relations(products)
+
+    return [
+        product.to_dict(
+            category=categories.get(product.category_id),
+            seller=sellers.get(product.seller_id),
+            images=images.get(product.id, [])
+        )
+        for product in products
+    ]
+
+
+def serialize_orders(orders):
+    """
+    Serialize a list of orders with their items using a fixed number of queries
+
+    Equivalent to ``[order.to_dict() for order in orders]``; the items of all
+    orders are fetched with one query and their products are serialized
+    together through ``serialize_products``.
+
+    Args:
+        orders (list): Order instances
+
+    Returns:
+        list: Order dictionaries in the same order as ``orders``
+    """
+    orders = list(orders)
+    if not orders:
+        return []
+
+    items = defaultdict(list)
+    for item in OrderItem.query.filter(
+        OrderItem.order_id.in_([order.id for order in orders])
+    ).order_by(OrderItem.created_at).all():
+        items[item.order_id].append(item)
+
+    product_ids = {item.product_id for order_items in items.values() for item in order_items if item.product_id}
+    products = {}
+    if product_ids:
+        product_rows = Product.query.filter(Product.id.in_(product_ids)).all()
+        products = {product['id']: product for product in serialize_products(product_rows)}
+
+    return [
+        order.to_dict(items=[
+            item.to_dict(product=products.get(item.product_id))
+            for item in items.get(order.id, [])
+        ])
+        for order in orders
+    ]
+
+
+def _cart_item_query(cart_id):
+    """Cart lines with just the product columns the cart shows, oldest first"""
+    primary_image = db.session.query(ProductImage.image_url).filter(
+        ProductImage.product_id == Product.id
+    ).order_by(
+        ProductImage.is_primary.desc(),
+        ProductImage.display_order,
+        ProductImage.created_at
+    ).limit(1).correlate(Product).scalar_subquery()
+
+    return db.session.query(
+        CartItem.id,
+        CartItem.product_id,
+        CartItem.quantity,
+        Product.name,
+        Product.slug,
+        Product.price,
+        Product.discount_price,
+        Product.inventory_count,
+        Product.status,
+        SellerProfile.business_name,
+        primary_image.label('image_url')
+    ).join(
+        Product, CartItem.product_id == Product.id
+    ).outerjoin(
+        SellerProfile, Product.seller_id == SellerProfile.id
+    ).filter(
+        CartItem.cart_id == cart_id
+    ).order_by(CartItem.created_at, CartItem.id)
+
+
+def serialize_cart(cart):
+    """
+    Serialize a cart for the cart view with a single query
+
+    Items, their products, primary images and seller names come from one
+    projection query instead of ``Cart.to_dict()``'s lazy load of every
+    item's full product. Each line carries only what the cart shows plus a
+    line total at the price the customer pays (the discount price when set);
+    the cart total is the sum of the lines.
+
+    Args:
+        cart (Cart): Cart instance, or None for a user without a cart
+
+    Returns:
+        dict: Cart dictionary with ``items``, ``item_count`` and ``total``
+    """
+    if cart is None:
+        return {'items': [], 'item_count': 0, 'total': 0}
+
+    items = []
+    total = Decimal('0')
+    item_count = 0
+    for row in _cart_item_query(cart.id).all():
+        unit_price = row.discount_price if row.discount_price is not None else row.price
+        line_total = (unit_price or Decimal('0')) * row.quantity
+        total += line_total
+        item_count += row.quantity
+        items.append({
+            'id': row.id,
+            'product_id': row.product_id,
+            'quantity': row.quantity,
+            'name': row.name,
+            'slug': row.slug,
+            'image_url': row.image_url,
+            'sellerBusinessName': row.business_name,
+            'price': float(row.price) if row.price is not None else None,
+            'discount_price': float(row.discount_price) if row.discount_price is not None else None,
+            'unit_price': float(unit_price) if unit_price is not None else None,
+            'line_total': float(line_total),
+            'inventory_count': row.inventory_count,
+            'available': row.status == 'active'
+        })
+
+    return {
+        'id': cart.id,
+        'user_id': cart.user_id,
+        'created_at': cart.created_at.isoformat() if cart.created_at else None,
+        'updated_at': cart.updated_at.isoformat() if cart.updated_at else None,
+        'items': items,
+        'item_count': item_count,
+        'total': float(total)
+    }
@@ -0,0 +1,108 @@
+import re
+
+from slugify import slugify
+from sqlalchemy import func, case, cast, Integer, and_, not_, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from utils.logger import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# How many times to re-allocate when a concurrent writer takes the same slug
+SLUG_ATTEMPTS = 5
+
+
+def _in_family(slug, base):
+    """Whether ``slug`` is ``base`` itself or ``base-<n>``"""
+    return slug == base or re.fullmatch(re.escape(base) + r'-\d+', slug or '') is not None
+
+
+def _is_digits(expr):
+    """SQL condition that ``expr`` is a non-empty run of digits"""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        return expr.op('REGEXP')('^[0-9]+$')
+    if dialect == 'postgresql':
+        return expr.op('~')('^[0-9]+$')
+    return and_(expr.op('GLOB')('[0-9]*'), not_(expr.op('GLOB')('*[^0-9]*')))
+
+
+def _next_in_family(slug, base):
+    """The slug after ``slug`` in the ``base`` / ``base-<n>`` sequence"""
+    if slug == base:
+        return f'{base}-1'
+    return f'{base}-{int(slug[len(base) + 1:]) + 1}'
+
+
+def next_free_slug(column, base):
+    """
+    Find the next unused ``base`` / ``base-<n>`` slug with a single query
+
+    The lookup is a prefix range scan on the unique slug index that returns
+    only the highest numeric suffix in use, so it costs one round trip no
+    matter how many products share the name. Suffixes that aren't purely
+    numeric (``-red``, ``-2024-edition``) belong to other names and are
+    ignored.
+
+    Args:
+        column: Unique slug column, e.g. ``Product.slug``
+        base (str): Slugified name
+
+    Returns:
+        str: ``base`` if it is free, otherwise ``base-<highest suffix + 1>``
+    """
+    raw_suffix = func.substr(column, len(base) + 2)
+    base_taken, highest = db.session.query(
+        func.max(case((column == base, 1), else_=0)),
+        func.max(case((and_(column != base, _is_digits(raw_suffix)), cast(raw_suffix, Integer))))
+    ).filter(
+        or_(column == base, column.startswith(f'{base}-', autoescape=True))
+    ).one()
+
+    if not base_taken:
+        return base
+    return f'{base}-{(highest or 0) + 1}'
+
+
+def assign_unique_slug(instance, name, column=None):
+    """
+    Give ``instance`` a unique slug derived from ``name`` and flush it
+
+    The slug is written inside a savepoint; if another request inserts the
+    same slug between allocation and flush, the unique constraint rejects it
+    and the next suffix is tried. The retry counts up locally rather than
+    querying again: under REPEATABLE READ the transaction's snapshot can't
+    see the other writer's row, so a new lookup would return the same slug.
+    Instances whose current slug already belongs to the name keep it.
+
+    Args:
+        instance: Model instance with a ``slug`` attribute
+        name (str): Name to derive the slug from
+        column: Unique slug column, defaults to ``type(instance).slug``
+
+    Returns:
+        str: The assigned slug
+
+    Raises:
+        IntegrityError: If no free slug could be claimed after SLUG_ATTEMPTS tries
+    """
+    column = column if column is not None else type(instance).slug
+    base = slugify(name)
+    if instance.slug and _in_family(instance.slug, base):
+        return instance.slug
+
+    slug = next_free_slug(column, base)
+    for attempt in range(1, SLUG_ATTEMPTS + 1):
+        try:
+            with db.session.begin_nested():
+                instance.slug = slug
+                db.session.add(instance)
+                db.session.flush()
+            return slug
+        except IntegrityError as e:
+            if 'slug' not in str(e.orig) or attempt == SLUG_ATTEMPTS:
+                raise
+            logger.warning(f"Slug {slug} was taken concurrently, retrying ({attempt}/{SLUG_ATTEMPTS})")
+            slug = _next_in_family(slug, base)
@@ -0,0 +1,116 @@
+from flask import Response, current_app, request, stream_with_context
+
+from models import db
+from utils.logger import setup_logger
+from utils.pagination import keyset_after
+
+# Setup logger
+logger = setup_logger()
+
+# Rows fetched, loaded and serialized together while streaming
+STREAM_BATCH_SIZE = 500
+
+
+def page_params(max_limit=None):
+    """
+    Read optional ``limit`` / ``offset`` paging parameters
+
+    Args:
+        max_limit (int): Upper bound for ``limit``, or None for no bound
+
+    Returns:
+        tuple: (limit, offset); limit is None when the whole listing is requested
+    """
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if limit is not None:
+        limit = max(limit, 0)
+        if max_limit is not None:
+            limit = min(limit, max_limit)
+    return limit, offset
+
+
+def stream_json_array(query, id_column, key, serialize, sort_column=None, descending=False,
+                      limit=None, offset=0, batch_size=STREAM_BATCH_SIZE):
+    """
+    Stream the rows of a query as a JSON array
+
+    Rows are ordered by ``(sort_column, id_column)`` and read one batch at a
+    time: each batch first selects the next ``batch_size`` keys with a
+    keyset condition on the last key of the previous batch (``WHERE
+    (sort, id) > (:last_sort, :last_id) ORDER BY sort, id LIMIT n``), then
+    loads those rows with the full ``query`` and serializes them. No cursor
+    stays open between batches and the driver never holds more than one
+    batch of keys, so peak memory is bounded by ``batch_size`` rather than
+    by the size of the table, whether or not the driver supports
+    server-side cursors (mysql-connector doesn't).
+
+    Args:
+        query: Query returning the rows to serialize; its own ORDER BY,
+            LIMIT and OFFSET are ignored
+        id_column: Primary key column of the streamed entity
+        key (callable): Returns the primary key of a row of ``query``
+        serialize (callable): Turns a list of rows into a list of dicts
+        sort_column: Column to order by before the primary key, or None to
+            order by the primary key alone
+        descending (bool): Newest/highest first
+        limit (int): Maximum number of rows, or None for all of them
+        offset (int): Number of rows to skip
+        batch_size (int): Rows per batch
+
+    Returns:
+        Response: A streaming ``application/json`` response
+    """
+    unpaged = query.order_by(None).limit(None).offset(None)
+    ordering = [id_column.desc() if descending else id_column.asc()]
+    if sort_column is not None:
+        ordering.insert(0, sort_column.desc() if descending else sort_column.asc())
+        key_query = unpaged.with_entities(sort_column, id_column)
+    else:
+        key_query = unpaged.with_entities(id_column, id_column)
+    key_query = key_query.order_by(*ordering)
+
+    def next_keys(last, remaining):
+        batch_query = key_query
+        if last is None:
+            if offset:
+                batch_query = batch_query.offset(offset)
+        elif sort_column is not None:
+            batch_query = batch_query.filter(keyset_after(sort_column, id_column, last[0], last[1], descending))
+        else:
+            batch_query = batch_query.filter(id_column < last[1] if descending else id_column > last[1])
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        return batch_query.limit(size).all()
+
+    def generate():
+        yield '['
+        first = True
+        last = None
+        remaining = limit
+        try:
+            while remaining is None or remaining > 0:
+                keys = next_keys(last, remaining)
+                if not keys:
+                    break
+                last = keys[-1]
+                if remaining is not None:
+                    remaining -= len(keys)
+                ids = [row[1] for row in keys]
+                rows_by_id = {key(row): row for row in unpaged.filter(id_column.in_(ids)).all()}
+                rows = [rows_by_id[row_id] for row_id in ids if row_id in rows_by_id]
+                for item in serialize(rows):
+                    chunk = current_app.json.dumps(item)
+                    yield chunk if first else ',' + chunk
+                    first = False
+                # Release the batch's objects before loading the next one
+                db.session.expunge_all()
+                if len(keys) < batch_size:
+                    break
+        except Exception as e:
+            # Headers are already sent, so the error can only be logged;
+            # the client sees a truncated (invalid) JSON document
+            logger.error(f"Error while streaming {request.path}: {str(e)}")
+            return
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
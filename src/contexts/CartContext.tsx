@@ -173,21 +173,16 @@ export const CartProvider = ({ children }: { children: ReactNode }) => {
       const cartItems = response.data?.items || [];
       
       // Transform data to match our CartItem structure
-      const formattedItems: CartItem[] = cartItems.map(item => {
-        const product = item.product as any; // The property is 'product', not 'products'
-        const primaryImage = product.product_images?.find((img: any) => img.is_primary)?.image_url || 
-                           product.product_images?.[0]?.image_url;
-        
-        return {
-          id: item.id,
-          product_id: product.id,
-          name: product.name,
-          price: product.price,
-          quantity: item.quantity,
-          image: primaryImage,
-          affiliate_id: item.affiliate_id
-        };
-      });
+      // Cart lines come flat, with the product's card fields and the price already applied
+      const formattedItems: CartItem[] = cartItems.map(item => ({
+        id: item.id,
+        product_id: item.product_id,
+        name: item.name,
+        price: item.unit_price ?? item.price,
+        quantity: item.quantity,
+        image: item.image_url ?? undefined,
+        affiliate_id: item.affiliate_id
+      }));
 
       dispatch({ type: 'SET_CART', payload: formattedItems });
     } catch (error) {